@@ -1,15 +1,175 @@
+"""
+In-process timers for short delayed actions.
+
+Every timer lives in one min-heap ordered by due time and is fired by a
+single daemon thread, so thousands of pending reminders cost a heap
+entry each rather than a sleeping OS thread each. Callbacks run on that
+thread: keep them short and hand anything slow to a task or executor.
+"""
+
+import heapq
+import itertools
 import threading
 import time
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _Timer:
+    __slots__ = ("id", "due", "seq", "callback", "args", "name", "created_at")
+
+    def __init__(self, timer_id: int, due: float, callback: Callable, args: tuple, name: str):
+        self.id = timer_id
+        self.due = due
+        self.seq = 0
+        self.callback = callback
+        self.args = args
+        self.name = name
+        self.created_at = time.time()
+
+    def describe(self, now: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "due_in": max(self.due - now, 0.0),
+            "created_at": self.created_at,
+        }
+
+
+class TimerScheduler:
+    """
+    Heap-based timers on one dedicated thread.
+
+    Cancel and reschedule are O(log n): a reschedule pushes a fresh heap
+    entry and bumps the timer's seq, and stale entries (cancelled or
+    superseded) are skipped when they reach the top. The heap is rebuilt
+    once stale entries outnumber live ones.
+    """
+
+    def __init__(self, name: str = "timer-scheduler"):
+        self.name = name
+        self._heap: List[tuple] = []
+        self._timers: Dict[int, _Timer] = {}
+        self._ids = itertools.count(1)
+        self._seqs = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.stats = {"scheduled": 0, "fired": 0, "cancelled": 0, "errors": 0}
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _push(self, timer: _Timer):
+        timer.seq = next(self._seqs)
+        heapq.heappush(self._heap, (timer.due, timer.seq, timer))
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+        if self._heap[0][2] is timer:
+            self._cond.notify()
+
+    def _is_live(self, entry: tuple) -> bool:
+        timer = entry[2]
+        return self._timers.get(timer.id) is timer and timer.seq == entry[1]
+
+    def schedule(self, delay_seconds: float, callback: Callable, *args, name: Optional[str] = None) -> int:
+        """Run callback(*args) after delay_seconds. Returns the timer id."""
+        with self._cond:
+            timer = _Timer(next(self._ids), time.monotonic() + max(delay_seconds, 0), callback, args, name or getattr(callback, "__name__", "timer"))
+            self._timers[timer.id] = timer
+            self._push(timer)
+            self.stats["scheduled"] += 1
+            self._ensure_thread()
+            return timer.id
+
+    def cancel(self, timer_id: int) -> bool:
+        """Cancel a pending timer. False if it already fired or never existed."""
+        with self._cond:
+            if self._timers.pop(timer_id, None) is None:
+                return False
+            self.stats["cancelled"] += 1
+            return True
+
+    def reschedule(self, timer_id: int, delay_seconds: float) -> bool:
+        """Move a pending timer to fire delay_seconds from now."""
+        with self._cond:
+            timer = self._timers.get(timer_id)
+            if timer is None:
+                return False
+            timer.due = time.monotonic() + max(delay_seconds, 0)
+            self._push(timer)
+            return True
+
+    def get(self, timer_id: int) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            timer = self._timers.get(timer_id)
+            return timer.describe(time.monotonic()) if timer else None
+
+    def pending(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Pending timers, soonest first."""
+        with self._cond:
+            now = time.monotonic()
+            timers = heapq.nsmallest(limit, self._timers.values(), key=lambda t: t.due) if limit else sorted(self._timers.values(), key=lambda t: t.due)
+            return [timer.describe(now) for timer in timers]
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def stop(self):
+        """Stop the thread. Pending timers stay queued until the next schedule()."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        thread.join()
+        with self._cond:
+            self._thread = None
+
+    def _next_due(self) -> Optional[_Timer]:
+        """Pop stale entries; return the live timer at the top, if due."""
+        while self._heap:
+            entry = self._heap[0]
+            if not self._is_live(entry):
+                heapq.heappop(self._heap)
+                continue
+            if entry[0] <= time.monotonic():
+                heapq.heappop(self._heap)
+                del self._timers[entry[2].id]
+                return entry[2]
+            return None
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                timer = self._next_due()
+                while timer is None:
+                    if self._stopping:
+                        return
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                    timer = self._next_due()
+            try:
+                timer.callback(*timer.args)
+                self.stats["fired"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Error in timer {timer.name}: {e}")
+
+
+timer_scheduler = TimerScheduler()
+
 
+def _log_action(action: str):
+    print(f"[BACKGROUND TASK EXECUTED @ {datetime.utcnow().isoformat()}] {action}")
 
-def run_after_delay(delay_seconds: int, action: str):
-    def task():
-        time.sleep(delay_seconds)
-        print(
-            f"[BACKGROUND TASK EXECUTED @ {datetime.utcnow().isoformat()}] {action}"
-        )
 
-    thread = threading.Thread(target=task)
-    thread.daemon = True
-    thread.start()
+def run_after_delay(delay_seconds: int, action: str) -> int:
+    """Log action after delay_seconds. Returns a timer id for cancel/reschedule."""
+    return timer_scheduler.schedule(delay_seconds, _log_action, action, name=action)
@@ -1,8 +1,10 @@
 # Base Agent Class
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any
 from agents.llm import generate_response
-from memory.store import get_memories, save_memory
+from memory.store import get_memories, save_memory, search_memories
+from vector_memory.store import add_document, search_similar
 import json
 
 class BaseAgent(ABC):
@@ -20,18 +22,28 @@ class BaseAgent(ABC):
         """Process a user message and return a response"""
         pass
     
-    async def get_user_context(self, user_id: str, category: Optional[str] = None) -> str:
-        """Get relevant user context from memories"""
+    async def get_user_context(self, user_id: str, category: Optional[str] = None, query: Optional[str] = None) -> str:
+        """Get relevant user context from memories
+        
+        With a query, memories are ranked by keyword search first, which
+        needs no embedding model; only when that finds nothing are they
+        ranked semantically (category-scoped and time-decayed) by the vector
+        store. Falls back to the most recent memories when there is no query
+        or no match.
+        """
         try:
-            memories = await get_memories(user_id, category=category)
-            if not memories:
-                return ""
+            texts = []
+            if query:
+                matches = await search_memories(user_id, query, category=category, limit=5)
+                texts = [memory["text"] for memory in matches]
+                if not texts:
+                    texts = await asyncio.to_thread(search_similar, query, k=5, user_id=user_id, category=category)
             
-            context_parts = []
-            for memory in memories[:5]:  # Limit to 5 most recent
-                text = memory.get("text", memory.get("content", ""))
-                if text:
-                    context_parts.append(f"- {text}")
+            if not texts:
+                memories = await get_memories(user_id, category=category)
+                texts = [memory.get("text", memory.get("content", "")) for memory in memories[:5]]  # Limit to 5 most recent
+            
+            context_parts = [f"- {text}" for text in texts if text]
             
             return "\n".join(context_parts) if context_parts else ""
         except:
@@ -45,6 +57,8 @@ class BaseAgent(ABC):
                 "category": category,
                 "agent": self.agent_id
             })
+            # Encoding is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(add_document, text, user_id=user_id, category=category, agent=self.agent_id)
         except:
             pass
     
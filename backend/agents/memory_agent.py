@@ -1,9 +1,11 @@
 # backend/agents/memory_agent.py
 
+import asyncio
 from firestore.client import FirestoreMemory, FirestoreUser
-from vector_memory.store import embed_text, search_similar, add_document
+from firestore.memory_summary import format_memory
+from memory.store import search_memories
+from vector_memory.store import embed_text, search_similar, add_document, delete_document
 from typing import List, Dict, Any
-from datetime import datetime
 from agents.llm import call_llm
 
 class MemoryAgent:
@@ -98,7 +100,7 @@ Respond with ONLY the category name."""
             
             # Add to vector store for semantic search
             try:
-                add_document(message)
+                add_document(message, doc_id=memory_id, user_id=self.user_id, category=category)
             except:
                 pass  # Vector store optional
             
@@ -113,17 +115,33 @@ Respond with ONLY the category name."""
             print(f"❌ Error saving memory: {e}")
             return {"saved": False, "error": str(e)}
     
-    def get_relevant_context(self, query: str, k: int = 5) -> Dict[str, Any]:
+    def delete_memory(self, memory_id: str) -> bool:
         """
-        Retrieve relevant memories for a query using semantic search.
+        Delete a memory and drop it from semantic search.
+        """
+        deleted = self.memory_db.delete_memory(self.user_id, memory_id)
+        if deleted:
+            delete_document(memory_id)
+        return deleted
+    
+    async def get_relevant_context(self, query: str, k: int = 5) -> Dict[str, Any]:
+        """
+        Retrieve relevant memories for a query, by keyword search with
+        semantic search as the fallback.
         Returns categorized context.
         """
         try:
-            # Search similar memories from vector store
-            similar_memories = search_similar(query, k=k)
+            # Keyword search first; the vector store (and its model) only if it finds nothing
+            matches = await search_memories(self.user_id, query, limit=k)
+            similar_memories = [memory["text"] for memory in matches]
+            if not similar_memories:
+                similar_memories = await asyncio.to_thread(search_similar, query, k=k, user_id=self.user_id)
             
-            # Get user preferences for context
-            user_prefs = self.user_db.get_preferences(self.user_id)
+            # Get user preferences for context, from the profile cache if fresh
+            from usage.profile import cached_preferences
+            user_prefs = cached_preferences(self.user_id)
+            if user_prefs is None:
+                user_prefs = self.user_db.get_preferences(self.user_id)
             
             context = {
                 "relevant_memories": similar_memories,
@@ -153,33 +171,15 @@ Respond with ONLY the category name."""
     def get_memory_summary(self) -> Dict[str, Any]:
         """
         Get summary of all user memories by category.
+        Reads the materialized summary document (one read).
         """
         try:
-            categories = ["habit", "goal", "fact", "preference", "decision", "chat"]
-            all_memories = []
-            summary_by_category = {}
-            
-            print(f"🧠 Getting memories for user: {self.user_id}")
-            
-            for category in categories:
-                memories = self.get_memories_by_type(category, limit=10)
-                print(f"🧠 Category '{category}': {len(memories)} memories")
-                summary_by_category[category] = len(memories)
-                
-                # Format memories for response
-                for mem in memories:
-                    all_memories.append({
-                        "id": mem.get("id", ""),
-                        "text": mem.get("content", ""),
-                        "category": category,
-                        "created_at": mem.get("createdAt", datetime.now()).isoformat() if isinstance(mem.get("createdAt"), datetime) else str(mem.get("createdAt", ""))
-                    })
-            
-            print(f"📊 Total memories found: {len(all_memories)}")
+            summary = self.memory_db.get_summary(self.user_id)
+            memories = [format_memory(item) for item in summary.get("latest", [])]
             return {
-                "memories": all_memories,
-                "total": len(all_memories),
-                "by_category": summary_by_category
+                "memories": memories,
+                "total": summary.get("total", 0),
+                "by_category": summary.get("counts", {})
             }
         except Exception as e:
             print(f"❌ Error getting summary: {e}")
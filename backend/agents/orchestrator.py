@@ -51,7 +51,7 @@ def handle_user_message(message: str, user_id: str) -> str:
         planning_agent = PlanningAgent(user_id)
         
         # Get relevant context for all agents
-        relevant_memories = search_similar(message, k=5)
+        relevant_memories = search_similar(message, k=5, user_id=user_id)
         context = {
             "relevant_memories": relevant_memories,
             "user_preferences": {}  # Will be populated from Firestore in future
@@ -1,19 +1,270 @@
+"""
+Actions waiting for the user's CONFIRM / CANCEL.
+
+Entries expire after PENDING_ACTION_TTL_SECONDS and the store holds at
+most PENDING_ACTION_MAX_ENTRIES, evicting the least recently used. Expiry
+is checked lazily on every read and swept periodically on the shared
+timer thread.
+
+The default backend is in-process. Set PENDING_ACTIONS_BACKEND=sqlite to
+keep actions in PENDING_ACTIONS_DB_PATH so a CONFIRM can land on any
+worker sharing that file. That backend trims back to the cap on each
+sweep rather than counting rows on every insert, so it can run over by
+one sweep interval's worth of new actions.
+"""
+
+import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from agents.background_tasks import timer_scheduler
+from memory.db import ConnectionPool, apply_migrations
+
+PENDING_ACTION_TTL_SECONDS = float(os.getenv("PENDING_ACTION_TTL_SECONDS", "900"))
+PENDING_ACTION_MAX_ENTRIES = int(os.getenv("PENDING_ACTION_MAX_ENTRIES", "10000"))
+PENDING_ACTION_SWEEP_SECONDS = float(os.getenv("PENDING_ACTION_SWEEP_SECONDS", "60"))
+PENDING_ACTIONS_BACKEND = os.getenv("PENDING_ACTIONS_BACKEND", "memory")
+PENDING_ACTIONS_DB_PATH = os.getenv("PENDING_ACTIONS_DB_PATH", "pending_actions.db")
+
+
+class MemoryBackend:
+    """OrderedDict in LRU order: action_id -> (message, expires_at)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, action_id: str, message: str, expires_at: float) -> int:
+        """Store an entry. Returns how many LRU entries were evicted."""
+        with self._lock:
+            self._entries[action_id] = (message, expires_at)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def get(self, action_id: str, now: float) -> tuple:
+        """(message or None, expired)"""
+        with self._lock:
+            entry = self._entries.get(action_id)
+            if entry is None:
+                return None, False
+            if entry[1] <= now:
+                del self._entries[action_id]
+                return None, True
+            self._entries.move_to_end(action_id)
+            return entry[0], False
+
+    def trim(self) -> int:
+        """Evict down to max_entries; put already does, so nothing to do."""
+        return 0
+
+    def pop(self, action_id: str, now: float) -> tuple:
+        """Remove and return (message or None, expired)"""
+        with self._lock:
+            entry = self._entries.pop(action_id, None)
+            if entry is None:
+                return None, False
+            if entry[1] <= now:
+                return None, True
+            return entry[0], False
+
+    def sweep(self, now: float) -> int:
+        """Drop expired entries. Returns how many."""
+        with self._lock:
+            expired = [action_id for action_id, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for action_id in expired:
+                del self._entries[action_id]
+            return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Same interface as MemoryBackend, stored in a SQLite file shared by workers."""
+
+    MIGRATIONS = [
+        # 1: actions with expiry and LRU clock
+        """
+        CREATE TABLE IF NOT EXISTS pending_actions (
+            id TEXT PRIMARY KEY,
+            message TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_pending_actions_expires ON pending_actions (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_pending_actions_last_used ON pending_actions (last_used)
+        """,
+    ]
+
+    INSERT = "INSERT OR REPLACE INTO pending_actions (id, message, expires_at, last_used) VALUES (?, ?, ?, ?)"
+    COUNT = "SELECT COUNT(*) FROM pending_actions"
+    EVICT = """
+        DELETE FROM pending_actions WHERE id IN (
+            SELECT id FROM pending_actions ORDER BY last_used
+            LIMIT max(0, (SELECT COUNT(*) FROM pending_actions) - ?)
+        )
+    """
+    TOUCH = "UPDATE pending_actions SET last_used = ? WHERE id = ? RETURNING message, expires_at"
+    POP = "DELETE FROM pending_actions WHERE id = ? RETURNING message, expires_at"
+    SWEEP = "DELETE FROM pending_actions WHERE expires_at <= ?"
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.pool = ConnectionPool(path)
+        apply_migrations(self.pool.connection(), self.MIGRATIONS)
+
+    def put(self, action_id: str, message: str, expires_at: float) -> int:
+        """Store an entry. Evicts nothing; trim() enforces the cap."""
+        conn = self.pool.connection()
+        with conn:
+            conn.execute(self.INSERT, (action_id, message, expires_at, time.time()))
+        return 0
+
+    def get(self, action_id: str, now: float) -> tuple:
+        conn = self.pool.connection()
+        with conn:
+            row = conn.execute(self.TOUCH, (time.time(), action_id)).fetchone()
+        if row is None:
+            return None, False
+        if row[1] <= now:
+            self.pop(action_id, now)
+            return None, True
+        return row[0], False
+
+    def pop(self, action_id: str, now: float) -> tuple:
+        conn = self.pool.connection()
+        with conn:
+            row = conn.execute(self.POP, (action_id,)).fetchone()
+        if row is None:
+            return None, False
+        if row[1] <= now:
+            return None, True
+        return row[0], False
 
-# In-memory store (safe for now)
-PENDING_ACTIONS = {}
+    def sweep(self, now: float) -> int:
+        conn = self.pool.connection()
+        with conn:
+            return conn.execute(self.SWEEP, (now,)).rowcount
+
+    def trim(self) -> int:
+        """Evict least recently used entries over max_entries. Returns how many."""
+        conn = self.pool.connection()
+        with conn:
+            return conn.execute(self.EVICT, (self.max_entries,)).rowcount
+
+    def __len__(self) -> int:
+        return self.pool.connection().execute(self.COUNT).fetchone()[0]
+
+
+class PendingActionStore:
+    """TTL + LRU bounded pending actions over a pluggable backend."""
+
+    def __init__(self, backend, ttl_seconds: float = PENDING_ACTION_TTL_SECONDS, sweep_seconds: float = PENDING_ACTION_SWEEP_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.sweep_seconds = sweep_seconds
+        # Per process; with the SQLite backend each worker counts its own calls
+        self.counters = {"created": 0, "confirmed": 0, "cancelled": 0, "expired": 0, "evicted": 0}
+        self._sweep_timer = None
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        if amount:
+            with self._lock:
+                self.counters[name] += amount
+
+    def _ensure_sweeper(self):
+        if self._sweep_timer is None and self.sweep_seconds > 0:
+            with self._lock:
+                if self._sweep_timer is None:
+                    self._sweep_timer = timer_scheduler.schedule(self.sweep_seconds, self._sweep_tick, name="pending-actions-sweep")
+
+    def _sweep_tick(self):
+        try:
+            self.sweep()
+        except Exception as e:
+            print(f"❌ Error sweeping pending actions: {e}")
+        finally:
+            self._sweep_timer = timer_scheduler.schedule(self.sweep_seconds, self._sweep_tick, name="pending-actions-sweep")
+
+    def create(self, message: str) -> str:
+        action_id = str(uuid.uuid4())
+        evicted = self.backend.put(action_id, message, time.time() + self.ttl_seconds)
+        self._count("created")
+        self._count("evicted", evicted)
+        self._ensure_sweeper()
+        return action_id
+
+    def get(self, action_id: str) -> Optional[str]:
+        message, expired = self.backend.get(action_id, time.time())
+        if expired:
+            self._count("expired")
+        return message
+
+    def confirm(self, action_id: str) -> Optional[str]:
+        """Remove and return the action; None if unknown or expired."""
+        message, expired = self.backend.pop(action_id, time.time())
+        if expired:
+            self._count("expired")
+        elif message is not None:
+            self._count("confirmed")
+        return message
+
+    def remove(self, action_id: str) -> bool:
+        """Cancel an action. False if unknown or expired."""
+        message, expired = self.backend.pop(action_id, time.time())
+        if expired:
+            self._count("expired")
+        elif message is not None:
+            self._count("cancelled")
+        return message is not None
+
+    def sweep(self) -> int:
+        """Drop expired entries, then trim to the cap. Returns how many expired."""
+        expired = self.backend.sweep(time.time())
+        self._count("expired", expired)
+        self._count("evicted", self.backend.trim())
+        return expired
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["pending"] = len(self.backend)
+        return stats
+
+
+def _create_backend():
+    if PENDING_ACTIONS_BACKEND == "sqlite":
+        return SQLiteBackend(PENDING_ACTIONS_DB_PATH, PENDING_ACTION_MAX_ENTRIES)
+    return MemoryBackend(PENDING_ACTION_MAX_ENTRIES)
+
+
+pending_actions = PendingActionStore(_create_backend())
 
 
 def create_pending_action(message: str):
-    action_id = str(uuid.uuid4())
-    PENDING_ACTIONS[action_id] = message
-    return action_id
+    return pending_actions.create(message)
 
 
 def get_pending_action(action_id: str):
-    return PENDING_ACTIONS.get(action_id)
+    return pending_actions.get(action_id)
+
+
+def confirm_pending_action(action_id: str):
+    """Take the action for execution; None if unknown or expired."""
+    return pending_actions.confirm(action_id)
 
 
 def remove_pending_action(action_id: str):
-    if action_id in PENDING_ACTIONS:
-        del PENDING_ACTIONS[action_id]
+    pending_actions.remove(action_id)
+
+
+def get_pending_action_stats() -> Dict[str, int]:
+    return pending_actions.stats()
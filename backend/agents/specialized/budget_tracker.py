@@ -25,7 +25,7 @@ Be supportive, practical, and non-judgmental. Help users take control of their f
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process budget tracking request"""
-        user_context = await self.get_user_context(user_id, category="preference")
+        user_context = await self.get_user_context(user_id, category="preference", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -25,7 +25,7 @@ Be concise, actionable, and encouraging. Format responses clearly with bullet po
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process planning request"""
         # Get user's previous plans and preferences
-        user_context = await self.get_user_context(user_id, category="plan")
+        user_context = await self.get_user_context(user_id, category="plan", query=message)
         
         # Generate response
         prompt = self.format_prompt(message, user_context)
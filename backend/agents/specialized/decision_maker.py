@@ -25,7 +25,7 @@ Be objective, thorough, and insightful. Help users think clearly about important
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process decision-making request"""
-        user_context = await self.get_user_context(user_id, category="decision")
+        user_context = await self.get_user_context(user_id, category="decision", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -25,7 +25,7 @@ Be inspiring, strategic, and supportive. Help users achieve what matters most to
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process goal-setting request"""
-        user_context = await self.get_user_context(user_id, category="plan")
+        user_context = await self.get_user_context(user_id, category="plan", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -25,7 +25,7 @@ Be encouraging, science-based, and practical. Focus on small wins and consistenc
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process habit building request"""
-        user_context = await self.get_user_context(user_id, category="preference")
+        user_context = await self.get_user_context(user_id, category="preference", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -25,7 +25,7 @@ Be educational, structured, and encouraging. Provide step-by-step guidance and p
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process learning query"""
-        user_context = await self.get_user_context(user_id, category="preference")
+        user_context = await self.get_user_context(user_id, category="preference", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -25,7 +25,7 @@ Be creative, practical, and accommodating. Make cooking enjoyable and stress-fre
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
         """Process meal planning request"""
-        user_context = await self.get_user_context(user_id, category="preference")
+        user_context = await self.get_user_context(user_id, category="preference", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -24,7 +24,7 @@ Be empathetic, non-judgmental, and supportive. Focus on healthy communication pa
         )
     
     async def process_message(self, message: str, user_id: str, context: Optional[Dict] = None) -> str:
-        user_context = await self.get_user_context(user_id, category="preference")
+        user_context = await self.get_user_context(user_id, category="preference", query=message)
         
         prompt = self.format_prompt(message, user_context)
         response = await self.generate_response(prompt)
@@ -1,50 +1,102 @@
-import firebase_admin
+import hashlib
 import logging
-import jwt
+import os
+import threading
 import time
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import jwt
+
+from auth.jwks import key_cache
 
 logger = logging.getLogger(__name__)
 
+FIREBASE_PROJECT_IDS = [p.strip() for p in os.getenv("FIREBASE_PROJECT_IDS", "whatsnextup-d2415,whatsnextup").split(",") if p.strip()]
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+CLOCK_SKEW_SECONDS = 10
+
+# sha256(token) -> verified payload, in LRU order; entries die at the token's exp
+_verified: "OrderedDict[bytes, Dict]" = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+def _cached(digest: bytes) -> Optional[Dict]:
+    with _verified_lock:
+        payload = _verified.get(digest)
+        if payload is None:
+            return None
+        if payload["exp"] <= time.time():
+            del _verified[digest]
+            return None
+        _verified.move_to_end(digest)
+        return payload
+
+
+def _remember(digest: bytes, payload: Dict):
+    with _verified_lock:
+        _verified[digest] = payload
+        while len(_verified) > TOKEN_CACHE_MAX_ENTRIES:
+            _verified.popitem(last=False)
+
+
+def _verify(token: str) -> Dict:
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") != "RS256":
+        raise ValueError(f"Unexpected token algorithm: {header.get('alg')}")
+    key = key_cache.get(header.get("kid", ""))
+    if key is None:
+        raise ValueError("Token signed with an unknown key")
+
+    payload = jwt.decode(
+        token,
+        key,
+        algorithms=["RS256"],
+        audience=FIREBASE_PROJECT_IDS,
+        leeway=CLOCK_SKEW_SECONDS,
+        options={"require": ["exp", "iat", "aud", "iss", "sub"]},
+    )
+    if payload["iss"] != f"https://securetoken.google.com/{payload['aud']}":
+        raise ValueError(f"Invalid issuer: {payload['iss']}")
+    if payload.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+        raise ValueError("Token auth_time is in the future")
+
+    # Firebase tokens use 'user_id' not 'uid'
+    uid = payload.get("user_id") or payload["sub"]
+    if not uid or uid != payload["sub"]:
+        raise ValueError("Missing user_id in token")
+    payload["uid"] = uid
+    return payload
+
+
+def cached_firebase_token(token: str) -> Optional[Dict]:
+    """Payload of a token verified earlier and not yet expired, or None.
+    Never does network or crypto work, so it is safe on the event loop."""
+    payload = _cached(hashlib.sha256(token.encode()).digest())
+    return dict(payload) if payload is not None else None
+
+
 def verify_firebase_token(token: str) -> Dict:
-    """Verify Firebase ID token by decoding JWT locally
-    
-    Firebase tokens are signed by Google, so we don't need to verify the signature.
-    We only validate the audience and expiration.
+    """Verify a Firebase ID token: RS256 signature against Google's keys,
+    then audience, issuer and expiry.
+
+    Verified tokens are remembered until they expire, so repeat requests
+    with the same token skip the crypto.
     """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = _cached(digest)
+    if payload is not None:
+        return dict(payload)
+
     try:
-        # Decode JWT WITHOUT signature verification
-        # Google-signed tokens are cryptographically secure and trusted
-        payload = jwt.decode(token, options={"verify_signature": False})
-        
-        print(f"🔍 JWT payload keys: {list(payload.keys())}")
-        print(f"🔍 JWT payload: {payload}")
-        
-        # Validate audience - it should be the project ID
-        aud = payload.get("aud")
-        if aud not in ["whatsnextup-d2415", "whatsnextup"]:
-            raise ValueError(f"Invalid audience: {aud}. Expected whatsnextup-d2415")
-        
-        # Check expiration
-        exp = payload.get("exp", 0)
-        if exp < time.time():
-            raise ValueError("Token expired")
-        
-        # Firebase tokens use 'user_id' not 'uid'
-        if not payload.get('user_id'):
-            raise ValueError("Missing user_id in token")
-        
-        # Normalize to 'uid' for consistency
-        payload['uid'] = payload.get('user_id')
-        
-        print(f"🔍 Extracted uid: {payload.get('uid')}, sub: {payload.get('sub')}, user_id: {payload.get('user_id')}")
-        logger.info(f"Token verified successfully for user: {payload.get('user_id')}")
-        
-        return payload
-        
+        payload = _verify(token)
     except jwt.InvalidTokenError as e:
         logger.error(f"Invalid token: {e}")
         raise ValueError(f"Invalid token: {e}")
     except Exception as e:
         logger.error(f"Token verification failed: {e}")
         raise
+
+    _remember(digest, payload)
+    logger.info(f"Token verified successfully for user: {payload['uid']}")
+    return dict(payload)
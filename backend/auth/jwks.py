@@ -0,0 +1,104 @@
+"""
+Google's Firebase ID token signing keys, cached in memory.
+
+Keys are fetched as a JWKS and kept for as long as the response's
+Cache-Control max-age allows (Google rotates them every few hours and
+publishes overlapping keys). A token signed with a key we don't have
+triggers one early refresh, at most every MIN_REFRESH_SECONDS, so forged
+kids can't make us hammer the endpoint.
+
+Set FIREBASE_JWKS_FILE to a local JWKS JSON file to use fixed keys
+instead (tests, offline development).
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from jwt.algorithms import RSAAlgorithm
+
+from integrations.http import get_sync_http_client
+
+logger = logging.getLogger(__name__)
+
+JWKS_URL = os.getenv(
+    "FIREBASE_JWKS_URL",
+    "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com",
+)
+JWKS_FILE = os.getenv("FIREBASE_JWKS_FILE")
+DEFAULT_MAX_AGE_SECONDS = 3600
+MIN_REFRESH_SECONDS = 60
+FETCH_TIMEOUT_SECONDS = 5
+FETCH_RETRY_SECONDS = 5
+
+
+def max_age(cache_control: Optional[str]) -> float:
+    """Seconds a response may be cached for, from its Cache-Control header."""
+    if not cache_control:
+        return DEFAULT_MAX_AGE_SECONDS
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    found = re.search(r"max-age=(\d+)", cache_control)
+    return float(found.group(1)) if found else DEFAULT_MAX_AGE_SECONDS
+
+
+def parse_jwks(jwks: Dict) -> Dict:
+    """kid -> RSA public key"""
+    return {key["kid"]: RSAAlgorithm.from_jwk(key) for key in jwks.get("keys", []) if key.get("kid")}
+
+
+class KeyCache:
+    """Public keys by kid, refreshed when their Cache-Control lifetime ends."""
+
+    def __init__(self, url: str = JWKS_URL, path: Optional[str] = JWKS_FILE):
+        self.url = url
+        self.path = path
+        self._keys: Dict = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.path:
+            with open(self.path) as f:
+                self._keys = parse_jwks(json.load(f))
+            self._expires_at = float("inf")
+            return
+        response = get_sync_http_client(self.url).get(self.url, timeout=FETCH_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        self._keys = parse_jwks(response.json())
+        self._expires_at = time.time() + max_age(response.headers.get("Cache-Control"))
+        logger.info(f"Loaded {len(self._keys)} token signing keys")
+
+    def _refresh(self, force: bool = False):
+        with self._lock:
+            now = time.time()
+            if not force and now < self._expires_at:
+                return
+            if force and now - self._last_fetch < MIN_REFRESH_SECONDS:
+                return
+            self._last_fetch = now
+            try:
+                self._load()
+            except Exception as e:
+                logger.error(f"Failed to load token signing keys: {e}")
+                # Keep serving the old keys meanwhile
+                self._expires_at = now + FETCH_RETRY_SECONDS
+
+    def get(self, kid: str):
+        """Public key for kid, or None if Google doesn't publish it."""
+        if time.time() >= self._expires_at:
+            self._refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            # Possibly rotated since we last fetched
+            self._refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+key_cache = KeyCache()
@@ -0,0 +1,57 @@
+"""
+Inserts per second through memory.store at different group-commit windows.
+
+Window 0 with batch size 1 is one transaction per insert (the old
+behaviour). Run with --synchronous FULL to see the effect when every
+commit pays an fsync.
+
+    cd backend && python -m benchmarks.bench_memory_group_commit
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from memory import db as memory_db
+
+
+async def load(store, writers: int, inserts: int) -> float:
+    async def writer(i: int):
+        for n in range(inserts):
+            await store.save_memory(f"user-{i}", {"text": f"memory {n}", "category": "goal"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(i) for i in range(writers)))
+    return writers * inserts / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=200)
+    parser.add_argument("--inserts", type=int, default=50)
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    args = parser.parse_args()
+
+    memory_db.PRAGMAS = tuple(
+        f"PRAGMA synchronous={args.synchronous}" if p.startswith("PRAGMA synchronous") else p
+        for p in memory_db.PRAGMAS
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MEMORY_DB_PATH"] = os.path.join(tmp, "memory.db")
+        from memory import store
+        store.init_db()
+
+        print(f"{args.writers} concurrent writers x {args.inserts} inserts, synchronous={args.synchronous}")
+        for window_ms, size in [(0, 1), (0, 256), (0.5, 256), (1, 256), (2, 256), (5, 256), (10, 256)]:
+            store.db.close()
+            store.db = memory_db.AsyncSQLite(store.pool, batch_window=window_ms / 1000, batch_size=size)
+            rate = asyncio.run(load(store, args.writers, args.inserts))
+            print(f"window={window_ms:5.1f} ms  batch_size={size:4d}  {rate:10,.0f} inserts/s")
+        store.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure event-loop lag while memory.store is under load.
+
+A ticker coroutine sleeps for 1 ms in a loop and records how late it
+wakes up. It runs alongside many concurrent save_memory/get_memories
+calls, first with the sqlite work done inline on the loop (the old
+behaviour), then through the async adapter. With the adapter, lag
+should stay near the scheduler's noise floor however long SQLite takes.
+
+    cd backend && python -m benchmarks.bench_memory_loop_lag
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    interval = 0.001
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(load, tasks: int, ops: int) -> list:
+    stop = asyncio.Event()
+    lags = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0.01)
+    await asyncio.gather(*(load(i, ops) for i in range(tasks)))
+    stop.set()
+    await tick
+    return lags
+
+
+def report(name: str, lags: list):
+    lags = sorted(lags)
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(f"{name:10s} ticks={len(lags):6d}  median={statistics.median(lags) * 1e3:7.2f} ms  "
+          f"p99={p99 * 1e3:7.2f} ms  max={lags[-1] * 1e3:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MEMORY_DB_PATH"] = os.path.join(tmp, "memory.db")
+        from memory import store
+        store.init_db()
+
+        async def blocking_load(i: int, ops: int):
+            conn = store.get_connection()
+            for n in range(ops):
+                with conn:
+                    store._insert_memory(conn, f"user-{i}", f"memory {n}", "goal", "2026-01-01T00:00:00")
+                store._select_memories(conn, f"user-{i}", "goal", 5)
+                await asyncio.sleep(0)
+
+        async def async_load(i: int, ops: int):
+            for n in range(ops):
+                await store.save_memory(f"user-{i}", {"text": f"memory {n}", "category": "goal"})
+                await store.get_memories(f"user-{i}", category="goal")
+
+        report("inline", asyncio.run(run(blocking_load, args.tasks, args.ops)))
+        report("adapter", asyncio.run(run(async_load, args.tasks, args.ops)))
+        store.close_db()
+
+
+if __name__ == "__main__":
+    main()
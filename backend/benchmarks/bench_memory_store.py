@@ -0,0 +1,96 @@
+"""
+Benchmark memory.store context fetches against a large memories table.
+
+Compares the old access pattern (fresh connection per call, no index)
+with the pooled, indexed store.
+
+    cd backend && python -m benchmarks.bench_memory_store --rows 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+CATEGORIES = ["habit", "goal", "fact", "preference", "decision", "insight", "plan"]
+
+
+def populate(path: str, rows: int, users: int):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE memories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    rng = random.Random(42)
+    batch = []
+    for i in range(rows):
+        batch.append((f"user-{rng.randrange(users)}", f"memory {i} " + "x" * 80, rng.choice(CATEGORIES), "2026-01-01T00:00:00"))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO memories (user_id, content, category, created_at) VALUES (?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO memories (user_id, content, category, created_at) VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def bench_baseline(path: str, users: int, queries: int) -> float:
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for _ in range(queries):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "SELECT content, category, created_at FROM memories WHERE user_id = ? AND category = ? ORDER BY id DESC LIMIT ?",
+            (f"user-{rng.randrange(users)}", rng.choice(CATEGORIES), 5)
+        ).fetchall()
+        conn.close()
+    return (time.perf_counter() - start) / queries
+
+
+async def bench_store(users: int, queries: int) -> float:
+    from memory.store import get_memories
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for _ in range(queries):
+        await get_memories(f"user-{rng.randrange(users)}", category=rng.choice(CATEGORIES))
+    return (time.perf_counter() - start) / queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--baseline-queries", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.db")
+        start = time.perf_counter()
+        populate(path, args.rows, args.users)
+        print(f"populated {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+        baseline = bench_baseline(path, args.users, args.baseline_queries)
+        print(f"baseline (connect per call, no index): {baseline * 1e6:10.1f} us/query")
+
+        os.environ["MEMORY_DB_PATH"] = path
+        from memory.store import init_db
+        start = time.perf_counter()
+        init_db()
+        print(f"migrations (index build) took {time.perf_counter() - start:.1f}s")
+
+        pooled = asyncio.run(bench_store(args.users, args.queries))
+        print(f"pooled + indexed:                      {pooled * 1e6:10.1f} us/query")
+        print(f"speedup: {baseline / pooled:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
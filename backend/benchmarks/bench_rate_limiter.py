@@ -0,0 +1,137 @@
+"""
+Benchmark ratelimit against the old per-IP timestamp lists.
+
+Drives 100k distinct IPs through the old middleware logic (a list of
+timestamps per IP, rebuilt on every request and never pruned) and through
+the GCRA limiter on both backends: time per request, memory held per IP,
+per-request cost for one hot IP near its limit, and what an idle sweep
+gives back.
+
+    cd backend && python -m benchmarks.bench_rate_limiter --ips 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+LIMIT = 100
+WINDOW = 60
+
+
+def old_hit(requests: dict, ip: str, now: float) -> bool:
+    """The removed middleware, minus the HTTP parts."""
+    requests.setdefault(ip, [])
+    requests[ip] = [t for t in requests[ip] if now - t < WINDOW]
+    if len(requests[ip]) >= LIMIT:
+        return False
+    requests[ip].append(now)
+    return True
+
+
+def traffic(ips: int, per_ip: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    names = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(ips)]
+    start = 1_000_000.0
+    return [(rng.choice(names), start + n * 0.0001) for n in range(ips * per_ip)]
+
+
+def bench_old(requests_list: list) -> tuple:
+    requests = {}
+    start = time.perf_counter()
+    for ip, now in requests_list:
+        old_hit(requests, ip, now)
+    elapsed = time.perf_counter() - start
+
+    # Memory measured on a second run; tracemalloc slows the timed one
+    requests = {}
+    tracemalloc.start()
+    for ip, now in requests_list:
+        old_hit(requests, ip, now)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(requests_list), current / len(requests), len(requests)
+
+
+def bench_limiter(make_limiter, requests_list: list, measure_memory: bool = True) -> tuple:
+    limiter = make_limiter()
+    start = time.perf_counter()
+    for ip, now in requests_list:
+        limiter.hit(ip, LIMIT, WINDOW, now=now)
+    elapsed = time.perf_counter() - start
+    keys = len(limiter.backend)
+    per_key = 0.0
+    if measure_memory:
+        scratch = make_limiter()
+        tracemalloc.start()
+        for ip, now in requests_list:
+            scratch.hit(ip, LIMIT, WINDOW, now=now)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        per_key = current / max(keys, 1)
+    return limiter, elapsed / len(requests_list), per_key, keys
+
+
+def bench_hot_key(hits: int) -> tuple:
+    """Per-request cost for one IP holding LIMIT - 1 recent requests."""
+    from ratelimit.limiter import MemoryBackend, RateLimiter
+
+    requests = {"hot": [1000.0 + i * 0.01 for i in range(LIMIT - 1)]}
+    start = time.perf_counter()
+    for i in range(hits):
+        old_hit(requests, "hot", 1001.0 + i * 1e-6)
+        # Back to LIMIT - 1 entries so every call does the same work
+        requests["hot"].pop()
+    old = (time.perf_counter() - start) / hits
+
+    limiter = RateLimiter(MemoryBackend(), sweep_seconds=0)
+    start = time.perf_counter()
+    for i in range(hits):
+        limiter.hit("hot", LIMIT, WINDOW, now=1001.0 + i * 1e-6)
+    new = (time.perf_counter() - start) / hits
+    return old, new
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ips", type=int, default=100_000)
+    parser.add_argument("--per-ip", type=int, default=5)
+    parser.add_argument("--sqlite-ips", type=int, default=20_000)
+    args = parser.parse_args()
+
+    from ratelimit.limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+    requests_list = traffic(args.ips, args.per_ip)
+    total = len(requests_list)
+
+    per_request, per_ip, keys = bench_old(requests_list)
+    print(f"timestamp lists ({total:,} requests, {keys:,} IPs): {per_request * 1e6:6.2f} us/request, {per_ip:,.0f} B per IP, never freed")
+
+    limiter, per_request, per_ip, keys = bench_limiter(
+        lambda: RateLimiter(MemoryBackend(max_keys=args.ips * 2), sweep_seconds=0), requests_list)
+    print(f"GCRA in-process ({total:,} requests, {keys:,} IPs): {per_request * 1e6:6.2f} us/request, {per_ip:,.0f} B per IP")
+    start = time.perf_counter()
+    swept = limiter.backend.sweep(requests_list[-1][1] + WINDOW)
+    print(f"  idle sweep: {swept:,} keys dropped in {(time.perf_counter() - start) * 1e3:.1f} ms, {len(limiter.backend):,} left")
+
+    capped, _, _, _ = bench_limiter(
+        lambda: RateLimiter(MemoryBackend(max_keys=args.ips // 10), sweep_seconds=0), requests_list, False)
+    print(f"  with max_keys={args.ips // 10:,}: {len(capped.backend):,} keys held")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_requests = traffic(args.sqlite_ips, args.per_ip)
+        limiter, per_request, _, keys = bench_limiter(
+            lambda: RateLimiter(SQLiteBackend(os.path.join(tmp, "rate_limits.db")), sweep_seconds=0), sqlite_requests, False)
+        print(f"GCRA SQLite ({len(sqlite_requests):,} requests, {keys:,} IPs): {per_request * 1e6:6.2f} us/request")
+        start = time.perf_counter()
+        swept = limiter.backend.sweep(sqlite_requests[-1][1] + WINDOW)
+        print(f"  idle sweep: {swept:,} keys dropped in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    old, new = bench_hot_key(20_000)
+    print(f"hot IP at {LIMIT - 1} requests in window: lists {old * 1e6:.2f} us/request, GCRA {new * 1e6:.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark one scheduler tick against a large tasks table.
+
+Compares the old worker tick (every pending row, no index) with the
+indexed due-task and next-due queries, and measures how late the
+scheduler fires a task created while it is asleep.
+
+    cd backend && python -m benchmarks.bench_task_scheduler --tasks 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def populate(path: str, tasks: int, due: int):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT NOT NULL,
+            status TEXT NOT NULL,
+            run_at TEXT NOT NULL
+        )
+    """)
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(tasks):
+        # A handful already due, the rest spread over the next 30 days
+        offset = -rng.random() * 60 if i < due else 3600 + rng.random() * 30 * 86400
+        batch.append((f"action {i}", "PENDING", (now + timedelta(seconds=offset)).isoformat()))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO tasks (action, status, run_at) VALUES (?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO tasks (action, status, run_at) VALUES (?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def bench_baseline(path: str, ticks: int) -> float:
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        conn.execute("SELECT id, action FROM tasks WHERE status='PENDING'").fetchall()
+    elapsed = (time.perf_counter() - start) / ticks
+    conn.close()
+    return elapsed
+
+
+def bench_indexed(ticks: int) -> float:
+    from tasks.store import get_due_tasks, next_due_time
+    start = time.perf_counter()
+    for _ in range(ticks):
+        get_due_tasks()
+        next_due_time()
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_wake(delay: float, samples: int) -> float:
+    """Median lateness of a task created while the scheduler sleeps."""
+    from tasks.store import create_task, get_connection
+    from tasks.worker import TaskWorker
+
+    worker = TaskWorker()
+    thread = threading.Thread(target=asyncio.run, args=(worker.run(),), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    lateness = []
+    for i in range(samples):
+        run_at = datetime.utcnow() + timedelta(seconds=delay)
+        task_id = create_task(f"wake {i}", run_at.isoformat())
+        while get_connection().execute("SELECT status FROM tasks WHERE id=?", (task_id,)).fetchone()[0] != "DONE":
+            time.sleep(0.0005)
+        lateness.append((datetime.utcnow() - run_at).total_seconds())
+
+    worker.stop()
+    thread.join()
+    return sorted(lateness)[len(lateness) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--due", type=int, default=50)
+    parser.add_argument("--baseline-ticks", type=int, default=5)
+    parser.add_argument("--ticks", type=int, default=10_000)
+    parser.add_argument("--wake-samples", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tasks.db")
+        start = time.perf_counter()
+        populate(path, args.tasks, args.due)
+        print(f"populated {args.tasks:,} pending tasks in {time.perf_counter() - start:.1f}s")
+
+        baseline = bench_baseline(path, args.baseline_ticks)
+        print(f"baseline tick (all pending, no index): {baseline * 1e3:10.2f} ms")
+
+        os.environ["TASKS_DB_PATH"] = path
+        from tasks.store import init_tasks_db
+        start = time.perf_counter()
+        init_tasks_db()
+        print(f"migrations (index build) took {time.perf_counter() - start:.1f}s")
+
+        indexed = bench_indexed(args.ticks)
+        print(f"indexed tick (due + next due):         {indexed * 1e3:10.2f} ms")
+        print(f"speedup: {baseline / indexed:.0f}x")
+
+        lateness = bench_wake(0.05, args.wake_samples)
+        print(f"scheduler wake lateness (median):      {lateness * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark agents.background_tasks with many pending timers.
+
+Compares the old thread-per-delay approach (a sleeping thread per timer,
+measured on a smaller count) with the single-thread heap scheduler at
+100k timers: schedule cost, memory, cancel/reschedule cost and how late
+timers fire.
+
+    cd backend && python -m benchmarks.bench_timers --timers 100000
+"""
+
+import argparse
+import random
+import threading
+import time
+import tracemalloc
+
+
+def bench_threads(count: int, delay: float) -> tuple:
+    """(seconds per schedule, bytes per timer) for thread-per-delay."""
+    def task():
+        time.sleep(delay)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    threads = []
+    for _ in range(count):
+        thread = threading.Thread(target=task, daemon=True)
+        thread.start()
+        threads.append(thread)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for thread in threads:
+        thread.join()
+    # tracemalloc only sees Python objects; each thread also reserves a stack
+    stack = threading.stack_size() or 8 * 1024 * 1024
+    return elapsed / count, current / count, stack
+
+
+def bench_scheduler(count: int, spread: float) -> dict:
+    from agents.background_tasks import TimerScheduler
+
+    # Memory per pending timer, measured on a throwaway scheduler
+    scratch = TimerScheduler()
+    tracemalloc.start()
+    for _ in range(count):
+        scratch.schedule(3600, print)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    scratch.stop()
+
+    scheduler = TimerScheduler()
+    expected = count - count // 4
+    lateness = []
+    done = threading.Event()
+    rng = random.Random(42)
+
+    def fire(due: float):
+        lateness.append(time.monotonic() - due)
+        if len(lateness) == expected:
+            done.set()
+
+    start = time.perf_counter()
+    ids, dues = [], []
+    for _ in range(count):
+        delay = 0.5 + rng.random() * spread
+        due = time.monotonic() + delay
+        ids.append(scheduler.schedule(delay, fire, due))
+        dues.append(due)
+    schedule_time = time.perf_counter() - start
+
+    # Cancel a quarter; reschedule another quarter to the time it already had
+    start = time.perf_counter()
+    for timer_id in ids[: count // 4]:
+        scheduler.cancel(timer_id)
+    cancel_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for timer_id, due in zip(ids[count // 4: count // 2], dues[count // 4: count // 2]):
+        scheduler.reschedule(timer_id, due - time.monotonic())
+    reschedule_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scheduler.pending(limit=10)
+    introspect_time = time.perf_counter() - start
+
+    done.wait(spread + 30)
+    scheduler.stop()
+    lateness.sort()
+    return {
+        "schedule": schedule_time / count,
+        "bytes": current / count,
+        "cancel": cancel_time / (count // 4),
+        "reschedule": reschedule_time / (count // 4),
+        "introspect": introspect_time,
+        "p50": lateness[len(lateness) // 2],
+        "p99": lateness[int(len(lateness) * 0.99)],
+        "fired": len(lateness),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--timers", type=int, default=100_000)
+    parser.add_argument("--baseline-timers", type=int, default=2_000)
+    parser.add_argument("--spread", type=float, default=2.0)
+    args = parser.parse_args()
+
+    per_thread, thread_bytes, stack = bench_threads(args.baseline_timers, 1.0)
+    print(f"thread per delay ({args.baseline_timers:,} timers): {per_thread * 1e6:8.1f} us/schedule, "
+          f"{thread_bytes:,.0f} B heap + {stack // 1024:,} KB stack reserved per timer")
+
+    result = bench_scheduler(args.timers, args.spread)
+    print(f"heap scheduler ({args.timers:,} timers):  {result['schedule'] * 1e6:8.1f} us/schedule, {result['bytes']:,.0f} B per timer")
+    print(f"cancel {result['cancel'] * 1e6:.1f} us, reschedule {result['reschedule'] * 1e6:.1f} us, "
+          f"pending(limit=10) {result['introspect'] * 1e3:.1f} ms")
+    print(f"fired {result['fired']:,}; lateness p50 {result['p50'] * 1e3:.2f} ms, p99 {result['p99'] * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # Conversation Storage
-from firestore.client import db
+from firestore.client import get_firestore_client
+from firestore.async_client import get_async_firestore_client
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from google.cloud.firestore_v1 import FieldFilter
@@ -22,6 +23,7 @@ def save_conversation_message_sync(
             "metadata": metadata or {}
         }
         
+        db = get_firestore_client()
         doc_ref = db.collection("conversations").document()
         doc_ref.set(conversation_data)
         
@@ -48,8 +50,9 @@ async def save_conversation_message(
             "metadata": metadata or {}
         }
         
+        db = get_async_firestore_client()
         doc_ref = db.collection("conversations").document()
-        doc_ref.set(conversation_data)
+        await doc_ref.set(conversation_data)
         
         return doc_ref.id
     except Exception as e:
@@ -65,6 +68,7 @@ async def get_conversation_history(
     try:
         print(f"🔍 Fetching conversations for user_id: {user_id}, agent_id: {agent_id}")
         
+        db = get_async_firestore_client()
         try:
             # Try the optimized query first
             query = db.collection("conversations").where(
@@ -75,7 +79,7 @@ async def get_conversation_history(
                 query = query.where(filter=FieldFilter("agent_id", "==", agent_id))
             
             query = query.order_by("timestamp", direction="DESCENDING").limit(limit)
-            docs = list(query.stream())
+            docs = [doc async for doc in query.stream()]
             
         except Exception as e:
             print(f"⚠️  Optimized query failed: {e}")
@@ -89,7 +93,7 @@ async def get_conversation_history(
             if agent_id:
                 query = query.where(filter=FieldFilter("agent_id", "==", agent_id))
             
-            docs = list(query.stream())
+            docs = [doc async for doc in query.stream()]
             
             # Sort in-memory
             docs.sort(key=lambda d: d.get("timestamp", 0), reverse=True)
@@ -116,6 +120,7 @@ async def search_conversations(
     """Search conversations by text"""
     try:
         # Get all conversations for user
+        db = get_async_firestore_client()
         query = db.collection("conversations").where(
             filter=FieldFilter("user_id", "==", user_id)
         ).order_by("timestamp", direction="DESCENDING").limit(100)
@@ -124,7 +129,7 @@ async def search_conversations(
         conversations = []
         search_lower = search_query.lower()
         
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data["id"] = doc.id
             
@@ -143,11 +148,12 @@ async def search_conversations(
 async def delete_conversation(user_id: str, conversation_id: str) -> bool:
     """Delete a specific conversation"""
     try:
+        db = get_async_firestore_client()
         doc_ref = db.collection("conversations").document(conversation_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         
         if doc.exists and doc.to_dict().get("user_id") == user_id:
-            doc_ref.delete()
+            await doc_ref.delete()
             return True
         return False
     except Exception as e:
@@ -157,11 +163,12 @@ async def delete_conversation(user_id: str, conversation_id: str) -> bool:
 async def get_conversation_stats(user_id: str) -> Dict[str, Any]:
     """Get conversation statistics for a user"""
     try:
+        db = get_async_firestore_client()
         query = db.collection("conversations").where(
             filter=FieldFilter("user_id", "==", user_id)
         )
         
-        docs = list(query.stream())
+        docs = [doc async for doc in query.stream()]
         
         total_conversations = len(docs)
         total_messages = 0
@@ -9,6 +9,17 @@ from .client import (
     FirestoreTask,
     FirestoreReflection,
 )
+from .async_client import (
+    get_async_firestore_client,
+    close_async_firestore,
+    AsyncFirestoreUser,
+    AsyncFirestoreMemory,
+    AsyncFirestoreChat,
+    AsyncFirestoreTask,
+    AsyncFirestoreReflection,
+    AsyncFirestorePlan,
+)
+from .sharded_counter import ShardedCounter, user_counter
 
 __all__ = [
     "init_firebase",
@@ -18,4 +29,14 @@ __all__ = [
     "FirestoreChat",
     "FirestoreTask",
     "FirestoreReflection",
+    "get_async_firestore_client",
+    "close_async_firestore",
+    "AsyncFirestoreUser",
+    "AsyncFirestoreMemory",
+    "AsyncFirestoreChat",
+    "AsyncFirestoreTask",
+    "AsyncFirestoreReflection",
+    "AsyncFirestorePlan",
+    "ShardedCounter",
+    "user_counter",
 ]
@@ -0,0 +1,491 @@
+# backend/firestore/async_client.py
+"""
+Async Firestore access for code running on the event loop.
+
+One AsyncClient is shared per event loop (in the server that is the one
+uvicorn loop), so every request reuses the same gRPC channel instead of
+each module opening its own. It is built with the public AsyncClient
+constructor from the default Firebase app's project and credentials; the
+library's own channel already keeps idle connections alive.
+
+The Async* classes mirror the sync ones in firestore.client method for
+method, sharing their logic through memory_summary and memory_mirror.
+Local SQLite work (memory mirror, schedules) is pushed to a worker thread
+so nothing blocks the loop.
+"""
+
+import asyncio
+import weakref
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import firebase_admin
+from google.cloud import firestore
+
+from memory import store as memory_store
+from tasks.schedules import update_user_schedule
+from . import memory_mirror, memory_summary
+
+# gRPC aio channels are bound to the loop that created them
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, firestore.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _new_client() -> firestore.AsyncClient:
+    """AsyncClient for the default Firebase app (a fresh one per loop, unlike firestore_async.client())"""
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app()
+    app = firebase_admin.get_app()
+    return firestore.AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
+
+
+def get_async_firestore_client() -> Optional[firestore.AsyncClient]:
+    """Shared AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        try:
+            client = _new_client()
+            _clients[loop] = client
+            print("✅ Async Firestore client connected")
+        except Exception as e:
+            print(f"❌ Failed to get async Firestore client: {e}")
+            return None
+    return client
+
+
+async def close_async_firestore():
+    """Close the running loop's client (app shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    # AsyncClient has no public close in google-cloud-firestore 2.14 (pinned
+    # in requirements.txt); _transport is only set once the channel exists
+    transport = getattr(client, "_transport", None)
+    if transport is not None:
+        try:
+            await transport.grpc_channel.close()
+        except Exception as e:
+            print(f"⚠️  Error closing async Firestore client: {e}")
+
+
+def _with_id(doc) -> Dict:
+    return dict(doc.to_dict(), id=doc.id)
+
+
+class AsyncFirestoreUser:
+    """User data operations"""
+
+    @staticmethod
+    async def get_or_create(user_id: str, email: str, display_name: str) -> Dict:
+        """Get or create user document"""
+        try:
+            db = get_async_firestore_client()
+            user_ref = db.collection("users").document(user_id)
+            user_doc = await user_ref.get()
+
+            if user_doc.exists:
+                return user_doc.to_dict()
+
+            user_data = {
+                "email": email,
+                "displayName": display_name,
+                "createdAt": datetime.utcnow(),
+                "preferences": {
+                    "timezone": "UTC",
+                    "reminderFrequency": "daily",
+                    "reflectionTime": "20:00"
+                }
+            }
+            await user_ref.set(user_data)
+            await asyncio.to_thread(update_user_schedule, user_id, user_data["preferences"])
+            print(f"✅ User created: {user_id}")
+            return user_data
+        except Exception as e:
+            print(f"❌ Error in get_or_create: {e}")
+            raise
+
+    @staticmethod
+    async def get_preferences(user_id: str) -> Dict:
+        """Get user preferences"""
+        try:
+            db = get_async_firestore_client()
+            user_doc = await db.collection("users").document(user_id).get()
+            if user_doc.exists:
+                return user_doc.to_dict().get("preferences", {})
+            return {}
+        except Exception as e:
+            print(f"❌ Error getting preferences: {e}")
+            return {}
+
+    @staticmethod
+    async def update_preferences(user_id: str, preferences: Dict) -> bool:
+        """Update user preferences"""
+        try:
+            db = get_async_firestore_client()
+            await db.collection("users").document(user_id).update({
+                "preferences": preferences
+            })
+            await asyncio.to_thread(update_user_schedule, user_id, preferences)
+            # Imported here: usage imports this module
+            from usage.profile import invalidate_user_profile
+            invalidate_user_profile(user_id)
+            return True
+        except Exception as e:
+            print(f"❌ Error updating preferences: {e}")
+            return False
+
+
+class AsyncFirestoreMemory:
+    """Memory storage, read through the same local mirror as FirestoreMemory"""
+
+    @staticmethod
+    async def save_memory(user_id: str, title: str = "", content: str = "", category: str = "insight", tags: List[str] = None) -> str:
+        """Save a memory with title, content, category and tags"""
+        try:
+            db = get_async_firestore_client()
+            memory_data = memory_summary.new_memory(title, content, category, tags)
+
+            memory_ref = memory_summary.memories_ref(db, user_id).document()
+            summary_ref = memory_summary.summary_ref(db, user_id)
+
+            @firestore.async_transactional
+            async def write(transaction):
+                summary = await summary_ref.get(transaction=transaction)
+                memory_summary.write_save(transaction, memory_ref, summary_ref, summary, memory_data)
+
+            await write(db.transaction())
+
+            try:
+                await memory_store.mirror_upsert_async(user_id, [dict(memory_data, id=memory_ref.id)])
+            except Exception as e:
+                print(f"⚠️  Failed to mirror memory locally: {e}")
+
+            return memory_ref.id
+        except Exception as e:
+            print(f"❌ Error saving memory: {e}")
+            raise
+
+    @staticmethod
+    async def sync_mirror(user_id: str, force: bool = False) -> bool:
+        """Async FirestoreMemory.sync_mirror"""
+        state = await asyncio.to_thread(memory_store.get_sync_state, user_id)
+        if memory_mirror.is_fresh(state, force):
+            return True
+
+        try:
+            db = get_async_firestore_client()
+            if db is None:
+                return state is not None
+
+            query = memory_mirror.sync_query(memory_summary.memories_ref(db, user_id), state)
+            memories = [_with_id(doc) async for doc in query.stream()]
+            if memories:
+                await memory_store.mirror_upsert_async(user_id, memories)
+            await memory_store.mark_synced_async(user_id, memory_mirror.high_water(state, memories))
+            return True
+        except Exception as e:
+            print(f"❌ Error syncing memory mirror: {e}")
+            return state is not None
+
+    @staticmethod
+    async def get_recent_memories(user_id: str, limit: int = 10) -> List[Dict]:
+        """Get recent memories for user"""
+        return await AsyncFirestoreMemory.get_memories_by_category(user_id, None, limit)
+
+    @staticmethod
+    async def get_memories_by_category(user_id: str, category: Optional[str], limit: int = 10) -> List[Dict]:
+        """Get memories by category (all categories if None)"""
+        try:
+            if await AsyncFirestoreMemory.sync_mirror(user_id):
+                return await asyncio.to_thread(memory_store.mirror_query, user_id, category, limit)
+
+            db = get_async_firestore_client()
+            if db is None:
+                return []
+            query = db.collection("users").document(user_id).collection("memories")
+            if category:
+                query = query.where("category", "==", category)
+            query = query.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
+            return [_with_id(doc) async for doc in query.stream()]
+        except Exception as e:
+            print(f"❌ Error getting memories: {e}")
+            return []
+
+    @staticmethod
+    async def get_summary(user_id: str) -> Dict:
+        """Materialized summary: counts, total and newest previews"""
+        try:
+            db = get_async_firestore_client()
+            summary_ref = memory_summary.summary_ref(db, user_id)
+            summary = await summary_ref.get()
+            if summary.exists:
+                return summary.to_dict()
+
+            @firestore.async_transactional
+            async def build(transaction):
+                summary = await summary_ref.get(transaction=transaction)
+                if summary.exists:
+                    return summary.to_dict()
+                docs = memory_summary.memories_ref(db, user_id).stream(transaction=transaction)
+                built = memory_summary.build_summary([(doc.id, doc.to_dict()) async for doc in docs])
+                transaction.set(summary_ref, built)
+                return built
+
+            print(f"🧠 Building memory summary for user: {user_id}")
+            return await build(db.transaction())
+        except Exception as e:
+            print(f"❌ Error getting memory summary: {e}")
+            return {"counts": {}, "total": 0, "latest": []}
+
+    @staticmethod
+    async def get_memory_page(user_id: str, category: Optional[str] = None, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        """Newest-first page of memories after the cursor (a memory id)"""
+        try:
+            db = get_async_firestore_client()
+            memories = memory_summary.memories_ref(db, user_id)
+            query = memories
+            if category:
+                query = query.where("category", "==", category)
+            query = query.order_by("createdAt", direction=firestore.Query.DESCENDING)
+            if cursor:
+                after = await memories.document(cursor).get()
+                if after.exists:
+                    query = query.start_after(after)
+            items = [_with_id(doc) async for doc in query.limit(limit).stream()]
+            return {"memories": items, "next_cursor": items[-1]["id"] if len(items) == limit else None}
+        except Exception as e:
+            print(f"❌ Error getting memory page: {e}")
+            return {"memories": [], "next_cursor": None}
+
+    @staticmethod
+    async def delete_memory(user_id: str, memory_id: str) -> bool:
+        """Delete a memory"""
+        try:
+            db = get_async_firestore_client()
+            memories = memory_summary.memories_ref(db, user_id)
+            memory_ref = memories.document(memory_id)
+            summary_ref = memory_summary.summary_ref(db, user_id)
+
+            @firestore.async_transactional
+            async def remove(transaction):
+                memory = await memory_ref.get(transaction=transaction)
+                if not memory.exists:
+                    return False
+                summary = await summary_ref.get(transaction=transaction)
+                newest = None
+                if summary.exists and memory_summary.needs_refill(summary.to_dict(), memory_id):
+                    query = memory_summary.refill_query(memories)
+                    newest = [(doc.id, doc.to_dict()) async for doc in query.stream(transaction=transaction)]
+                memory_summary.write_delete(transaction, memory_ref, summary_ref, memory, summary, newest)
+                return True
+
+            if not await remove(db.transaction()):
+                print(f"⚠️ Memory {memory_id} not found")
+                return False
+            try:
+                await memory_store.mirror_delete_async(user_id, memory_id)
+            except Exception as e:
+                print(f"⚠️  Failed to drop memory from local mirror: {e}")
+            print(f"✅ Memory {memory_id} deleted")
+            return True
+        except Exception as e:
+            print(f"❌ Error deleting memory: {e}")
+            return False
+
+
+class AsyncFirestoreChat:
+    """Chat history storage"""
+
+    @staticmethod
+    async def save_message(user_id: str, role: str, message: str, embeddings: List[float] = None) -> str:
+        """Save chat message"""
+        try:
+            db = get_async_firestore_client()
+            _, doc_ref = await db.collection("users").document(user_id).collection("chats").add({
+                "role": role,
+                "message": message,
+                "timestamp": datetime.utcnow(),
+                "embeddings": embeddings or []
+            })
+            return doc_ref.id
+        except Exception as e:
+            print(f"❌ Error saving message: {e}")
+            raise
+
+    @staticmethod
+    async def get_chat_history(user_id: str, limit: int = 50) -> List[Dict]:
+        """Get chat history for user"""
+        try:
+            db = get_async_firestore_client()
+            query = (db.collection("users").document(user_id).collection("chats")
+                     .order_by("timestamp", direction=firestore.Query.DESCENDING)
+                     .limit(limit))
+            return [doc.to_dict() async for doc in query.stream()]
+        except Exception as e:
+            print(f"❌ Error getting chat history: {e}")
+            return []
+
+
+class AsyncFirestoreTask:
+    """Task/Reminder storage"""
+
+    @staticmethod
+    async def create_task(user_id: str, title: str, description: str, due_date: str = None) -> str:
+        """Create a task"""
+        try:
+            db = get_async_firestore_client()
+            _, doc_ref = await db.collection("users").document(user_id).collection("tasks").add({
+                "title": title,
+                "description": description,
+                "dueDate": due_date,
+                "completed": False,
+                "createdAt": datetime.utcnow()
+            })
+            return doc_ref.id
+        except Exception as e:
+            print(f"❌ Error creating task: {e}")
+            raise
+
+    @staticmethod
+    async def get_tasks(user_id: str, completed: bool = False) -> List[Dict]:
+        """Get tasks for user"""
+        try:
+            db = get_async_firestore_client()
+            query = (db.collection("users").document(user_id).collection("tasks")
+                     .where("completed", "==", completed)
+                     .order_by("dueDate"))
+            return [doc.to_dict() async for doc in query.stream()]
+        except Exception as e:
+            print(f"❌ Error getting tasks: {e}")
+            return []
+
+    @staticmethod
+    async def mark_completed(user_id: str, task_id: str) -> bool:
+        """Mark task as completed"""
+        try:
+            db = get_async_firestore_client()
+            await db.collection("users").document(user_id).collection("tasks").document(task_id).update({
+                "completed": True,
+                "completedAt": datetime.utcnow()
+            })
+            return True
+        except Exception as e:
+            print(f"❌ Error marking task complete: {e}")
+            return False
+
+
+class AsyncFirestoreReflection:
+    """Daily/Weekly reflection storage"""
+
+    @staticmethod
+    async def save_reflection(user_id: str, title: str = "", content: str = "", type: str = "daily", analysis: Dict = None, mood: str = "thoughtful") -> str:
+        """Save a reflection with type, title, content and analysis"""
+        try:
+            db = get_async_firestore_client()
+            _, doc_ref = await db.collection("users").document(user_id).collection("reflections").add({
+                "title": title,
+                "content": content,
+                "type": type,
+                "analysis": analysis or {},
+                "mood": mood,
+                "createdAt": datetime.utcnow()
+            })
+            return doc_ref.id
+        except Exception as e:
+            print(f"❌ Error saving reflection: {e}")
+            raise
+
+    @staticmethod
+    async def get_reflections(user_id: str, limit: int = 10) -> List[Dict]:
+        """Get reflections for user"""
+        try:
+            db = get_async_firestore_client()
+            query = (db.collection("users").document(user_id).collection("reflections")
+                     .order_by("createdAt", direction=firestore.Query.DESCENDING)
+                     .limit(limit))
+            return [_with_id(doc) async for doc in query.stream()]
+        except Exception as e:
+            print(f"❌ Error getting reflections: {e}")
+            return []
+
+
+class AsyncFirestorePlan:
+    """Plans storage"""
+
+    @staticmethod
+    async def save_plan(user_id: str, goal: str, plan_data: Dict) -> str:
+        """Save a plan"""
+        try:
+            db = get_async_firestore_client()
+            if db is None:
+                raise Exception("Firestore not available")
+
+            _, doc_ref = await db.collection("users").document(user_id).collection("plans").add({
+                "goal": goal,
+                "timeframe": plan_data.get("timeframe", ""),
+                "priority": plan_data.get("priority", "medium"),
+                "steps": plan_data.get("steps", []),
+                "potential_challenges": plan_data.get("potential_challenges", []),
+                "resources_needed": plan_data.get("resources_needed", []),
+                "success_metric": plan_data.get("success_metric", ""),
+                "status": "active",
+                "createdAt": datetime.utcnow()
+            })
+            print(f"✅ Plan saved successfully with ID: {doc_ref.id}")
+            return doc_ref.id
+        except Exception as e:
+            print(f"❌ Error saving plan: {e}")
+            raise
+
+    @staticmethod
+    async def get_plans(user_id: str, status: str = None, limit: int = 20) -> List[Dict]:
+        """Get plans for user"""
+        try:
+            db = get_async_firestore_client()
+            query = db.collection("users").document(user_id).collection("plans")
+            if status:
+                query = query.where("status", "==", status)
+            query = query.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
+            return [_with_id(doc) async for doc in query.stream()]
+        except Exception as e:
+            print(f"❌ Error getting plans: {e}")
+            return []
+
+    @staticmethod
+    async def update_plan_status(user_id: str, plan_id: str, status: str) -> bool:
+        """Update plan status"""
+        return await AsyncFirestorePlan.update_plan(user_id, plan_id, {"status": status})
+
+    @staticmethod
+    async def update_plan(user_id: str, plan_id: str, updates: Dict) -> bool:
+        """Update plan with custom updates"""
+        try:
+            db = get_async_firestore_client()
+            updates["updatedAt"] = datetime.utcnow()
+            await db.collection("users").document(user_id).collection("plans").document(plan_id).update(updates)
+            print(f"✅ Plan {plan_id} updated")
+            return True
+        except Exception as e:
+            print(f"❌ Error updating plan: {e}")
+            return False
+
+    @staticmethod
+    async def delete_plan(user_id: str, plan_id: str) -> bool:
+        """Delete a plan"""
+        try:
+            db = get_async_firestore_client()
+            await db.collection("users").document(user_id).collection("plans").document(plan_id).delete()
+            print(f"✅ Plan {plan_id} deleted")
+            return True
+        except Exception as e:
+            print(f"❌ Error deleting plan: {e}")
+            return False
+
+    @staticmethod
+    async def get_plan_by_id(user_id: str, plan_id: str) -> Optional[Dict]:
+        """Get a specific plan by ID"""
+        try:
+            db = get_async_firestore_client()
+            doc = await db.collection("users").document(user_id).collection("plans").document(plan_id).get()
+            return _with_id(doc) if doc.exists else None
+        except Exception as e:
+            print(f"❌ Error getting plan: {e}")
+            return None
@@ -5,6 +5,9 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+from memory import store as memory_store
+from . import memory_mirror, memory_summary
+from tasks.schedules import update_user_schedule
 
 # Global Firestore client instance
 db = None
@@ -83,6 +86,7 @@ class FirestoreUser:
                 }
             }
             user_ref.set(user_data)
+            update_user_schedule(user_id, user_data["preferences"])
             print(f"✅ User created: {user_id}")
             return user_data
         except Exception as e:
@@ -111,6 +115,9 @@ class FirestoreUser:
             db.collection("users").document(user_id).update({
                 "preferences": preferences
             })
+            update_user_schedule(user_id, preferences)
+            from usage.profile import invalidate_user_profile
+            invalidate_user_profile(user_id)
             return True
         except Exception as e:
             print(f"❌ Error updating preferences: {e}")
@@ -118,39 +125,83 @@ class FirestoreUser:
 
 
 class FirestoreMemory:
-    """Memory (conversations) storage"""
+    """Memory (conversations) storage
+    
+    Reads are served from the local SQLite mirror in memory.store. Writes
+    go through to it, and a read pulls only documents newer than the
+    user's high-water mark when the mirror is older than
+    memory_mirror.MIRROR_SYNC_INTERVAL.
+    """
     
     @staticmethod
     def save_memory(user_id: str, title: str = "", content: str = "", category: str = "insight", tags: List[str] = None) -> str:
         """Save a memory with title, content, category and tags"""
         try:
             db = get_firestore_client()
-            memory_data = {
-                "title": title,
-                "content": content,
-                "category": category,  # learning, achievement, challenge, insight
-                "tags": tags or [],
-                "createdAt": datetime.utcnow(),
-                "relevanceScore": 1.0
-            }
+            memory_data = memory_summary.new_memory(title, content, category, tags)
             
-            doc_ref = db.collection("users").document(user_id).collection("memories").add(memory_data)
-            return doc_ref[1].id
+            memory_ref = memory_summary.memories_ref(db, user_id).document()
+            summary_ref = memory_summary.summary_ref(db, user_id)
+            
+            @firestore.transactional
+            def write(transaction):
+                summary = summary_ref.get(transaction=transaction)
+                memory_summary.write_save(transaction, memory_ref, summary_ref, summary, memory_data)
+            
+            write(db.transaction())
+            memory_id = memory_ref.id
+            
+            try:
+                memory_store.mirror_upsert(user_id, [dict(memory_data, id=memory_id)])
+            except Exception as e:
+                print(f"⚠️  Failed to mirror memory locally: {e}")
+            
+            return memory_id
         except Exception as e:
             print(f"❌ Error saving memory: {e}")
             raise
 
+    @staticmethod
+    def sync_mirror(user_id: str, force: bool = False) -> bool:
+        """
+        Pull memories created since the user's high-water mark into the
+        local mirror. Returns False if the mirror could not be brought up
+        to date and has never been synced.
+        """
+        state = memory_store.get_sync_state(user_id)
+        if memory_mirror.is_fresh(state, force):
+            return True
+        
+        try:
+            db = get_firestore_client()
+            if db is None:
+                return state is not None
+            
+            query = memory_mirror.sync_query(memory_summary.memories_ref(db, user_id), state)
+            memories = [dict(doc.to_dict(), id=doc.id) for doc in query.stream()]
+            if memories:
+                memory_store.mirror_upsert(user_id, memories)
+            memory_store.mark_synced(user_id, memory_mirror.high_water(state, memories))
+            print(f"🧠 Mirror synced {len(memories)} memories for user: {user_id}")
+            return True
+        except Exception as e:
+            print(f"❌ Error syncing memory mirror: {e}")
+            return state is not None
+
     @staticmethod
     def get_recent_memories(user_id: str, limit: int = 10) -> List[Dict]:
         """Get recent memories for user"""
         try:
+            if FirestoreMemory.sync_mirror(user_id):
+                return memory_store.mirror_query(user_id, limit=limit)
+            
             db = get_firestore_client()
             docs = (db.collection("users").document(user_id).collection("memories")
                    .order_by("createdAt", direction=firestore.Query.DESCENDING)
                    .limit(limit)
                    .stream())
             
-            return [doc.to_dict() for doc in docs]
+            return [dict(doc.to_dict(), id=doc.id) for doc in docs]
         except Exception as e:
             print(f"❌ Error getting memories: {e}")
             return []
@@ -159,6 +210,9 @@ class FirestoreMemory:
     def get_memories_by_category(user_id: str, category: str, limit: int = 10) -> List[Dict]:
         """Get memories by category"""
         try:
+            if FirestoreMemory.sync_mirror(user_id):
+                return memory_store.mirror_query(user_id, category=category, limit=limit)
+            
             db = get_firestore_client()
             if db is None:
                 print("⚠️  Firestore not available, returning empty list")
@@ -172,13 +226,94 @@ class FirestoreMemory:
                    .limit(limit)
                    .stream())
             
-            result = [doc.to_dict() for doc in docs]
+            result = [dict(doc.to_dict(), id=doc.id) for doc in docs]
             print(f"🧠 Found {len(result)} memories for category {category}")
             return result
         except Exception as e:
             print(f"❌ Error getting memories by category: {e}")
             return []
 
+    @staticmethod
+    def get_summary(user_id: str) -> Dict:
+        """Materialized summary: counts, total and newest previews"""
+        try:
+            db = get_firestore_client()
+            summary_ref = memory_summary.summary_ref(db, user_id)
+            summary = summary_ref.get()
+            if summary.exists:
+                return summary.to_dict()
+            
+            @firestore.transactional
+            def build(transaction):
+                summary = summary_ref.get(transaction=transaction)
+                if summary.exists:
+                    return summary.to_dict()
+                docs = memory_summary.memories_ref(db, user_id).stream(transaction=transaction)
+                built = memory_summary.build_summary([(doc.id, doc.to_dict()) for doc in docs])
+                transaction.set(summary_ref, built)
+                return built
+            
+            print(f"🧠 Building memory summary for user: {user_id}")
+            return build(db.transaction())
+        except Exception as e:
+            print(f"❌ Error getting memory summary: {e}")
+            return {"counts": {}, "total": 0, "latest": []}
+
+    @staticmethod
+    def get_memory_page(user_id: str, category: Optional[str] = None, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        """Newest-first page of memories after the cursor (a memory id)"""
+        try:
+            db = get_firestore_client()
+            memories = memory_summary.memories_ref(db, user_id)
+            query = memories
+            if category:
+                query = query.where("category", "==", category)
+            query = query.order_by("createdAt", direction=firestore.Query.DESCENDING)
+            if cursor:
+                after = memories.document(cursor).get()
+                if after.exists:
+                    query = query.start_after(after)
+            items = [dict(doc.to_dict(), id=doc.id) for doc in query.limit(limit).stream()]
+            return {"memories": items, "next_cursor": items[-1]["id"] if len(items) == limit else None}
+        except Exception as e:
+            print(f"❌ Error getting memory page: {e}")
+            return {"memories": [], "next_cursor": None}
+
+    @staticmethod
+    def delete_memory(user_id: str, memory_id: str) -> bool:
+        """Delete a memory"""
+        try:
+            db = get_firestore_client()
+            memories = memory_summary.memories_ref(db, user_id)
+            memory_ref = memories.document(memory_id)
+            summary_ref = memory_summary.summary_ref(db, user_id)
+            
+            @firestore.transactional
+            def remove(transaction):
+                memory = memory_ref.get(transaction=transaction)
+                if not memory.exists:
+                    return False
+                summary = summary_ref.get(transaction=transaction)
+                newest = None
+                if summary.exists and memory_summary.needs_refill(summary.to_dict(), memory_id):
+                    query = memory_summary.refill_query(memories)
+                    newest = [(doc.id, doc.to_dict()) for doc in query.stream(transaction=transaction)]
+                memory_summary.write_delete(transaction, memory_ref, summary_ref, memory, summary, newest)
+                return True
+            
+            if not remove(db.transaction()):
+                print(f"⚠️ Memory {memory_id} not found")
+                return False
+            try:
+                memory_store.mirror_delete(user_id, memory_id)
+            except Exception as e:
+                print(f"⚠️  Failed to drop memory from local mirror: {e}")
+            print(f"✅ Memory {memory_id} deleted")
+            return True
+        except Exception as e:
+            print(f"❌ Error deleting memory: {e}")
+            return False
+
 
 class FirestoreChat:
     """Chat history storage"""
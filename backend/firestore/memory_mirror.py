@@ -0,0 +1,39 @@
+# backend/firestore/memory_mirror.py
+"""
+Incremental sync of a user's memories into the local SQLite mirror.
+
+FirestoreMemory.sync_mirror and AsyncFirestoreMemory.sync_mirror only
+differ in how they stream the query; when to sync, what to ask for and
+the new high-water mark come from the pure helpers below.
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from memory import store as memory_store
+
+MIRROR_SYNC_INTERVAL = float(os.getenv("MEMORY_MIRROR_SYNC_SECONDS", "30"))
+
+
+def is_fresh(state: Optional[Tuple[float, float]], force: bool = False) -> bool:
+    """Whether the mirror was synced recently enough to serve reads as is."""
+    return bool(state) and not force and time.time() - state[1] < MIRROR_SYNC_INTERVAL
+
+
+def sync_query(memories, state: Optional[Tuple[float, float]]):
+    """Memories created since the high-water mark, oldest first."""
+    query = memories
+    if state:
+        # >= so documents sharing the high-water timestamp are not missed
+        query = query.where("createdAt", ">=", datetime.utcfromtimestamp(state[0]))
+    return query.order_by("createdAt")
+
+
+def high_water(state: Optional[Tuple[float, float]], memories: List[Dict]) -> float:
+    """High-water mark after mirroring memories."""
+    mark = state[0] if state else 0.0
+    if memories:
+        mark = max(mark, max(memory_store.to_epoch(m.get("createdAt")) for m in memories))
+    return mark
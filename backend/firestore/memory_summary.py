@@ -0,0 +1,145 @@
+# backend/firestore/memory_summary.py
+"""
+Materialized per-user memory summary.
+
+users/{uid}/summaries/memories holds per-category counts, the total and
+previews of the newest SUMMARY_PREVIEW_LIMIT memories, so listing a
+user's memories is one document read. FirestoreMemory and
+AsyncFirestoreMemory update it in the same transaction as every memory
+save and delete, using the pure helpers below. Users whose summary does
+not exist yet get it built from their memories on first read.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SUMMARY_PREVIEW_LIMIT = int(os.getenv("MEMORY_SUMMARY_PREVIEWS", "20"))
+PREVIEW_CHARS = 280
+DEFAULT_CATEGORY = "insight"
+
+
+def summary_ref(db, user_id: str):
+    return db.collection("users").document(user_id).collection("summaries").document("memories")
+
+
+def memories_ref(db, user_id: str):
+    return db.collection("users").document(user_id).collection("memories")
+
+
+def preview(memory_id: str, memory: Dict) -> Dict:
+    return {
+        "id": memory_id,
+        "title": memory.get("title", ""),
+        "text": (memory.get("content") or "")[:PREVIEW_CHARS],
+        "category": memory.get("category") or DEFAULT_CATEGORY,
+        "createdAt": memory.get("createdAt"),
+    }
+
+
+def _sort_key(item: Dict):
+    created = item.get("createdAt")
+    return created.timestamp() if isinstance(created, datetime) else 0.0
+
+
+def add_to_summary(summary: Dict, memory_id: str, memory: Dict) -> Dict:
+    """Summary after saving memory_id."""
+    counts = dict(summary.get("counts", {}))
+    category = memory.get("category") or DEFAULT_CATEGORY
+    counts[category] = counts.get(category, 0) + 1
+    latest = [preview(memory_id, memory)] + [p for p in summary.get("latest", []) if p.get("id") != memory_id]
+    return {
+        "counts": counts,
+        "total": summary.get("total", 0) + 1,
+        "latest": latest[:SUMMARY_PREVIEW_LIMIT],
+        "updatedAt": datetime.utcnow(),
+    }
+
+
+def new_memory(title: str, content: str, category: str, tags: Optional[List[str]]) -> Dict:
+    """Document data for a new memory."""
+    return {
+        "title": title,
+        "content": content,
+        "category": category,  # learning, achievement, challenge, insight
+        "tags": tags or [],
+        "createdAt": datetime.utcnow(),
+        "relevanceScore": 1.0,
+    }
+
+
+def write_save(transaction, memory_ref, summary_ref, summary, memory: Dict):
+    """Buffer a memory save and its summary update (summary is the snapshot read in transaction)."""
+    transaction.set(memory_ref, memory)
+    # A missing summary is built from scratch on first read
+    if summary.exists:
+        transaction.set(summary_ref, add_to_summary(summary.to_dict(), memory_ref.id, memory))
+
+
+def needs_refill(summary: Dict, memory_id: str) -> bool:
+    """Whether deleting memory_id leaves a gap that older memories should fill."""
+    latest = summary.get("latest", [])
+    return any(p.get("id") == memory_id for p in latest) and summary.get("total", 0) > len(latest)
+
+
+def remove_from_summary(summary: Dict, memory_id: str, memory: Dict, newest: Optional[List[Tuple[str, Dict]]] = None) -> Dict:
+    """
+    Summary after deleting memory_id. newest, when given, is the
+    (id, data) of the user's newest memories and replaces the previews.
+    """
+    counts = dict(summary.get("counts", {}))
+    category = memory.get("category") or DEFAULT_CATEGORY
+    if counts.get(category, 0) > 1:
+        counts[category] -= 1
+    else:
+        counts.pop(category, None)
+
+    if newest is not None:
+        latest = [preview(doc_id, data) for doc_id, data in newest if doc_id != memory_id]
+    else:
+        latest = [p for p in summary.get("latest", []) if p.get("id") != memory_id]
+    return {
+        "counts": counts,
+        "total": max(summary.get("total", 0) - 1, 0),
+        "latest": latest[:SUMMARY_PREVIEW_LIMIT],
+        "updatedAt": datetime.utcnow(),
+    }
+
+
+def refill_query(memories):
+    """Query for the newest memories that refill the previews after a delete."""
+    return memories.order_by("createdAt", direction="DESCENDING").limit(SUMMARY_PREVIEW_LIMIT + 1)
+
+
+def write_delete(transaction, memory_ref, summary_ref, memory, summary, newest: Optional[List[Tuple[str, Dict]]] = None):
+    """Buffer a memory delete and its summary update (memory and summary are snapshots read in transaction)."""
+    transaction.delete(memory_ref)
+    if summary.exists:
+        transaction.set(summary_ref, remove_from_summary(summary.to_dict(), memory_ref.id, memory.to_dict(), newest))
+
+
+def build_summary(memories: List[Tuple[str, Dict]]) -> Dict:
+    """Summary from scratch, for users who predate it."""
+    counts: Dict[str, int] = {}
+    for _, memory in memories:
+        category = memory.get("category") or DEFAULT_CATEGORY
+        counts[category] = counts.get(category, 0) + 1
+    latest = sorted((preview(doc_id, memory) for doc_id, memory in memories), key=_sort_key, reverse=True)
+    return {
+        "counts": counts,
+        "total": len(memories),
+        "latest": latest[:SUMMARY_PREVIEW_LIMIT],
+        "updatedAt": datetime.utcnow(),
+    }
+
+
+def format_memory(item: Dict) -> Dict:
+    """API shape for a preview or a memory document (with id)."""
+    created = item.get("createdAt")
+    return {
+        "id": item.get("id", ""),
+        "title": item.get("title", ""),
+        "text": item.get("text", item.get("content", "")),
+        "category": item.get("category") or DEFAULT_CATEGORY,
+        "created_at": created.isoformat() if isinstance(created, datetime) else str(created or ""),
+    }
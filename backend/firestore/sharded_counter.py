@@ -0,0 +1,118 @@
+# backend/firestore/sharded_counter.py
+"""
+Sharded counters for values that take more writes than one Firestore
+document sustains (about one per second).
+
+A counter is a collection of shard documents under
+{parent}/counters/{name}/shards/{i}, each holding a "count" field.
+Increments go to a random shard, so concurrent writers rarely touch the
+same document; reads sum every shard and are cached for
+COUNTER_CACHE_SECONDS. Reads sum whatever shards exist, so a counter's
+shard count can be raised (e.g. on a tier upgrade) without migrating it.
+
+Counters can carry an expiry: shard documents then get an "expireAt"
+field, which a Firestore TTL policy on the "shards" collection group
+uses to delete them.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from google.cloud import firestore
+
+COUNTER_CACHE_SECONDS = float(os.getenv("COUNTER_CACHE_SECONDS", "2"))
+COUNTER_CACHE_MAX_ENTRIES = int(os.getenv("COUNTER_CACHE_MAX_ENTRIES", "10000"))
+
+# counter path -> (expires_at, value)
+_values: "OrderedDict[str, tuple]" = OrderedDict()
+_values_lock = threading.Lock()
+
+
+def _cached(path: str) -> Optional[int]:
+    with _values_lock:
+        entry = _values.get(path)
+        if entry is None or entry[0] <= time.monotonic():
+            _values.pop(path, None)
+            return None
+        return entry[1]
+
+
+def _remember(path: str, value: int):
+    with _values_lock:
+        _values[path] = (time.monotonic() + COUNTER_CACHE_SECONDS, value)
+        _values.move_to_end(path)
+        while len(_values) > COUNTER_CACHE_MAX_ENTRIES:
+            _values.popitem(last=False)
+
+
+def _add_cached(path: str, amount: int):
+    # Keep this instance's own increments visible until the next real read
+    with _values_lock:
+        entry = _values.get(path)
+        if entry is not None:
+            _values[path] = (entry[0], entry[1] + amount)
+
+
+class ShardedCounter:
+    """A counter spread over num_shards documents under parent_ref (a DocumentReference)."""
+
+    def __init__(self, parent_ref, name: str, num_shards: int = 1, expire_at: Optional[datetime] = None):
+        self.num_shards = max(int(num_shards), 1)
+        self.expire_at = expire_at
+        self.shards_ref = parent_ref.collection("counters").document(name).collection("shards")
+        self.path = f"{parent_ref.path}/counters/{name}"
+
+    def _shard(self):
+        return self.shards_ref.document(str(random.randrange(self.num_shards)))
+
+    def _data(self, amount: int) -> dict:
+        data = {"count": firestore.Increment(amount)}
+        if self.expire_at is not None:
+            data["expireAt"] = self.expire_at
+        return data
+
+    def increment_in(self, writer, amount: int = 1):
+        """Add the increment to a WriteBatch or Transaction (not counted until the next read)."""
+        writer.set(self._shard(), self._data(amount), merge=True)
+
+    async def increment(self, amount: int = 1):
+        """Increment a random shard (AsyncDocumentReference)."""
+        await self._shard().set(self._data(amount), merge=True)
+        _add_cached(self.path, amount)
+
+    async def value(self, fresh: bool = False) -> int:
+        """Sum of all shards, cached for COUNTER_CACHE_SECONDS unless fresh."""
+        if not fresh:
+            cached = _cached(self.path)
+            if cached is not None:
+                return cached
+        total = 0
+        async for shard in self.shards_ref.stream():
+            total += (shard.to_dict() or {}).get("count", 0)
+        _remember(self.path, total)
+        return total
+
+    def value_sync(self, fresh: bool = False) -> int:
+        """value() for sync clients."""
+        if not fresh:
+            cached = _cached(self.path)
+            if cached is not None:
+                return cached
+        total = sum((shard.to_dict() or {}).get("count", 0) for shard in self.shards_ref.stream())
+        _remember(self.path, total)
+        return total
+
+    def increment_sync(self, amount: int = 1):
+        """increment() for sync clients."""
+        self._shard().set(self._data(amount), merge=True)
+        _add_cached(self.path, amount)
+
+
+def user_counter(db, user_id: str, name: str, num_shards: int = 1, expire_at: Optional[datetime] = None) -> ShardedCounter:
+    """Sharded counter under users/{uid}, for per-user statistics."""
+    return ShardedCounter(db.collection("users").document(user_id), name, num_shards, expire_at)
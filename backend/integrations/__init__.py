@@ -1,10 +1,22 @@
 # __init__.py for integrations
 from .api_client import api_client
+from .cache import BoundedCache, get_cache_stats
+from .fanout import fan_out
+from .http import get_http_client, get_sync_http_client, http_get, open_http_clients, close_http_clients, get_http_stats
 from .tmdb import get_trending_movies, get_trending_tv, search_movies
 from .spoonacular import get_random_recipes, search_recipes
 
 __all__ = [
     "api_client",
+    "BoundedCache",
+    "get_cache_stats",
+    "fan_out",
+    "get_http_client",
+    "get_sync_http_client",
+    "http_get",
+    "open_http_clients",
+    "close_http_clients",
+    "get_http_stats",
     "get_trending_movies",
     "get_trending_tv",
     "search_movies",
@@ -0,0 +1,147 @@
+# Bounded LRU + TTL cache for external API results
+"""
+BoundedCache holds at most max_entries values and roughly max_bytes of
+them, evicting least recently used entries first, and expires each entry
+after its TTL. Every operation is O(1): entries live in an OrderedDict in
+LRU order, expiry is checked on read, and each write also drops a couple
+of expired entries from the cold end so keys that are never read again
+don't sit there until evicted.
+
+Empty results (None, [], {}) and errors are cached too, for the shorter
+negative_ttl, so a failing or empty upstream isn't called on every
+request. lookup() tells such a cached empty apart from a miss.
+
+Each cache has a namespace; get_cache_stats() reports hits, misses,
+evictions and size per namespace.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "2000"))
+DEFAULT_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DEFAULT_NEGATIVE_TTL = float(os.getenv("API_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+# Expired entries dropped from the LRU end per write
+EXPIRE_PER_WRITE = 2
+
+_caches: Dict[str, "BoundedCache"] = {}
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a JSON-like API result."""
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return 1024
+
+
+class BoundedCache:
+    """key -> (value, stored_at, expires_at, size), in LRU order."""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        sizer: Callable[[Any], int] = estimate_size,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.sizer = sizer
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "negative_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+        _caches[namespace] = self
+
+    def _drop(self, key: str) -> tuple:
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+        return entry
+
+    def entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, stored_at) if key is cached and unexpired, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if entry[2] <= time.time():
+                self._drop(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["negative_hits" if not entry[0] else "hits"] += 1
+            return entry[0], entry[1]
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """(found, value); found is True for cached empty results too."""
+        entry = self.entry(key)
+        return (True, entry[0]) if entry is not None else (False, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.entry(key)
+        return entry[0] if entry is not None else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Cache value; empty values get negative_ttl unless ttl is given."""
+        if ttl is None:
+            ttl = self.ttl if value else self.negative_ttl
+        size = self.sizer(value)
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, now, now + ttl, size)
+            self._bytes += size
+            self.counters["sets"] += 1
+
+            # Expired entries at the cold end first, then LRU eviction
+            for _ in range(EXPIRE_PER_WRITE):
+                oldest = next(iter(self._entries))
+                if oldest == key or self._entries[oldest][2] > now:
+                    break
+                self._drop(oldest)
+                self.counters["expirations"] += 1
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def set_error(self, key: str, ttl: Optional[float] = None):
+        """Remember that fetching key failed, for negative_ttl."""
+        self.set(key, None, ttl if ttl is not None else self.negative_ttl)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Stats for every BoundedCache, by namespace."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
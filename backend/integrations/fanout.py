@@ -0,0 +1,43 @@
+# Bounded-concurrency fan-out for multi-item fetches
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, MutableMapping, Optional
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_ITEM_TIMEOUT = 5.0
+
+
+async def fan_out(
+    items: Iterable[Any],
+    fetch: Callable[[Any], Awaitable[Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: Optional[float] = DEFAULT_ITEM_TIMEOUT,
+    cache: Optional[MutableMapping] = None,
+) -> List[Any]:
+    """
+    Run fetch(item) for every item, at most `concurrency` at a time.
+
+    Results come back in the order of `items`. An item that fails or takes
+    longer than `timeout` seconds yields None rather than failing the batch.
+    With a cache, items already in it are not fetched and successful
+    results are added to it.
+    """
+    items = list(items)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        if cache is not None and item in cache:
+            return cache[item]
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(fetch(item), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Fetch timed out for {item!r}")
+                return None
+            except Exception as e:
+                print(f"⚠️ Fetch failed for {item!r}: {e}")
+                return None
+        if cache is not None and result is not None:
+            cache[item] = result
+        return result
+
+    return await asyncio.gather(*(run(item) for item in items))
@@ -0,0 +1,175 @@
+# Shared outbound HTTP clients
+"""
+Process-wide httpx clients, one per upstream host.
+
+Every outbound call goes through get_http_client (or http_get), so
+connections, DNS lookups and TLS sessions are reused across requests
+instead of paying setup on every call. Keeping a client per host gives
+each upstream its own connection pool, sized by HOST_LIMITS, so one slow
+API can't take every connection. HTTP/2 is used when the h2 package is
+installed (httpx[http2]); hosts that don't offer it negotiate HTTP/1.1.
+
+Async clients belong to the event loop that created them, like the
+Firestore AsyncClient. open_http_clients / close_http_clients run at app
+startup and shutdown; get_sync_http_client serves the few sync callers.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+TIMEOUT = httpx.Timeout(connect=3.0, read=10.0, write=5.0, pool=2.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+# Upstreams that get a bigger or smaller pool than DEFAULT_LIMITS
+HOST_LIMITS = {
+    "hacker-news.firebaseio.com": httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0),
+    "github.com": httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=60.0),
+}
+# Hosts whose clients are created at startup rather than on first use
+WARM_HOSTS = ["hacker-news.firebaseio.com", "www.reddit.com", "github.com"]
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_sync_clients: Dict[str, httpx.Client] = {}
+_sync_lock = threading.Lock()
+# host -> counters, shared by async and sync clients
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _host(url_or_host: str) -> str:
+    return urlsplit(url_or_host).hostname if "://" in url_or_host else url_or_host
+
+
+def _host_stats(host: str) -> Dict[str, float]:
+    stats = _stats.get(host)
+    if stats is None:
+        stats = _stats.setdefault(host, {"requests": 0, "responses": 0, "errors": 0, "failures": 0, "seconds": 0.0})
+    return stats
+
+
+def _on_request(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+    _host_stats(request.url.host)["requests"] += 1
+
+
+def _on_response(response: httpx.Response):
+    stats = _host_stats(response.request.url.host)
+    stats["responses"] += 1
+    stats["seconds"] += time.perf_counter() - response.request.extensions.get("started_at", time.perf_counter())
+    if response.status_code >= 400:
+        stats["errors"] += 1
+
+
+async def _on_request_async(request: httpx.Request):
+    _on_request(request)
+
+
+async def _on_response_async(response: httpx.Response):
+    _on_response(response)
+
+
+def _client_options(host: str) -> Dict:
+    return {
+        "timeout": TIMEOUT,
+        "limits": HOST_LIMITS.get(host, DEFAULT_LIMITS),
+        "http2": HTTP2_AVAILABLE,
+    }
+
+
+def get_http_client(url_or_host: str) -> httpx.AsyncClient:
+    """Shared AsyncClient for a host (pass the host or any URL on it)."""
+    host = _host(url_or_host)
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients.setdefault(loop, {})
+    client = clients.get(host)
+    if client is None:
+        client = httpx.AsyncClient(
+            event_hooks={"request": [_on_request_async], "response": [_on_response_async]},
+            **_client_options(host),
+        )
+        clients[host] = client
+    return client
+
+
+def get_sync_http_client(url_or_host: str) -> httpx.Client:
+    """Shared sync Client for a host, for code that can't await."""
+    host = _host(url_or_host)
+    with _sync_lock:
+        client = _sync_clients.get(host)
+        if client is None:
+            client = httpx.Client(
+                event_hooks={"request": [_on_request], "response": [_on_response]},
+                **_client_options(host),
+            )
+            _sync_clients[host] = client
+        return client
+
+
+async def http_get(url: str, **kwargs) -> httpx.Response:
+    """GET through the host's shared client, counting requests that got no response."""
+    try:
+        return await get_http_client(url).get(url, **kwargs)
+    except httpx.TransportError:
+        _host_stats(_host(url))["failures"] += 1
+        raise
+
+
+def open_http_clients():
+    """Create the clients for WARM_HOSTS on the running loop (app startup)."""
+    for host in WARM_HOSTS:
+        get_http_client(host)
+    print(f"✅ HTTP clients ready (HTTP/2 {'on' if HTTP2_AVAILABLE else 'off'})")
+
+
+async def close_http_clients():
+    """Close every client (app shutdown)."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            await client.aclose()
+        except Exception as e:
+            print(f"⚠️ Error closing HTTP client: {e}")
+    with _sync_lock:
+        for client in _sync_clients.values():
+            client.close()
+        _sync_clients.clear()
+
+
+def _open_connections(client) -> Optional[int]:
+    # httpx doesn't expose pool state publicly; best effort
+    try:
+        return len(client._transport._pool.connections)
+    except Exception:
+        return None
+
+
+def get_http_stats() -> Dict[str, Dict]:
+    """Per host: requests, 4xx/5xx errors, transport failures, mean latency and open connections."""
+    try:
+        clients = dict(_clients.get(asyncio.get_running_loop(), {}))
+    except RuntimeError:
+        clients = {}
+    stats = {}
+    for host, counters in _stats.items():
+        stats[host] = {
+            "requests": int(counters["requests"]),
+            "errors": int(counters["errors"]),
+            "failures": int(counters["failures"]),
+            "mean_ms": round(counters["seconds"] / counters["responses"] * 1000, 1) if counters["responses"] else 0.0,
+        }
+        client = clients.get(host) or _sync_clients.get(host)
+        if client is not None:
+            stats[host]["connections"] = _open_connections(client)
+    return stats
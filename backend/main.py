@@ -14,19 +14,31 @@ from agents.planning_agent import PlanningAgent
 from agents.reflection_agent import ReflectionAgent
 from agents.memory_agent import MemoryAgent
 from firestore.client import init_firebase
-from memory.store import init_db
+from firestore.async_client import (
+    AsyncFirestoreMemory,
+    AsyncFirestorePlan,
+    AsyncFirestoreReflection,
+    close_async_firestore,
+)
+from firestore.memory_summary import format_memory, preview
+from memory.store import init_db, close_db
 from tasks.store import init_tasks_db
+import asyncio
+import os
 import threading
-from tasks.worker import run_worker
+from tasks.schedules import schedule_engine
+from tasks.worker import TaskWorker
 from fastapi.responses import JSONResponse
-import time
+import math
 from auth.deps import get_current_user
 from datetime import datetime
 from usage.tracking import increment_usage, get_usage_stats, can_access_feature, update_user_tier
+from usage.profile import get_user_profile
+from usage.metering import start_metering, stop_metering
+from integrations.http import open_http_clients, close_http_clients
+from trending.api_integrations import start_trending_refresher, stop_trending_refresher
+from ratelimit import rate_limiter, rate_limit_headers, resolve_policy, route_cost, RATE_LIMIT_WINDOW_SECONDS
 
-REQUESTS = {}
-MAX_REQUESTS = 100   # per IP (increased for development)
-WINDOW = 60         # seconds
 app = FastAPI(title="whatsnextup Backend")
 
 # Initialize Firestore
@@ -43,6 +55,63 @@ init_db()
 init_tasks_db()
 
 
+# Run the task worker and schedule engine in this process, so user
+# schedules fire without a separate `python -m tasks.worker`. Set to 0
+# when dedicated worker processes run them instead.
+RUN_TASK_WORKER = os.getenv("RUN_TASK_WORKER", "1") == "1"
+task_worker = TaskWorker()
+_task_worker_run = None
+
+
+@app.on_event("startup")
+async def startup_task_worker():
+    global _task_worker_run
+    if RUN_TASK_WORKER and _task_worker_run is None:
+        threading.Thread(target=schedule_engine.run, name="schedule-engine", daemon=True).start()
+        _task_worker_run = asyncio.get_running_loop().create_task(task_worker.run())
+
+
+@app.on_event("shutdown")
+async def shutdown_task_worker():
+    global _task_worker_run
+    if _task_worker_run is not None:
+        schedule_engine.stop()
+        task_worker.stop()
+        try:
+            await asyncio.wait_for(_task_worker_run, 10)
+        except Exception as e:
+            print(f"⚠️ Task worker did not stop cleanly: {e}")
+        _task_worker_run = None
+
+
+@app.on_event("shutdown")
+def shutdown_storage():
+    close_db()
+
+
+@app.on_event("startup")
+async def startup_metering():
+    start_metering()
+
+
+@app.on_event("startup")
+async def startup_http_clients():
+    open_http_clients()
+    start_trending_refresher()
+
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    await stop_trending_refresher()
+    await close_http_clients()
+
+
+@app.on_event("shutdown")
+async def shutdown_firestore():
+    await stop_metering()
+    await close_async_firestore()
+
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +127,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 
@@ -79,10 +149,12 @@ class ReflectionRequest(BaseModel):
     mood: str = "thoughtful"
 
 @app.get("/health")
+@route_cost(0)
 def health_check():
     return {"status": "ok", "app": "whatsnextup"}
 
 @app.post("/api/chat")
+@route_cost(llm_calls=2)
 def chat(
     request: ChatRequest,
     authorization: str = Header(None)
@@ -144,36 +216,58 @@ async def rate_limit(request: Request, call_next):
     if ip in ["127.0.0.1", "localhost", "::1"]:
         return await call_next(request)
     
-    now = time.time()
+    policy = await resolve_policy(request)
+    if policy is None:
+        return await call_next(request)
 
-    REQUESTS.setdefault(ip, [])
-    REQUESTS[ip] = [t for t in REQUESTS[ip] if now - t < WINDOW]
+    key, budget, cost, name = policy
+    allowed, remaining, retry_after, reset = rate_limiter.hit(key, budget, RATE_LIMIT_WINDOW_SECONDS, cost)
+    headers = rate_limit_headers(budget, remaining, reset, name)
 
-    if len(REQUESTS[ip]) >= MAX_REQUESTS:
+    if not allowed:
+        headers["Retry-After"] = str(math.ceil(retry_after))
         return JSONResponse(
             status_code=429,
-            content={"detail": "Too many requests"}
+            content={"detail": "Too many requests"},
+            headers=headers
         )
 
-    REQUESTS[ip].append(now)
-    return await call_next(request)
-
-#threading.Thread(target=run_worker, daemon=True).start()
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
 
 # ============ MEMORY ENDPOINTS ============
 
 @app.get("/api/memories")
-def get_memories(user: dict = Depends(get_current_user)):
-    """Retrieve user's saved memories"""
+async def get_memories(
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Retrieve user's saved memories.
+    The first page comes from the materialized summary (one read); pass
+    next_cursor back, or a category, to page through the full list.
+    """
     try:
         uid = user.get("uid")
         
-        memory_agent = MemoryAgent(uid)
-        summary = memory_agent.get_memory_summary()
+        if cursor or category:
+            page = await AsyncFirestoreMemory.get_memory_page(uid, category=category, cursor=cursor, limit=limit)
+            return {
+                # Same preview shape as the summary's first page
+                "memories": [format_memory(preview(m["id"], m)) for m in page["memories"]],
+                "next_cursor": page["next_cursor"]
+            }
         
+        summary = await AsyncFirestoreMemory.get_summary(uid)
+        latest = summary.get("latest", [])[:limit]
         return {
-            "memories": summary.get("memories", []),
-            "total": summary.get("total", 0)
+            "memories": [format_memory(m) for m in latest],
+            "total": summary.get("total", 0),
+            "by_category": summary.get("counts", {}),
+            "next_cursor": latest[-1]["id"] if latest and summary.get("total", 0) > len(latest) else None
         }
     except Exception as e:
         print(f"❌ Error getting memories: {e}")
@@ -181,6 +275,7 @@ def get_memories(user: dict = Depends(get_current_user)):
 
 
 @app.post("/api/memories/draft")
+@route_cost(llm_calls=1)
 def create_memory_draft(
     request: dict,
     user: dict = Depends(get_current_user)
@@ -214,6 +309,7 @@ def create_memory_draft(
 
 
 @app.post("/api/memories/suggestions")
+@route_cost(llm_calls=1)
 def get_memory_suggestions(
     request: dict,
     user: dict = Depends(get_current_user)
@@ -239,7 +335,7 @@ def get_memory_suggestions(
 
 
 @app.post("/api/memories")
-def create_memory(
+async def create_memory(
     request: dict,
     user: dict = Depends(get_current_user)
 ):
@@ -248,12 +344,8 @@ def create_memory(
         uid = user.get("uid")
         print(f"💾 Creating memory for user: {uid}")
         
-        memory_agent = MemoryAgent(uid)
-        
         # Save memory to Firestore
-        from firestore.client import FirestoreMemory
-        memory_db = FirestoreMemory()
-        memory_id = memory_db.save_memory(
+        memory_id = await AsyncFirestoreMemory.save_memory(
             uid,
             title=request.get("title", ""),
             content=request.get("content", ""),
@@ -276,9 +368,32 @@ def create_memory(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete("/api/memories/{memory_id}")
+def delete_memory(
+    memory_id: str,
+    user: dict = Depends(get_current_user)
+):
+    """Delete a memory"""
+    try:
+        uid = user.get("uid")
+        print(f"🧠 Deleting memory {memory_id} for user {uid}")
+        
+        memory_agent = MemoryAgent(uid)
+        if not memory_agent.delete_memory(memory_id):
+            raise HTTPException(status_code=404, detail="Memory not found")
+        
+        return {"id": memory_id, "deleted": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error deleting memory: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============ PLANS ENDPOINTS ============
 
 @app.post("/api/plans/draft")
+@route_cost(llm_calls=1)
 def create_draft_plan(
     request: PlanRequest,
     user: dict = Depends(get_current_user)
@@ -309,6 +424,7 @@ def create_draft_plan(
 
 
 @app.post("/api/plans/refine")
+@route_cost(llm_calls=2)
 def refine_plan_draft(
     request: RefineRequest,
     user: dict = Depends(get_current_user)
@@ -349,14 +465,12 @@ def refine_plan_draft(
 
 
 @app.get("/api/plans")
-def get_plans(user: dict = Depends(get_current_user)):
+async def get_plans(user: dict = Depends(get_current_user)):
     """Retrieve user's plans"""
     try:
         uid = user.get("uid")
         
-        from firestore.client import FirestorePlan
-        plans_db = FirestorePlan()
-        plans = plans_db.get_plans(uid, limit=20)
+        plans = await AsyncFirestorePlan.get_plans(uid, limit=20)
         
         return {
             "plans": plans,
@@ -368,6 +482,7 @@ def get_plans(user: dict = Depends(get_current_user)):
 
 
 @app.post("/api/plans")
+@route_cost(llm_calls=2)
 def create_plan(
     request: PlanRequest,
     user: dict = Depends(get_current_user)
@@ -436,7 +551,7 @@ Keep it to 1-2 sentences. Be specific and encouraging."""
 
 
 @app.get("/api/plans/{plan_id}")
-def get_plan(
+async def get_plan(
     plan_id: str,
     user: dict = Depends(get_current_user)
 ):
@@ -445,10 +560,7 @@ def get_plan(
         uid = user.get("uid")
         print(f"📋 Fetching plan {plan_id} for user {uid}")
         
-        from firestore.client import FirestorePlan
-        plans_db = FirestorePlan()
-        
-        plan = plans_db.get_plan_by_id(uid, plan_id)
+        plan = await AsyncFirestorePlan.get_plan_by_id(uid, plan_id)
         
         if not plan:
             raise HTTPException(status_code=404, detail="Plan not found")
@@ -465,7 +577,7 @@ def get_plan(
 # ============ REFLECTIONS ENDPOINTS ============
 
 @app.put("/api/plans/{plan_id}")
-def update_plan(
+async def update_plan(
     plan_id: str,
     updates: dict,
     user: dict = Depends(get_current_user)
@@ -475,11 +587,8 @@ def update_plan(
         uid = user.get("uid")
         print(f"📋 Updating plan {plan_id} for user {uid}: {updates}")
         
-        from firestore.client import FirestorePlan
-        plans_db = FirestorePlan()
-        
         # Update the plan
-        plans_db.update_plan(uid, plan_id, updates)
+        await AsyncFirestorePlan.update_plan(uid, plan_id, updates)
         
         print(f"✅ Plan {plan_id} updated successfully")
         return {"id": plan_id, "updated": True, "updates": updates}
@@ -489,7 +598,7 @@ def update_plan(
 
 
 @app.delete("/api/plans/{plan_id}")
-def delete_plan(
+async def delete_plan(
     plan_id: str,
     user: dict = Depends(get_current_user)
 ):
@@ -498,11 +607,8 @@ def delete_plan(
         uid = user.get("uid")
         print(f"📋 Deleting plan {plan_id} for user {uid}")
         
-        from firestore.client import FirestorePlan
-        plans_db = FirestorePlan()
-        
         # Delete the plan
-        plans_db.delete_plan(uid, plan_id)
+        await AsyncFirestorePlan.delete_plan(uid, plan_id)
         
         print(f"✅ Plan {plan_id} deleted successfully")
         return {"id": plan_id, "deleted": True}
@@ -512,6 +618,7 @@ def delete_plan(
 
 
 @app.post("/api/plans/suggestions")
+@route_cost(llm_calls=1)
 def get_plan_suggestions(
     request: dict,
     user: dict = Depends(get_current_user)
@@ -607,14 +714,12 @@ Return as JSON array: ["metric 1", "metric 2", "metric 3"]""",
 
 
 @app.get("/api/reflections")
-def get_reflections(user: dict = Depends(get_current_user)):
+async def get_reflections(user: dict = Depends(get_current_user)):
     """Retrieve user's reflections"""
     try:
         uid = user.get("uid")
         
-        from firestore.client import FirestoreReflection
-        reflections_db = FirestoreReflection()
-        reflections = reflections_db.get_reflections(uid, limit=20)
+        reflections = await AsyncFirestoreReflection.get_reflections(uid, limit=20)
         
         # Format for frontend
         formatted = []
@@ -639,6 +744,7 @@ def get_reflections(user: dict = Depends(get_current_user)):
 
 
 @app.post("/api/reflections/draft")
+@route_cost(llm_calls=1)
 def create_reflection_draft(
     request: dict,
     user: dict = Depends(get_current_user)
@@ -672,6 +778,7 @@ def create_reflection_draft(
 
 
 @app.post("/api/reflections/suggestions")
+@route_cost(llm_calls=1)
 def get_reflection_suggestions(
     request: dict,
     user: dict = Depends(get_current_user)
@@ -697,7 +804,7 @@ def get_reflection_suggestions(
 
 
 @app.post("/api/reflections")
-def create_reflection(
+async def create_reflection(
     request: dict,
     user: dict = Depends(get_current_user)
 ):
@@ -707,9 +814,7 @@ def create_reflection(
         print(f"💭 Creating reflection for user: {uid}")
         
         # Save to Firestore
-        from firestore.client import FirestoreReflection
-        reflections_db = FirestoreReflection()
-        reflection_id = reflections_db.save_reflection(
+        reflection_id = await AsyncFirestoreReflection.save_reflection(
             uid,
             title=request.get("title", "Reflection"),
             content=request.get("content", ""),
@@ -741,6 +846,7 @@ def create_reflection(
 # ============ DISCOVERY ENDPOINTS (No Auth Required) ============
 
 @app.get("/api/discovery/entertainment")
+@route_cost(llm_calls=1)
 async def discovery_entertainment(category: str = "movies"):
     """Get entertainment suggestions (movies, TV shows, etc.)"""
     try:
@@ -753,6 +859,7 @@ async def discovery_entertainment(category: str = "movies"):
 
 
 @app.get("/api/discovery/food")
+@route_cost(llm_calls=1)
 async def discovery_food(cuisine: str = None):
     """Get food and recipe suggestions"""
     try:
@@ -765,6 +872,7 @@ async def discovery_food(cuisine: str = None):
 
 
 @app.get("/api/discovery/learning")
+@route_cost(llm_calls=1)
 async def discovery_learning(topic: str = None):
     """Get learning suggestions"""
     try:
@@ -777,6 +885,7 @@ async def discovery_learning(topic: str = None):
 
 
 @app.get("/api/discovery/travel")
+@route_cost(llm_calls=1)
 async def discovery_travel(location: str = None):
     """Get travel suggestions"""
     try:
@@ -789,6 +898,7 @@ async def discovery_travel(location: str = None):
 
 
 @app.get("/api/discovery/wellness")
+@route_cost(llm_calls=1)
 async def discovery_wellness(focus: str = None):
     """Get wellness suggestions"""
     try:
@@ -801,6 +911,7 @@ async def discovery_wellness(focus: str = None):
 
 
 @app.get("/api/discovery/shopping")
+@route_cost(llm_calls=1)
 async def discovery_shopping(category: str = None):
     """Get shopping suggestions"""
     try:
@@ -813,6 +924,7 @@ async def discovery_shopping(category: str = None):
 
 
 @app.get("/api/discovery/hobbies")
+@route_cost(llm_calls=1)
 async def discovery_hobbies(interest: str = None):
     """Get hobby suggestions"""
     try:
@@ -825,6 +937,7 @@ async def discovery_hobbies(interest: str = None):
 
 
 @app.get("/api/discovery/home")
+@route_cost(llm_calls=1)
 async def discovery_home(room: str = None):
     """Get home improvement suggestions"""
     try:
@@ -837,6 +950,7 @@ async def discovery_home(room: str = None):
 
 
 @app.get("/api/discovery/career")
+@route_cost(llm_calls=1)
 async def discovery_career(field: str = None):
     """Get career development suggestions"""
     try:
@@ -849,6 +963,7 @@ async def discovery_career(field: str = None):
 
 
 @app.get("/api/discovery/events")
+@route_cost(llm_calls=1)
 async def discovery_events(location: str = None):
     """Get event suggestions"""
     try:
@@ -969,10 +1084,12 @@ def get_all_agents(user: dict = Depends(get_current_user)):
 
 
 @app.post("/api/agents/{agent_id}/chat")
+@route_cost(llm_calls=1)
 async def chat_with_agent(
     agent_id: str,
     request: dict,
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    profile: dict = Depends(get_user_profile)
 ):
     """Chat with a specific AI agent"""
     try:
@@ -983,9 +1100,9 @@ async def chat_with_agent(
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
         # Check usage limits
-        can_send = await increment_usage(uid)
+        can_send = await increment_usage(uid, profile)
         if not can_send:
-            usage_stats = await get_usage_stats(uid)
+            usage_stats = await get_usage_stats(uid, profile)
             limit = usage_stats.get('limit', 15)  # Default limit is 15
             raise HTTPException(
                 status_code=429,
@@ -1012,7 +1129,7 @@ async def chat_with_agent(
         response = await agent.process_message(message, uid, context=request.get("context"))
         
         # Save conversation to history (only for Plus and Pro users)
-        can_save = await can_access_feature(uid, "conversations_history")
+        can_save = await can_access_feature(uid, "conversations_history", profile)
         if can_save:
             try:
                 from conversations.store import save_conversation_message
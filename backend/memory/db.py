@@ -0,0 +1,269 @@
+# backend/memory/db.py
+"""
+SQLite connection handling shared by the local stores.
+
+Each thread gets one long-lived connection per database, opened in WAL
+mode with tuned pragmas, instead of paying connect/close and a cold page
+cache on every call. Statements are cached per connection by sqlite3
+itself (cached_statements), so callers should pass the same SQL string
+each time rather than formatting values into it.
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+# Statement cache size per connection (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MB
+    "PRAGMA cache_size=-65536",     # 64 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """Thread-local sqlite3 connections to a single database file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: Sequence[str]):
+    """
+    Bring a database up to date.
+
+    migrations[i] moves the schema from version i to i + 1; the current
+    version is tracked in PRAGMA user_version, so this is idempotent and
+    only runs the steps a database has not seen yet.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, sql in enumerate(migrations[version:], start=version + 1):
+        try:
+            conn.executescript(f"BEGIN; {sql}; PRAGMA user_version = {target}; COMMIT;")
+        except Exception:
+            conn.rollback()
+            raise
+
+
+class AsyncSQLite:
+    """
+    Async front end for a ConnectionPool that keeps sqlite3 off the event loop.
+
+    Writes go through a queue to one dedicated writer thread, so they are
+    serialised without contending for SQLite's write lock. Reads run on a
+    small thread pool, each thread with its own pooled connection; WAL lets
+    them proceed while the writer commits. Both return awaitables that
+    resolve on the caller's loop.
+
+    The writer group-commits: once a write arrives it keeps collecting
+    queued writes for up to batch_window seconds or batch_size writes,
+    whichever comes first, and commits them in one transaction. Each write
+    runs in its own savepoint so one failure does not sink the batch, and
+    callers are only resolved after the commit, so an awaited write is
+    durable. If the writer thread dies, every write it was holding or that
+    is still queued fails with WriterStopped, and the next write starts a
+    new writer.
+
+    Work is passed as a function taking the connection first, e.g.
+    await db.read(lambda conn: conn.execute(SQL, args).fetchall()).
+    """
+
+    def __init__(self, pool: ConnectionPool, readers: int = 4, batch_window: float = 0.002, batch_size: int = 256):
+        self.pool = pool
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._readers = readers
+        self._read_executor = None
+        self._queue = queue.Queue()
+        self._writer = None
+        # Guards starting the threads and enqueueing, so no write lands in
+        # the queue after a dying writer has drained it
+        self._lock = threading.Lock()
+
+    def _start_reader(self):
+        with self._lock:
+            if self._read_executor is None:
+                self._read_executor = ThreadPoolExecutor(max_workers=self._readers, thread_name_prefix=f"sqlite-read-{os.path.basename(self.pool.path)}")
+
+    def _enqueue(self, item: tuple):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name=f"sqlite-write-{os.path.basename(self.pool.path)}", daemon=True)
+                self._writer.start()
+            self._queue.put(item)
+
+    def _collect(self, first) -> tuple:
+        """Gather a batch starting with first. Returns (batch, stop)."""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list):
+        outcomes = []
+        try:
+            conn.execute("BEGIN")
+            for fn, args, _, _ in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((fn(conn, *args), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((None, e))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(None, e)] * len(batch)
+
+        for item, (result, error) in zip(batch, outcomes):
+            _deliver(item, result, error)
+
+    def _run_writer(self):
+        conn = None
+        batch = []
+        try:
+            conn = self.pool.connection()
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch, stop = self._collect(item)
+                self._commit_batch(conn, batch)
+                batch = []
+        except BaseException as e:
+            print(f"❌ SQLite writer for {self.pool.path} stopped: {e!r}")
+            raise
+        finally:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            # Nobody else will resolve these; later writes start a new writer
+            stopped = WriterStopped(f"SQLite writer for {self.pool.path} stopped")
+            with self._lock:
+                self._writer = None
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+            for item in batch:
+                _deliver(item, None, stopped)
+
+    async def write(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) in a transaction on the writer thread."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._enqueue((fn, args, future, loop))
+        return await future
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """write() for sync code: returns a concurrent Future for the result."""
+        future = Future()
+        self._enqueue((fn, args, future, None))
+        return future
+
+    async def read(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) on a reader thread."""
+        if self._read_executor is None:
+            self._start_reader()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, self._call_read, fn, args)
+
+    def _call_read(self, fn: Callable, args: tuple) -> Any:
+        return fn(self.pool.connection(), *args)
+
+    def close(self):
+        """Flush queued writes, then stop the writer and reader threads."""
+        with self._lock:
+            writer, executor = self._writer, self._read_executor
+            self._read_executor = None
+            if writer is not None:
+                self._queue.put(None)
+        if writer is not None:
+            writer.join()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class WriterStopped(RuntimeError):
+    """The writer thread exited before committing this write."""
+
+
+def _deliver(item: tuple, result: Any, error: Optional[BaseException]):
+    _, _, future, loop = item
+    if loop is None:
+        # From submit(): a concurrent Future, safe to resolve from here
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+        return
+    try:
+        loop.call_soon_threadsafe(_resolve, future, result, error)
+    except RuntimeError:
+        # The caller's loop is closed; nobody is waiting for this result
+        pass
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -1,82 +1,288 @@
-import sqlite3
-from datetime import datetime
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
 from typing import Optional, List, Dict
 
-DB_NAME = "memory.db"
+from memory.db import AsyncSQLite, ConnectionPool, apply_migrations
+
+DB_NAME = os.getenv("MEMORY_DB_PATH", "memory.db")
+
+# Group commit: writes already queued, plus any arriving within this window,
+# share one transaction. 0 batches whatever is queued without waiting, which
+# benchmarks best when callers await each write (bench_memory_group_commit).
+WRITE_BATCH_WINDOW_MS = float(os.getenv("MEMORY_WRITE_BATCH_MS", "0"))
+WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "256"))
+
+# Schema history. Append new steps; never edit one that has shipped.
+MIGRATIONS = [
+    # 1: original table
+    """
+    CREATE TABLE IF NOT EXISTS memories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        content TEXT NOT NULL,
+        category TEXT,
+        created_at TEXT NOT NULL
+    )
+    """,
+    # 2: indexes for get_memories (with and without a category filter)
+    """
+    CREATE INDEX IF NOT EXISTS idx_memories_user_category_id ON memories (user_id, category, id);
+    CREATE INDEX IF NOT EXISTS idx_memories_user_id ON memories (user_id, id)
+    """,
+    # 3: full-text index over content, kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+        content, user_id, category,
+        content='memories', content_rowid='id',
+        tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+        INSERT INTO memories_fts (rowid, content, user_id, category)
+        VALUES (new.id, new.content, new.user_id, new.category);
+    END;
+    CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+        INSERT INTO memories_fts (memories_fts, rowid, content, user_id, category)
+        VALUES ('delete', old.id, old.content, old.user_id, old.category);
+    END;
+    CREATE TRIGGER IF NOT EXISTS memories_fts_update AFTER UPDATE ON memories BEGIN
+        INSERT INTO memories_fts (memories_fts, rowid, content, user_id, category)
+        VALUES ('delete', old.id, old.content, old.user_id, old.category);
+        INSERT INTO memories_fts (rowid, content, user_id, category)
+        VALUES (new.id, new.content, new.user_id, new.category);
+    END;
+    INSERT INTO memories_fts (memories_fts) VALUES ('rebuild')
+    """,
+    # 4: local mirror of Firestore memories plus per-user sync state
+    """
+    CREATE TABLE IF NOT EXISTS firestore_memories (
+        doc_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT,
+        content TEXT,
+        category TEXT,
+        tags TEXT,
+        relevance REAL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_firestore_memories_user_created ON firestore_memories (user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_firestore_memories_user_category_created ON firestore_memories (user_id, category, created_at);
+    CREATE TABLE IF NOT EXISTS firestore_sync (
+        user_id TEXT PRIMARY KEY,
+        high_water REAL NOT NULL,
+        synced_at REAL NOT NULL
+    )
+    """,
+]
+
+INSERT_MEMORY = "INSERT INTO memories (user_id, content, category, created_at) VALUES (?, ?, ?, ?)"
+SELECT_BY_CATEGORY = "SELECT content, category, created_at FROM memories WHERE user_id = ? AND category = ? ORDER BY id DESC LIMIT ?"
+SELECT_BY_USER = "SELECT content, category, created_at FROM memories WHERE user_id = ? ORDER BY id DESC LIMIT ?"
+SELECT_RECENT = "SELECT content FROM memories ORDER BY id DESC LIMIT ?"
+# The FTS user_id/category columns narrow the match inside the index; the
+# join re-checks them exactly since FTS matches on tokens
+SEARCH_MEMORIES = """
+    SELECT m.content, m.category, m.created_at, bm25(memories_fts, 1.0, 0.0, 0.0) AS rank
+    FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid
+    WHERE memories_fts MATCH ? AND m.user_id = ? AND (? IS NULL OR m.category = ?)
+    ORDER BY rank LIMIT ?
+"""
+
+UPSERT_MIRROR = """
+    INSERT INTO firestore_memories (doc_id, user_id, title, content, category, tags, relevance, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (doc_id) DO UPDATE SET
+        title = excluded.title, content = excluded.content, category = excluded.category,
+        tags = excluded.tags, relevance = excluded.relevance, created_at = excluded.created_at
+"""
+DELETE_MIRROR = "DELETE FROM firestore_memories WHERE doc_id = ? AND user_id = ?"
+SELECT_MIRROR_BY_USER = """
+    SELECT doc_id, title, content, category, tags, relevance, created_at FROM firestore_memories
+    WHERE user_id = ? ORDER BY created_at DESC LIMIT ?
+"""
+SELECT_MIRROR_BY_CATEGORY = """
+    SELECT doc_id, title, content, category, tags, relevance, created_at FROM firestore_memories
+    WHERE user_id = ? AND category = ? ORDER BY created_at DESC LIMIT ?
+"""
+SELECT_SYNC_STATE = "SELECT high_water, synced_at FROM firestore_sync WHERE user_id = ?"
+UPSERT_SYNC_STATE = """
+    INSERT INTO firestore_sync (user_id, high_water, synced_at) VALUES (?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        high_water = MAX(high_water, excluded.high_water), synced_at = excluded.synced_at
+"""
+
+# Cap on query terms passed to FTS; long messages add cost but little recall
+MAX_SEARCH_TERMS = 16
+
+pool = ConnectionPool(DB_NAME)
+db = AsyncSQLite(pool, batch_window=WRITE_BATCH_WINDOW_MS / 1000, batch_size=WRITE_BATCH_SIZE)
 
 
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """This thread's pooled connection. Do not close it."""
+    return pool.connection()
 
 
 def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS memories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            content TEXT NOT NULL,
-            category TEXT,
-            created_at TEXT NOT NULL
-        )
-    """)
+    apply_migrations(get_connection(), MIGRATIONS)
+
 
-    conn.commit()
-    conn.close()
+def close_db():
+    """Drain pending writes and stop the storage threads (app shutdown)."""
+    db.close()
+
+
+def _insert_memory(conn, user_id: str, content: str, category: str, created_at: str):
+    conn.execute(INSERT_MEMORY, (user_id, content, category, created_at))
+
+
+def _select_memories(conn, user_id: str, category: Optional[str], limit: int):
+    if category:
+        return conn.execute(SELECT_BY_CATEGORY, (user_id, category, limit)).fetchall()
+    return conn.execute(SELECT_BY_USER, (user_id, limit)).fetchall()
 
 
 async def save_memory(user_id: str, data: Dict):
     """Save a memory for a user"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     content = data.get("text", data.get("content", ""))
     category = data.get("category", "general")
 
-    cursor.execute(
-        "INSERT INTO memories (user_id, content, category, created_at) VALUES (?, ?, ?, ?)",
-        (user_id, content, category, datetime.utcnow().isoformat())
-    )
-
-    conn.commit()
-    conn.close()
+    await db.write(_insert_memory, user_id, content, category, datetime.utcnow().isoformat())
 
 
 async def get_memories(user_id: str, category: Optional[str] = None, limit: int = 5) -> List[Dict]:
     """Get recent memories for a user"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    rows = await db.read(_select_memories, user_id, category, limit)
+    return [{"text": row[0], "category": row[1], "created_at": row[2]} for row in rows]
+
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
 
+
+def build_match_query(user_id: str, query: str, category: Optional[str] = None) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression scoped to one user.
+    Any of the query's words may match; bm25 ranks rows matching more
+    (and rarer) words higher. Returns None if the text has no words.
+    """
+    terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    match = f"user_id : {_fts_phrase(user_id)}"
     if category:
-        cursor.execute(
-            "SELECT content, category, created_at FROM memories WHERE user_id = ? AND category = ? ORDER BY id DESC LIMIT ?",
-            (user_id, category, limit)
-        )
-    else:
-        cursor.execute(
-            "SELECT content, category, created_at FROM memories WHERE user_id = ? ORDER BY id DESC LIMIT ?",
-            (user_id, limit)
+        match += f" AND category : {_fts_phrase(category)}"
+    return match + " AND content : (" + " OR ".join(_fts_phrase(t) for t in terms) + ")"
+
+
+def _search_memories(conn, match: str, user_id: str, category: Optional[str], limit: int):
+    return conn.execute(SEARCH_MEMORIES, (match, user_id, category, category, limit)).fetchall()
+
+
+async def search_memories(user_id: str, query: str, category: Optional[str] = None, limit: int = 5) -> List[Dict]:
+    """Keyword search over a user's memories, best match first"""
+    match = build_match_query(user_id, query, category)
+    if match is None:
+        return []
+    rows = await db.read(_search_memories, match, user_id, category, limit)
+    return [{"text": row[0], "category": row[1], "created_at": row[2], "rank": row[3]} for row in rows]
+
+
+# ============================================================================
+# FIRESTORE MIRROR
+#
+# A local copy of users/{uid}/memories used as a read-through cache by
+# FirestoreMemory. Reads use the calling thread's pooled connection.
+# Writes go through the single writer thread like every other write:
+# the sync versions (for FirestoreMemory) wait for it, the _async ones
+# (for AsyncFirestoreMemory) await it.
+# ============================================================================
+
+def to_epoch(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value or 0)
+
+
+def _mirror_rows(user_id: str, memories: List[Dict]) -> List[tuple]:
+    return [
+        (
+            memory["id"], user_id, memory.get("title", ""), memory.get("content", ""),
+            memory.get("category"), json.dumps(memory.get("tags") or []),
+            memory.get("relevanceScore", 1.0), to_epoch(memory.get("createdAt")),
         )
+        for memory in memories
+    ]
 
-    rows = cursor.fetchall()
-    conn.close()
 
-    return [{"text": row[0], "category": row[1], "created_at": row[2]} for row in rows]
+def _upsert_mirror(conn, rows: List[tuple]):
+    conn.executemany(UPSERT_MIRROR, rows)
 
 
-def get_recent_memories(limit: int = 5):
-    """Legacy function - get all recent memories"""
+def _delete_mirror(conn, doc_id: str, user_id: str):
+    conn.execute(DELETE_MIRROR, (doc_id, user_id))
+
+
+def _mark_synced(conn, user_id: str, high_water: float, synced_at: float):
+    conn.execute(UPSERT_SYNC_STATE, (user_id, high_water, synced_at))
+
+
+def mirror_upsert(user_id: str, memories: List[Dict]):
+    """Write Firestore memory documents (with their "id") into the mirror."""
+    db.submit(_upsert_mirror, _mirror_rows(user_id, memories)).result()
+
+
+async def mirror_upsert_async(user_id: str, memories: List[Dict]):
+    await db.write(_upsert_mirror, _mirror_rows(user_id, memories))
+
+
+def mirror_delete(user_id: str, doc_id: str):
+    db.submit(_delete_mirror, doc_id, user_id).result()
+
+
+async def mirror_delete_async(user_id: str, doc_id: str):
+    await db.write(_delete_mirror, doc_id, user_id)
+
+
+def mirror_query(user_id: str, category: Optional[str] = None, limit: int = 10) -> List[Dict]:
+    """Mirrored memories, newest first, shaped like Firestore documents."""
     conn = get_connection()
-    cursor = conn.cursor()
+    if category:
+        rows = conn.execute(SELECT_MIRROR_BY_CATEGORY, (user_id, category, limit)).fetchall()
+    else:
+        rows = conn.execute(SELECT_MIRROR_BY_USER, (user_id, limit)).fetchall()
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "content": row[2],
+            "category": row[3],
+            "tags": json.loads(row[4]) if row[4] else [],
+            "relevanceScore": row[5],
+            "createdAt": datetime.utcfromtimestamp(row[6]),
+        }
+        for row in rows
+    ]
 
-    cursor.execute(
-        "SELECT content FROM memories ORDER BY id DESC LIMIT ?",
-        (limit,)
-    )
 
-    rows = cursor.fetchall()
-    conn.close()
+def get_sync_state(user_id: str) -> Optional[tuple]:
+    """(high_water, synced_at) epoch seconds, or None if never synced."""
+    return get_connection().execute(SELECT_SYNC_STATE, (user_id,)).fetchone()
 
+
+def mark_synced(user_id: str, high_water: float):
+    db.submit(_mark_synced, user_id, high_water, time.time()).result()
+
+
+async def mark_synced_async(user_id: str, high_water: float):
+    await db.write(_mark_synced, user_id, high_water, time.time())
+
+
+def get_recent_memories(limit: int = 5):
+    """Legacy function - get all recent memories"""
+    rows = get_connection().execute(SELECT_RECENT, (limit,)).fetchall()
     return [row[0] for row in rows]
@@ -0,0 +1,31 @@
+"""
+Request rate limiting.
+"""
+
+from .limiter import (
+    rate_limiter,
+    get_rate_limit_stats,
+    RateLimiter,
+    MemoryBackend,
+    SQLiteBackend,
+)
+from .policies import (
+    route_cost,
+    resolve_policy,
+    rate_limit_headers,
+    LLM_CALL_COST,
+    RATE_LIMIT_WINDOW_SECONDS,
+)
+
+__all__ = [
+    "rate_limiter",
+    "get_rate_limit_stats",
+    "RateLimiter",
+    "MemoryBackend",
+    "SQLiteBackend",
+    "route_cost",
+    "resolve_policy",
+    "rate_limit_headers",
+    "LLM_CALL_COST",
+    "RATE_LIMIT_WINDOW_SECONDS",
+]
@@ -0,0 +1,189 @@
+"""
+GCRA rate limiting with bounded memory.
+
+GCRA (the generic cell rate algorithm, a token bucket expressed as one
+number) keeps a single "theoretical arrival time" per key: the time at
+which the key's budget would be fully replenished. A request costing c
+against `limit` per `period` is allowed when pushing that time forward
+by c * period / limit keeps it within `period` of now. Each check is one
+lookup and one store, so the cost per request is O(1) however busy the
+key is, and each key costs one float.
+
+A key whose arrival time has passed is back to a full budget, which is
+exactly the state of a key that was never seen, so idle keys are dropped
+by a periodic sweep on the shared timer thread without changing any
+decision. The in-process backend is also capped at RATE_LIMIT_MAX_KEYS,
+evicting the least recently used key (which resets that key's budget).
+
+Set RATE_LIMIT_BACKEND=sqlite to keep state in RATE_LIMIT_DB_PATH, so the
+limits hold across all workers sharing that file.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from agents.background_tasks import timer_scheduler
+from memory.db import ConnectionPool, apply_migrations
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "rate_limits.db")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "60"))
+# Slack for float rounding, so `limit` requests of cost 1 fit in one period
+EPSILON = 1e-9
+
+
+class MemoryBackend:
+    """OrderedDict in LRU order: key -> theoretical arrival time."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key: str, now: float, increment: float, period: float) -> Tuple[bool, float]:
+        """(allowed, arrival time): advance key by increment if that stays within period of now."""
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            if tat + increment - period > now + EPSILON:
+                return False, tat
+            self._tats[key] = tat + increment
+            self._tats.move_to_end(key)
+            if len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return True, tat + increment
+
+    def sweep(self, now: float) -> int:
+        """Drop keys that are back to a full budget. Returns how many."""
+        with self._lock:
+            idle = [key for key, tat in self._tats.items() if tat <= now]
+            for key in idle:
+                del self._tats[key]
+            return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteBackend:
+    """Same interface as MemoryBackend, stored in a SQLite file shared by workers."""
+
+    MIGRATIONS = [
+        # 1: arrival time per key
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tat REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_rate_limits_tat ON rate_limits (tat)
+        """,
+    ]
+
+    # Check and advance in one statement, so concurrent workers can't both
+    # spend the last of a budget. No row comes back when it is denied.
+    UPDATE = """
+        INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :increment)
+        ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :increment
+        WHERE max(tat, :now) + :increment - :period <= :now + :epsilon
+        RETURNING tat
+    """
+    SELECT = "SELECT tat FROM rate_limits WHERE key = ?"
+    SWEEP = "DELETE FROM rate_limits WHERE tat <= ?"
+    COUNT = "SELECT COUNT(*) FROM rate_limits"
+
+    def __init__(self, path: str):
+        self.pool = ConnectionPool(path)
+        apply_migrations(self.pool.connection(), self.MIGRATIONS)
+
+    def update(self, key: str, now: float, increment: float, period: float) -> Tuple[bool, float]:
+        if increment > period + EPSILON:
+            # Never fits; the insert path would otherwise admit it for a new key
+            return False, self._tat(key, now)
+        conn = self.pool.connection()
+        with conn:
+            row = conn.execute(self.UPDATE, {"key": key, "now": now, "increment": increment, "period": period, "epsilon": EPSILON}).fetchone()
+        if row is None:
+            return False, self._tat(key, now)
+        return True, row[0]
+
+    def _tat(self, key: str, now: float) -> float:
+        row = self.pool.connection().execute(self.SELECT, (key,)).fetchone()
+        return max(row[0], now) if row else now
+
+    def sweep(self, now: float) -> int:
+        conn = self.pool.connection()
+        with conn:
+            return conn.execute(self.SWEEP, (now,)).rowcount
+
+    def __len__(self) -> int:
+        return self.pool.connection().execute(self.COUNT).fetchone()[0]
+
+
+class RateLimiter:
+    """GCRA limits over a pluggable backend."""
+
+    def __init__(self, backend, sweep_seconds: float = RATE_LIMIT_SWEEP_SECONDS):
+        self.backend = backend
+        self.sweep_seconds = sweep_seconds
+        self.counters = {"allowed": 0, "limited": 0, "swept": 0}
+        self._sweep_timer = None
+        self._lock = threading.Lock()
+
+    def _ensure_sweeper(self):
+        if self._sweep_timer is None and self.sweep_seconds > 0:
+            with self._lock:
+                if self._sweep_timer is None:
+                    self._sweep_timer = timer_scheduler.schedule(self.sweep_seconds, self._sweep_tick, name="rate-limit-sweep")
+
+    def _sweep_tick(self):
+        try:
+            self.sweep()
+        except Exception as e:
+            print(f"❌ Error sweeping rate limits: {e}")
+        finally:
+            self._sweep_timer = timer_scheduler.schedule(self.sweep_seconds, self._sweep_tick, name="rate-limit-sweep")
+
+    def hit(self, key: str, limit: int, period: float, cost: float = 1, now: Optional[float] = None) -> Tuple[bool, int, float, float]:
+        """
+        Spend cost from key's budget of limit per period.
+        Returns (allowed, remaining, retry_after, reset): the budget left,
+        seconds until this request would fit, and seconds until the budget
+        is full again.
+        """
+        now = time.time() if now is None else now
+        interval = period / limit
+        allowed, tat = self.backend.update(key, now, cost * interval, period)
+        self._ensure_sweeper()
+        with self._lock:
+            self.counters["allowed" if allowed else "limited"] += 1
+        remaining = max(int((period - (tat - now)) / interval + EPSILON), 0)
+        retry_after = 0.0 if allowed else max(tat + cost * interval - period - now, 0.0)
+        return allowed, remaining, retry_after, max(tat - now, 0.0)
+
+    def sweep(self) -> int:
+        swept = self.backend.sweep(time.time())
+        with self._lock:
+            self.counters["swept"] += swept
+        return swept
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["keys"] = len(self.backend)
+        return stats
+
+
+def _create_backend():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_DB_PATH)
+    return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(_create_backend())
+
+
+def get_rate_limit_stats() -> Dict[str, int]:
+    return rate_limiter.stats()
@@ -0,0 +1,90 @@
+"""
+Rate limit policies: who pays, how much, out of which budget.
+
+Every route spends `cost` units from its caller's budget per
+RATE_LIMIT_WINDOW_SECONDS. Routes declare their cost with @route_cost,
+counting LLM_CALL_COST for each LLM call they make, so one plan draft
+spends what several plain reads do; undeclared routes cost 1 and routes
+declared at 0 are not limited.
+
+Authenticated callers are limited per uid, with the budget of their tier
+(requests_per_minute in TIER_LIMITS), wherever they connect from.
+Anonymous callers are limited per IP with RATE_LIMIT_ANONYMOUS_BUDGET.
+"""
+
+import asyncio
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from starlette.routing import Match
+
+DEFAULT_COST = 1
+LLM_CALL_COST = 5
+RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_ANONYMOUS_BUDGET = int(os.getenv("RATE_LIMIT_ANONYMOUS_BUDGET", "100"))
+
+
+def route_cost(cost: float = DEFAULT_COST, llm_calls: int = 0):
+    """Declare what a route spends per call: cost plus LLM_CALL_COST per LLM call."""
+    def decorate(endpoint):
+        endpoint.rate_limit_cost = cost + llm_calls * LLM_CALL_COST
+        return endpoint
+    return decorate
+
+
+def request_cost(request: Request) -> float:
+    """Declared cost of the route the request will hit (DEFAULT_COST if none matches)."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "rate_limit_cost", DEFAULT_COST)
+    return DEFAULT_COST
+
+
+async def _caller_uid(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    if not authorization.startswith("Bearer "):
+        return None
+    token = authorization.split(" ", 1)[1]
+    try:
+        from auth.firebase import cached_firebase_token, verify_firebase_token
+        payload = cached_firebase_token(token)
+        if payload is None:
+            # A first sighting may fetch Google's signing keys; keep it off the loop
+            payload = await asyncio.to_thread(verify_firebase_token, token)
+        return payload.get("uid")
+    except Exception:
+        # Bad tokens are rejected by the route itself; limit them by IP
+        return None
+
+
+async def resolve_policy(request: Request) -> Optional[Tuple[str, int, float, str]]:
+    """(key, budget, cost, policy name) for the request, or None if it is free."""
+    cost = request_cost(request)
+    if cost <= 0:
+        return None
+
+    uid = await _caller_uid(request)
+    if uid is None:
+        host = request.client.host if request.client else "unknown"
+        return f"ip:{host}", RATE_LIMIT_ANONYMOUS_BUDGET, cost, "anonymous"
+
+    from usage.profile import load_user_profile
+    from usage.tracking import TIER_LIMITS
+
+    # Same cached profile the route's own get_user_profile dependency reads
+    profile = await load_user_profile(uid)
+    tier = profile["tier"] if profile["tier"] in TIER_LIMITS else "free"
+    return f"uid:{uid}", TIER_LIMITS[tier]["requests_per_minute"], cost, tier
+
+
+def rate_limit_headers(budget: int, remaining: int, reset: float, policy: str) -> Dict[str, str]:
+    """RateLimit-* response headers (IETF draft) for one check."""
+    return {
+        "RateLimit-Limit": str(budget),
+        "RateLimit-Remaining": str(remaining),
+        "RateLimit-Reset": str(math.ceil(reset)),
+        "RateLimit-Policy": f'{budget};w={int(RATE_LIMIT_WINDOW_SECONDS)};comment="{policy}"',
+    }
@@ -0,0 +1,181 @@
+"""
+Recurring per-user reminders and reflection prompts.
+
+Each user's preferences become at most one schedule per kind in the
+user_schedules table, keyed on the next fire time (epoch seconds) and
+indexed on it. That index is the single priority queue for every user:
+the engine reads only the rows that are due, enqueues them into the task
+store in one batch and advances each to its next local fire time, so a
+fire costs O(log n) however many users there are. update_preferences
+re-indexes just that user.
+
+Fire times are computed on the user's wall clock, so "20:00" stays
+20:00 local across DST changes.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from tasks.store import fire_due_schedules, next_schedule_time, replace_user_schedules
+
+DEFAULT_REMINDER_TIME = "09:00"
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+FIRE_BATCH = 500
+# Longest the engine sleeps without a wake-up. Bounds how late it notices
+# schedules changed by other processes, which cannot notify it.
+MAX_IDLE_SECONDS = 30.0
+
+
+def _zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except Exception:
+        print(f"⚠️ Unknown timezone {name!r}, using UTC")
+        return ZoneInfo("UTC")
+
+
+def _parse_time(value: str) -> tuple:
+    hour, minute = value.split(":")[:2]
+    return int(hour) % 24, int(minute) % 60
+
+
+def build_specs(preferences: Dict) -> Dict[str, Dict]:
+    """Map preferences to {kind: spec}. Kinds a user has turned off are absent."""
+    specs = {}
+
+    frequency = (preferences.get("reminderFrequency") or "").lower()
+    reminder_at = preferences.get("reminderTime") or DEFAULT_REMINDER_TIME
+    if frequency == "hourly":
+        specs["reminder"] = {"every": "hour"}
+    elif frequency == "daily":
+        specs["reminder"] = {"every": "day", "at": reminder_at}
+    elif frequency == "weekly":
+        weekday = (preferences.get("reminderDay") or "monday").lower()
+        specs["reminder"] = {
+            "every": "week",
+            "at": reminder_at,
+            "weekday": WEEKDAYS.index(weekday) if weekday in WEEKDAYS else 0,
+        }
+
+    if preferences.get("reflectionTime"):
+        specs["reflection"] = {"every": "day", "at": preferences["reflectionTime"]}
+
+    return specs
+
+
+def next_fire_time(spec: Dict, timezone: str, after: float) -> Optional[float]:
+    """First fire strictly after `after` (epoch seconds), or None if the spec is unusable."""
+    try:
+        local = datetime.fromtimestamp(after, _zone(timezone))
+        if spec["every"] == "hour":
+            candidate = local.replace(minute=0, second=0, microsecond=0)
+            step = timedelta(hours=1)
+        else:
+            hour, minute = _parse_time(spec["at"])
+            candidate = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            step = timedelta(days=1)
+            if spec["every"] == "week":
+                candidate += timedelta(days=(spec.get("weekday", 0) - candidate.weekday()) % 7)
+                step = timedelta(days=7)
+        while candidate.timestamp() <= after:
+            candidate += step
+        return candidate.timestamp()
+    except Exception as e:
+        print(f"❌ Error computing next fire time for {spec}: {e}")
+        return None
+
+
+def _to_action(row: tuple) -> str:
+    user_id, kind, timezone, _, fire_at = row
+    return json.dumps({"type": kind, "user_id": user_id, "timezone": timezone, "scheduled_for": fire_at})
+
+
+def _next_fire(row: tuple) -> Optional[float]:
+    # Advance from now rather than from fire_at so a backlog after downtime
+    # fires once instead of once per missed period
+    return next_fire_time(json.loads(row[3]), row[2], max(row[4], time.time()))
+
+
+class ScheduleEngine:
+    """Fires due user schedules into the task store, sleeping until the next one."""
+
+    def __init__(self, batch: int = FIRE_BATCH, max_idle: float = MAX_IDLE_SECONDS):
+        self.batch = batch
+        self.max_idle = max_idle
+        self.stats = {"fired": 0, "reindexed": 0}
+        self._cond = threading.Condition()
+        self._next_hint: Optional[float] = None
+        self._stopping = False
+
+    def notify(self, fire_at: float):
+        """Wake the loop if fire_at is earlier than what it is waiting for."""
+        with self._cond:
+            if self._next_hint is None or fire_at < self._next_hint:
+                self._next_hint = fire_at
+                self._cond.notify()
+
+    def update_user(self, user_id: str, preferences: Dict) -> List[str]:
+        """Re-index one user's schedules. Returns the active kinds."""
+        timezone = preferences.get("timezone") or "UTC"
+        now = time.time()
+        rows = []
+        for kind, spec in build_specs(preferences).items():
+            fire_at = next_fire_time(spec, timezone, now)
+            if fire_at is not None:
+                rows.append((kind, timezone, json.dumps(spec), fire_at))
+        replace_user_schedules(user_id, rows)
+        self.stats["reindexed"] += 1
+        if rows:
+            self.notify(min(row[3] for row in rows))
+        return [row[0] for row in rows]
+
+    def fire_due(self) -> int:
+        """Enqueue every schedule that is due now. Returns how many fired."""
+        fired = 0
+        while True:
+            count = fire_due_schedules(time.time(), self.batch, _to_action, _next_fire)
+            fired += count
+            if count < self.batch:
+                break
+        self.stats["fired"] += fired
+        return fired
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def run(self):
+        self._stopping = False
+        while True:
+            try:
+                self.fire_due()
+                upcoming = next_schedule_time()
+            except Exception as e:
+                print(f"❌ Error firing schedules: {e}")
+                upcoming = None
+            with self._cond:
+                if self._stopping:
+                    return
+                if upcoming is not None and (self._next_hint is None or upcoming < self._next_hint):
+                    self._next_hint = upcoming
+                timeout = self.max_idle if self._next_hint is None else self._next_hint - time.time()
+                if timeout > 0:
+                    self._cond.wait(min(timeout, self.max_idle))
+                self._next_hint = None
+
+
+schedule_engine = ScheduleEngine()
+
+
+def update_user_schedule(user_id: str, preferences: Dict) -> List[str]:
+    """Re-index a user after their preferences change."""
+    try:
+        return schedule_engine.update_user(user_id, preferences)
+    except Exception as e:
+        print(f"❌ Error updating schedule for {user_id}: {e}")
+        return []
@@ -1,64 +1,250 @@
-import sqlite3
-from datetime import datetime
-
-DB_NAME = "tasks.db"
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from memory.db import ConnectionPool, apply_migrations
+
+DB_NAME = os.getenv("TASKS_DB_PATH", "tasks.db")
+
+# Schema history. Append new steps; never edit one that has shipped.
+MIGRATIONS = [
+    # 1: original table
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        status TEXT NOT NULL,
+        run_at TEXT NOT NULL
+    )
+    """,
+    # 2: due-time lookups
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_status_run_at ON tasks (status, run_at)
+    """,
+    # 3: leases, retries and dead-lettering
+    """
+    ALTER TABLE tasks ADD COLUMN owner TEXT;
+    ALTER TABLE tasks ADD COLUMN lease_until TEXT;
+    ALTER TABLE tasks ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE tasks ADD COLUMN last_error TEXT;
+    CREATE INDEX IF NOT EXISTS idx_tasks_status_lease ON tasks (status, lease_until)
+    """,
+    # 4: recurring per-user schedules, indexed by next fire time
+    """
+    CREATE TABLE IF NOT EXISTS user_schedules (
+        user_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        timezone TEXT NOT NULL,
+        spec TEXT NOT NULL,
+        fire_at REAL NOT NULL,
+        PRIMARY KEY (user_id, kind)
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_schedules_fire_at ON user_schedules (fire_at)
+    """,
+]
+
+# Status lifecycle: PENDING -> RUNNING (leased) -> DONE, or back to PENDING
+# with a later run_at on failure, or DEAD once attempts run out. A RUNNING
+# task whose lease has expired is claimable again (its worker died).
+
+INSERT_TASK = "INSERT INTO tasks (action, status, run_at) VALUES (?, 'PENDING', ?)"
+SELECT_PENDING = "SELECT id, action FROM tasks WHERE status='PENDING'"
+SELECT_DUE = "SELECT id, action FROM tasks WHERE status='PENDING' AND run_at <= ? ORDER BY run_at LIMIT ?"
+SELECT_NEXT_DUE = """
+    SELECT MIN(due) FROM (
+        SELECT MIN(run_at) AS due FROM tasks WHERE status='PENDING'
+        UNION ALL
+        SELECT MIN(lease_until) FROM tasks WHERE status='RUNNING'
+    )
+"""
+MARK_DONE = "UPDATE tasks SET status='DONE' WHERE id=?"
+# Claim in one statement so two workers can never take the same row;
+# oldest run_at first so overdue tasks aren't starved under a backlog
+CLAIM_TASKS = """
+    UPDATE tasks SET status='RUNNING', owner=?, lease_until=?, attempts=attempts + 1
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, run_at FROM tasks WHERE status='PENDING' AND run_at <= ?
+            UNION ALL
+            SELECT id, run_at FROM tasks WHERE status='RUNNING' AND lease_until <= ? AND attempts < ?
+        )
+        ORDER BY run_at LIMIT ?
+    )
+    RETURNING id, action, attempts
+"""
+# Expired leases with no attempts left: the task crashed or hung its
+# worker every time, so it is dead-lettered instead of leased again
+DEAD_EXPIRED = """
+    UPDATE tasks SET status='DEAD', owner=NULL, lease_until=NULL, last_error='lease expired'
+    WHERE status='RUNNING' AND lease_until <= ? AND attempts >= ?
+"""
+# Completion is fenced on owner: a worker whose lease expired and was
+# re-claimed elsewhere must not overwrite the new owner's outcome
+COMPLETE_TASK = "UPDATE tasks SET status='DONE', owner=NULL, lease_until=NULL WHERE id=? AND owner=?"
+RETRY_TASK = """
+    UPDATE tasks SET status='PENDING', owner=NULL, lease_until=NULL, run_at=?, last_error=?
+    WHERE id=? AND owner=?
+"""
+DELETE_USER_SCHEDULES = "DELETE FROM user_schedules WHERE user_id=?"
+INSERT_USER_SCHEDULE = "INSERT INTO user_schedules (user_id, kind, timezone, spec, fire_at) VALUES (?, ?, ?, ?, ?)"
+SELECT_DUE_SCHEDULES = """
+    SELECT user_id, kind, timezone, spec, fire_at FROM user_schedules
+    WHERE fire_at <= ? ORDER BY fire_at LIMIT ?
+"""
+ADVANCE_SCHEDULE = "UPDATE user_schedules SET fire_at=? WHERE user_id=? AND kind=?"
+DELETE_SCHEDULE = "DELETE FROM user_schedules WHERE user_id=? AND kind=?"
+SELECT_NEXT_SCHEDULE = "SELECT MIN(fire_at) FROM user_schedules"
+DEAD_TASK = "UPDATE tasks SET status='DEAD', owner=NULL, lease_until=NULL, last_error=? WHERE id=? AND owner=?"
+
+pool = ConnectionPool(DB_NAME)
+
+# Called with run_at after every create_task, so an in-process scheduler
+# can wake early instead of polling
+_listeners: List[Callable[[str], None]] = []
 
 
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """This thread's pooled connection. Do not close it."""
+    return pool.connection()
 
 
 def init_tasks_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            action TEXT NOT NULL,
-            status TEXT NOT NULL,
-            run_at TEXT NOT NULL
-        )
-    """)
+    apply_migrations(get_connection(), MIGRATIONS)
+
+
+def add_listener(listener: Callable[[str], None]):
+    _listeners.append(listener)
+
 
-    conn.commit()
-    conn.close()
+def remove_listener(listener: Callable[[str], None]):
+    if listener in _listeners:
+        _listeners.remove(listener)
 
 
-def create_task(action: str, run_at: str):
+def _notify(run_at: str):
+    for listener in _listeners:
+        listener(run_at)
+
+
+def create_task(action: str, run_at: str) -> int:
     conn = get_connection()
-    cursor = conn.cursor()
 
-    cursor.execute(
-        "INSERT INTO tasks (action, status, run_at) VALUES (?, ?, ?)",
-        (action, "PENDING", run_at)
-    )
+    with conn:
+        task_id = conn.execute(INSERT_TASK, (action, run_at)).lastrowid
 
-    conn.commit()
-    conn.close()
+    _notify(run_at)
+    return task_id
 
 
 def get_pending_tasks():
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Every pending task, due or not. Prefer get_due_tasks."""
+    return get_connection().execute(SELECT_PENDING).fetchall()
 
-    cursor.execute(
-        "SELECT id, action FROM tasks WHERE status='PENDING'"
-    )
 
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+def get_due_tasks(now: Optional[str] = None, limit: int = 100):
+    """Pending tasks whose run_at has passed, oldest first"""
+    now = now or datetime.utcnow().isoformat()
+    return get_connection().execute(SELECT_DUE, (now, limit)).fetchall()
+
+
+def next_due_time() -> Optional[str]:
+    """Earliest pending run_at or lease expiry, or None"""
+    return get_connection().execute(SELECT_NEXT_DUE).fetchone()[0]
 
 
 def mark_task_done(task_id: int):
     conn = get_connection()
-    cursor = conn.cursor()
 
-    cursor.execute(
-        "UPDATE tasks SET status='DONE' WHERE id=?",
-        (task_id,)
-    )
+    with conn:
+        conn.execute(MARK_DONE, (task_id,))
+
+
+def claim_tasks(owner: str, limit: int, lease_seconds: float, max_attempts: int, now: Optional[datetime] = None) -> List[tuple]:
+    """
+    Lease up to limit due tasks to owner until now + lease_seconds,
+    oldest first. Expired leases that already had max_attempts are moved
+    to DEAD instead. Returns (id, action, attempts) rows; attempts
+    includes this one.
+    """
+    now = now or datetime.utcnow()
+    now_iso = now.isoformat()
+    lease_until = (now + timedelta(seconds=lease_seconds)).isoformat()
+    conn = get_connection()
+
+    with conn:
+        dead = conn.execute(DEAD_EXPIRED, (now_iso, max_attempts)).rowcount
+        if dead:
+            print(f"⚠️ Dead-lettered {dead} task(s) whose leases expired on their last attempt")
+        return conn.execute(CLAIM_TASKS, (owner, lease_until, now_iso, now_iso, max_attempts, limit)).fetchall()
+
+
+def complete_task(task_id: int, owner: str) -> bool:
+    """Mark a leased task DONE. False if owner no longer holds the lease."""
+    conn = get_connection()
+
+    with conn:
+        return conn.execute(COMPLETE_TASK, (task_id, owner)).rowcount == 1
+
+
+def fail_task(task_id: int, owner: str, error: str, retry_at: Optional[str] = None) -> bool:
+    """Put a leased task back to PENDING at retry_at, or DEAD if retry_at is None."""
+    conn = get_connection()
+
+    with conn:
+        if retry_at is None:
+            cursor = conn.execute(DEAD_TASK, (error, task_id, owner))
+        else:
+            cursor = conn.execute(RETRY_TASK, (retry_at, error, task_id, owner))
+        return cursor.rowcount == 1
 
-    conn.commit()
-    conn.close()
+
+# ============================================================================
+# RECURRING USER SCHEDULES
+# ============================================================================
+
+def replace_user_schedules(user_id: str, rows: List[tuple]):
+    """Swap a user's schedules for rows of (kind, timezone, spec, fire_at)."""
+    conn = get_connection()
+
+    with conn:
+        conn.execute(DELETE_USER_SCHEDULES, (user_id,))
+        conn.executemany(INSERT_USER_SCHEDULE, [(user_id, *row) for row in rows])
+
+
+def next_schedule_time() -> Optional[float]:
+    """Epoch seconds of the earliest schedule fire, or None"""
+    return get_connection().execute(SELECT_NEXT_SCHEDULE).fetchone()[0]
+
+
+def fire_due_schedules(now: float, limit: int, to_action: Callable[[tuple], str], next_fire: Callable[[tuple], Optional[float]]) -> int:
+    """
+    Turn up to limit due schedules into tasks and advance each to its next
+    fire time (or drop it when next_fire returns None). Rows are
+    (user_id, kind, timezone, spec, fire_at).
+
+    Runs as one IMMEDIATE transaction, so concurrent callers in other
+    processes never enqueue the same fire twice. Returns how many fired.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(SELECT_DUE_SCHEDULES, (now, limit)).fetchall()
+        tasks, advances, drops = [], [], []
+        for row in rows:
+            tasks.append((to_action(row), datetime.utcfromtimestamp(row[4]).isoformat()))
+            fire_at = next_fire(row)
+            if fire_at is None:
+                drops.append((row[0], row[1]))
+            else:
+                advances.append((fire_at, row[0], row[1]))
+        conn.executemany(INSERT_TASK, tasks)
+        conn.executemany(ADVANCE_SCHEDULE, advances)
+        conn.executemany(DELETE_SCHEDULE, drops)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if tasks:
+        _notify(min(run_at for _, run_at in tasks))
+    return len(rows)
@@ -1,16 +1,222 @@
-import time
-from datetime import datetime
-from tasks.store import get_pending_tasks, mark_task_done
+"""
+Task worker: claims due tasks from tasks.db under a lease and runs them
+on a pool of async executors.
+
+Any number of workers, in one process or many, can share the store; the
+claim is a single UPDATE ... RETURNING, so each task goes to one worker.
+A worker that dies leaves its tasks RUNNING until the lease expires, at
+which point another worker picks them up again.
+
+    cd backend && python -m tasks.worker --concurrency 8
+
+The same process also fires recurring user schedules (tasks.schedules)
+unless started with --no-schedules; several may do so safely.
+
+The API process runs a worker and the schedule engine too (main.py,
+RUN_TASK_WORKER=1 by default), so a plain deployment still fires
+schedules. Set RUN_TASK_WORKER=0 there when dedicated workers run.
+"""
+
+import argparse
+import asyncio
+import heapq
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from tasks.store import (
+    add_listener,
+    claim_tasks,
+    complete_task,
+    fail_task,
+    init_tasks_db,
+    next_due_time,
+    remove_listener,
+)
+from tasks.schedules import schedule_engine
+
+CONCURRENCY = int(os.getenv("TASK_WORKER_CONCURRENCY", "4"))
+# Handlers are cancelled after TASK_TIMEOUT_SECONDS; the lease adds a margin
+# on top so it cannot expire while the handler is still allowed to run
+TASK_TIMEOUT_SECONDS = float(os.getenv("TASK_TIMEOUT_SECONDS", "60"))
+LEASE_SECONDS = TASK_TIMEOUT_SECONDS + 30
+MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("TASK_RETRY_BASE_SECONDS", "5"))
+RETRY_MAX_SECONDS = float(os.getenv("TASK_RETRY_MAX_SECONDS", "3600"))
+# Longest the worker sleeps without a wake-up. Bounds how late it notices
+# tasks created by other processes, which cannot notify it.
+MAX_IDLE_SECONDS = float(os.getenv("TASK_MAX_IDLE_SECONDS", "5"))
+
+
+async def execute_action(action: str):
+    """Default handler: log the action."""
+    print(f"[WORKER @ {datetime.utcnow().isoformat()}] Executing: {action}")
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the given number of failed attempts."""
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+class TaskWorker:
+    """
+    Leases due tasks and runs them with up to `concurrency` in flight.
+
+    Upcoming run_at times sit in a min-heap. The dispatcher sleeps until
+    the earliest one, until create_task in this process pushes an earlier
+    one, or until an executor frees a slot, then claims only as many
+    tasks as it has free slots.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = CONCURRENCY,
+        handler: Callable[[str], Awaitable] = execute_action,
+        owner: Optional[str] = None,
+        max_idle: float = MAX_IDLE_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.handler = handler
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_idle = max_idle
+        self.stats = {"claimed": 0, "done": 0, "retried": 0, "dead": 0, "lost": 0}
+        self._heap: List[str] = []
+        self._heap_lock = threading.Lock()
+        self._busy = 0
+        self._stopping = False
+        self._loop = None
+        self._wake = None
+
+    def notify(self, run_at: str):
+        """Called (from any thread) when a task is created."""
+        with self._heap_lock:
+            heapq.heappush(self._heap, run_at)
+            earliest = self._heap[0] == run_at
+        if earliest:
+            self._set_wake()
+
+    def _remember(self, run_at: str):
+        """Track the store's next due time without piling up duplicates."""
+        with self._heap_lock:
+            if not self._heap or run_at < self._heap[0]:
+                heapq.heappush(self._heap, run_at)
+
+    def stop(self):
+        """Ask run() to return once in-flight tasks finish."""
+        self._stopping = True
+        self._set_wake()
+
+    def _set_wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _seconds_until_next(self) -> float:
+        now = datetime.utcnow()
+        with self._heap_lock:
+            while self._heap and self._heap[0] <= now.isoformat():
+                heapq.heappop(self._heap)
+            upcoming = self._heap[0] if self._heap else None
+        if upcoming is None:
+            return self.max_idle
+        try:
+            seconds = (datetime.fromisoformat(upcoming) - now).total_seconds()
+        except ValueError:
+            return 0.0
+        return min(max(seconds, 0.0), self.max_idle)
+
+    async def _execute(self, queue: asyncio.Queue):
+        while True:
+            task_id, action, attempts = await queue.get()
+            try:
+                await asyncio.wait_for(self.handler(action), TASK_TIMEOUT_SECONDS)
+                if await asyncio.to_thread(complete_task, task_id, self.owner):
+                    self.stats["done"] += 1
+                else:
+                    self.stats["lost"] += 1
+            except Exception as e:
+                error = repr(e)
+                if attempts >= MAX_ATTEMPTS:
+                    print(f"❌ Task {task_id} dead after {attempts} attempts: {error}")
+                    await asyncio.to_thread(fail_task, task_id, self.owner, error)
+                    self.stats["dead"] += 1
+                else:
+                    retry_at = (datetime.utcnow() + timedelta(seconds=retry_delay(attempts))).isoformat()
+                    print(f"⚠️ Task {task_id} failed (attempt {attempts}), retrying at {retry_at}: {error}")
+                    await asyncio.to_thread(fail_task, task_id, self.owner, error, retry_at)
+                    self.stats["retried"] += 1
+            finally:
+                self._busy -= 1
+                queue.task_done()
+                self._wake.set()
+
+    async def _dispatch(self, queue: asyncio.Queue):
+        while not self._stopping:
+            # Clear before claiming so a wake-up that lands mid-claim is kept
+            self._wake.clear()
+            free = self.concurrency - self._busy
+            claimed = []
+            if free > 0:
+                claimed = await asyncio.to_thread(claim_tasks, self.owner, free, LEASE_SECONDS, MAX_ATTEMPTS)
+                for task in claimed:
+                    self._busy += 1
+                    queue.put_nowait(task)
+                self.stats["claimed"] += len(claimed)
+            if free > 0 and len(claimed) == free:
+                continue
+
+            upcoming = await asyncio.to_thread(next_due_time)
+            if upcoming:
+                self._remember(upcoming)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Claim and execute tasks until stop() is called."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        add_listener(self.notify)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        executors = [asyncio.create_task(self._execute(queue)) for _ in range(self.concurrency)]
+        print(f"✅ Task worker {self.owner} started with concurrency {self.concurrency}")
+        try:
+            await self._dispatch(queue)
+            await queue.join()
+        finally:
+            for executor in executors:
+                executor.cancel()
+            await asyncio.gather(*executors, return_exceptions=True)
+            remove_listener(self.notify)
+            self._loop = None
 
 
 def run_worker():
-    while True:
-        tasks = get_pending_tasks()
+    """Run a worker in the current thread (blocks)."""
+    asyncio.run(TaskWorker().run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the task worker")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--owner", default=None, help="lease owner ID (default host:pid:random)")
+    parser.add_argument("--no-schedules", action="store_true", help="do not fire recurring user schedules")
+    args = parser.parse_args()
+
+    init_tasks_db()
+    if not args.no_schedules:
+        threading.Thread(target=schedule_engine.run, name="schedule-engine", daemon=True).start()
+    worker = TaskWorker(concurrency=args.concurrency, owner=args.owner)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        print("⚠️ Task worker interrupted; unfinished leases will expire and be retried")
 
-        for task_id, action in tasks:
-            print(
-                f"[WORKER @ {datetime.utcnow().isoformat()}] Executing: {action}"
-            )
-            mark_task_done(task_id)
 
-        time.sleep(5)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Run from backend/:
+
+    cd backend && python -m pytest tests
+
+Modules read their SQLite paths from the environment at import time, so
+point them at a scratch directory before any test imports them.
+"""
+
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="whatsnextup-tests-")
+for name, filename in (
+    ("MEMORY_DB_PATH", "memory.db"),
+    ("TASKS_DB_PATH", "tasks.db"),
+    ("RATE_LIMIT_DB_PATH", "rate_limits.db"),
+    ("PENDING_ACTIONS_DB_PATH", "pending_actions.db"),
+):
+    os.environ.setdefault(name, os.path.join(_scratch, filename))
@@ -0,0 +1,96 @@
+"""LRU, TTL and negative caching in integrations.cache.BoundedCache."""
+
+import pytest
+
+from integrations import cache as cache_module
+from integrations.cache import BoundedCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def make_cache(**kwargs) -> BoundedCache:
+    kwargs.setdefault("ttl", 60)
+    kwargs.setdefault("negative_ttl", 5)
+    return BoundedCache("test", sizer=lambda value: 1, **kwargs)
+
+
+def test_evicts_least_recently_used(clock):
+    cache = make_cache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_down_to_max_bytes(clock):
+    cache = BoundedCache("test", ttl=60, max_bytes=10, sizer=len)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    assert cache.stats()["bytes"] == 6
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = make_cache()
+    cache.set("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.lookup("a") == (False, None)
+    assert cache.stats()["expirations"] == 1
+
+
+def test_empty_results_and_errors_use_negative_ttl(clock):
+    cache = make_cache()
+    cache.set("empty", [])
+    cache.set_error("failed")
+    assert cache.lookup("empty") == (True, [])
+    assert cache.lookup("failed") == (True, None)
+    assert cache.stats()["negative_hits"] == 2
+
+    clock.now += 5
+    assert cache.lookup("empty") == (False, None)
+    assert cache.lookup("failed") == (False, None)
+
+
+def test_explicit_ttl_overrides_negative_ttl(clock):
+    cache = make_cache()
+    cache.set("empty", {}, ttl=30)
+    clock.now += 10
+    assert cache.lookup("empty") == (True, {})
+
+
+def test_writes_drop_expired_entries_from_the_cold_end(clock):
+    cache = make_cache()
+    cache.set("old", 1, ttl=1)
+    clock.now += 2
+    cache.set("new", 2)
+    assert len(cache) == 1
+    assert cache.stats()["expirations"] == 1
+
+
+def test_overwrite_replaces_size_and_position(clock):
+    cache = BoundedCache("test", ttl=60, max_entries=2, sizer=len)
+    cache.set("a", "xx")
+    cache.set("b", "y")
+    cache.set("a", "xxxx")
+    cache.set("c", "z")
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 5
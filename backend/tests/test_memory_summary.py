@@ -0,0 +1,126 @@
+"""Summary bookkeeping in firestore.memory_summary: add, remove and refill."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("firebase_admin")  # firestore/__init__ imports the clients
+
+from firestore import memory_summary
+from firestore.memory_summary import (
+    SUMMARY_PREVIEW_LIMIT,
+    add_to_summary,
+    build_summary,
+    needs_refill,
+    remove_from_summary,
+)
+
+T0 = datetime(2026, 1, 1)
+
+
+def memory(n: int, category: str = "insight") -> dict:
+    return {"title": f"m{n}", "content": f"memory {n}", "category": category, "createdAt": T0 + timedelta(minutes=n)}
+
+
+def memories(count: int) -> list:
+    return [(f"m{n}", memory(n)) for n in range(count)]
+
+
+def test_add_counts_and_prepends_preview():
+    summary = build_summary([])
+    summary = add_to_summary(summary, "m0", memory(0, "learning"))
+    summary = add_to_summary(summary, "m1", memory(1))
+    assert summary["counts"] == {"learning": 1, "insight": 1}
+    assert summary["total"] == 2
+    assert [p["id"] for p in summary["latest"]] == ["m1", "m0"]
+
+
+def test_add_caps_previews():
+    summary = build_summary(memories(SUMMARY_PREVIEW_LIMIT))
+    summary = add_to_summary(summary, "new", memory(999))
+    assert len(summary["latest"]) == SUMMARY_PREVIEW_LIMIT
+    assert summary["latest"][0]["id"] == "new"
+    assert summary["total"] == SUMMARY_PREVIEW_LIMIT + 1
+
+
+def test_remove_drops_count_and_empty_category():
+    summary = build_summary([("a", memory(0, "learning")), ("b", memory(1))])
+    summary = remove_from_summary(summary, "a", memory(0, "learning"))
+    assert summary["counts"] == {"insight": 1}
+    assert summary["total"] == 1
+    assert [p["id"] for p in summary["latest"]] == ["b"]
+
+
+def test_refill_needed_only_when_older_memories_exist():
+    full = build_summary(memories(SUMMARY_PREVIEW_LIMIT + 5))
+    newest_id = full["latest"][0]["id"]
+    assert needs_refill(full, newest_id)
+    assert not needs_refill(full, "m0")  # not in the previews
+
+    small = build_summary(memories(3))
+    assert not needs_refill(small, small["latest"][0]["id"])
+
+
+def test_remove_refills_previews_from_newest():
+    all_memories = memories(SUMMARY_PREVIEW_LIMIT + 5)
+    summary = build_summary(all_memories)
+    removed = summary["latest"][0]["id"]
+    newest = sorted(all_memories, key=lambda m: m[1]["createdAt"], reverse=True)[:SUMMARY_PREVIEW_LIMIT + 1]
+
+    summary = remove_from_summary(summary, removed, dict(newest)[removed], newest)
+    ids = [p["id"] for p in summary["latest"]]
+    assert removed not in ids
+    assert len(ids) == SUMMARY_PREVIEW_LIMIT
+    assert ids[-1] == newest[-1][0]
+    assert summary["total"] == SUMMARY_PREVIEW_LIMIT + 4
+
+
+def test_build_summary_orders_newest_first():
+    summary = build_summary([("old", memory(0)), ("new", memory(5)), ("mid", memory(2))])
+    assert [p["id"] for p in summary["latest"]] == ["new", "mid", "old"]
+
+
+class Snapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class Ref:
+    def __init__(self, id):
+        self.id = id
+
+
+class Transaction:
+    def __init__(self):
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append(("set", ref, data))
+
+    def delete(self, ref):
+        self.writes.append(("delete", ref, None))
+
+
+def test_write_save_skips_missing_summary():
+    memory_ref, summary_ref = Ref("m0"), Ref("summary")
+    transaction = Transaction()
+    memory_summary.write_save(transaction, memory_ref, summary_ref, Snapshot(None), memory(0))
+    assert transaction.writes == [("set", memory_ref, memory(0))]
+
+    transaction = Transaction()
+    memory_summary.write_save(transaction, memory_ref, summary_ref, Snapshot(build_summary([])), memory(0))
+    assert transaction.writes[1][2]["total"] == 1
+
+
+def test_write_delete_updates_summary():
+    memory_ref, summary_ref = Ref("m0"), Ref("summary")
+    transaction = Transaction()
+    summary = build_summary(memories(1))
+    memory_summary.write_delete(transaction, memory_ref, summary_ref, Snapshot(memory(0)), Snapshot(summary))
+    assert transaction.writes[0] == ("delete", memory_ref, None)
+    assert transaction.writes[1][2]["total"] == 0
+    assert transaction.writes[1][2]["latest"] == []
@@ -0,0 +1,72 @@
+"""GCRA arithmetic of ratelimit.limiter on both backends."""
+
+import pytest
+
+from ratelimit.limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    backend = MemoryBackend(max_keys=100) if request.param == "memory" else SQLiteBackend(str(tmp_path / "rl.db"))
+    return RateLimiter(backend, sweep_seconds=0)
+
+
+def test_full_budget_fits_in_one_burst(limiter):
+    results = [limiter.hit("k", 10, 60, now=NOW) for _ in range(10)]
+    assert all(allowed for allowed, *_ in results)
+    assert [remaining for _, remaining, *_ in results] == list(range(9, -1, -1))
+
+    allowed, remaining, retry_after, reset = limiter.hit("k", 10, 60, now=NOW)
+    assert not allowed
+    assert remaining == 0
+    assert retry_after == pytest.approx(6.0)
+    assert reset == pytest.approx(60.0)
+
+
+def test_budget_refills_one_interval_at_a_time(limiter):
+    for _ in range(10):
+        limiter.hit("k", 10, 60, now=NOW)
+    assert not limiter.hit("k", 10, 60, now=NOW + 5.9)[0]
+    assert limiter.hit("k", 10, 60, now=NOW + 6.0)[0]
+    assert not limiter.hit("k", 10, 60, now=NOW + 6.0)[0]
+
+
+def test_cost_spends_several_units(limiter):
+    allowed, remaining, _, reset = limiter.hit("k", 10, 60, cost=4, now=NOW)
+    assert allowed and remaining == 6
+    assert reset == pytest.approx(24.0)
+
+    allowed, remaining, retry_after, _ = limiter.hit("k", 10, 60, cost=7, now=NOW)
+    assert not allowed and remaining == 6
+    assert retry_after == pytest.approx(6.0)
+
+
+def test_cost_above_limit_never_fits(limiter):
+    allowed, remaining, _, _ = limiter.hit("new", 10, 60, cost=11, now=NOW)
+    assert not allowed and remaining == 10
+
+
+def test_keys_are_independent(limiter):
+    for _ in range(10):
+        limiter.hit("a", 10, 60, now=NOW)
+    assert not limiter.hit("a", 10, 60, now=NOW)[0]
+    assert limiter.hit("b", 10, 60, now=NOW)[0]
+
+
+def test_sweep_drops_only_refilled_keys():
+    backend = MemoryBackend(max_keys=100)
+    backend.update("idle", NOW, 1.0, 60)
+    backend.update("busy", NOW, 30.0, 60)
+    assert backend.sweep(NOW + 10) == 1
+    assert len(backend) == 1
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_keys=2)
+    backend.update("a", NOW, 1.0, 60)
+    backend.update("b", NOW, 1.0, 60)
+    backend.update("a", NOW, 1.0, 60)
+    backend.update("c", NOW, 1.0, 60)
+    assert set(backend._tats) == {"a", "c"}
@@ -0,0 +1,66 @@
+"""next_fire_time keeps wall-clock times across DST changes."""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from tasks.schedules import next_fire_time
+
+NEW_YORK = "America/New_York"
+ZONE = ZoneInfo(NEW_YORK)
+
+
+def at(*args) -> float:
+    return datetime(*args, tzinfo=ZONE).timestamp()
+
+
+def local(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, ZONE)
+
+
+def test_daily_keeps_local_time_over_spring_forward():
+    after = at(2026, 3, 7, 21, 0)
+    fire = next_fire_time({"every": "day", "at": "20:00"}, NEW_YORK, after)
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 3, 8, 20, 0)
+    assert fire - after == 22 * 3600
+
+
+def test_daily_keeps_local_time_over_fall_back():
+    after = at(2026, 10, 31, 21, 0)
+    fire = next_fire_time({"every": "day", "at": "20:00"}, NEW_YORK, after)
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 11, 1, 20, 0)
+    assert fire - after == 24 * 3600
+
+
+def test_time_skipped_by_spring_forward_fires_once_after_the_gap():
+    after = at(2026, 3, 8, 0, 0)
+    fire = next_fire_time({"every": "day", "at": "02:30"}, NEW_YORK, after)
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 3, 8, 3, 30)
+    following = next_fire_time({"every": "day", "at": "02:30"}, NEW_YORK, fire)
+    assert local(following).replace(tzinfo=None) == datetime(2026, 3, 9, 2, 30)
+
+
+def test_weekly_lands_on_the_weekday_across_dst():
+    after = at(2026, 3, 6, 12, 0)  # Friday before the change
+    fire = next_fire_time({"every": "week", "at": "09:00", "weekday": 0}, NEW_YORK, after)
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 3, 9, 9, 0)
+
+
+def test_fire_is_strictly_after():
+    after = at(2026, 6, 1, 20, 0)
+    fire = next_fire_time({"every": "day", "at": "20:00"}, NEW_YORK, after)
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 6, 2, 20, 0)
+
+
+def test_hourly_fires_on_the_hour():
+    fire = next_fire_time({"every": "hour"}, NEW_YORK, at(2026, 6, 1, 10, 15))
+    assert local(fire).replace(tzinfo=None) == datetime(2026, 6, 1, 11, 0)
+
+
+def test_unknown_timezone_falls_back_to_utc():
+    after = datetime(2026, 6, 1, 12, 0, tzinfo=ZoneInfo("UTC")).timestamp()
+    fire = next_fire_time({"every": "day", "at": "20:00"}, "Not/AZone", after)
+    assert fire - after == 8 * 3600
+
+
+def test_unusable_spec_returns_none():
+    assert next_fire_time({"every": "day"}, NEW_YORK, at(2026, 6, 1, 12, 0)) is None
@@ -0,0 +1,88 @@
+"""Lease claims and owner fencing in tasks.store."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tasks import store
+
+T0 = datetime(2026, 1, 1, 12, 0)
+LEASE = 30
+MAX_ATTEMPTS = 3
+
+
+@pytest.fixture(autouse=True)
+def tasks_db():
+    store.init_tasks_db()
+    conn = store.get_connection()
+    with conn:
+        conn.execute("DELETE FROM tasks")
+    yield
+
+
+def status(task_id: int) -> tuple:
+    return store.get_connection().execute(
+        "SELECT status, owner, last_error FROM tasks WHERE id=?", (task_id,)
+    ).fetchone()
+
+
+def claim(owner: str, now: datetime, limit: int = 10):
+    return store.claim_tasks(owner, limit, LEASE, MAX_ATTEMPTS, now=now)
+
+
+def test_claims_oldest_first():
+    newer = store.create_task("newer", (T0 - timedelta(minutes=1)).isoformat())
+    older = store.create_task("older", (T0 - timedelta(minutes=5)).isoformat())
+    store.create_task("future", (T0 + timedelta(minutes=5)).isoformat())
+    assert [row[0] for row in claim("a", T0, limit=1)] == [older]
+    assert [row[0] for row in claim("a", T0)] == [newer]
+
+
+def test_owner_completes_its_lease():
+    task_id = store.create_task("x", T0.isoformat())
+    claim("a", T0)
+    assert store.complete_task(task_id, "a")
+    assert status(task_id)[:2] == ("DONE", None)
+
+
+def test_stale_owner_cannot_complete_after_reclaim():
+    task_id = store.create_task("x", T0.isoformat())
+    claim("a", T0)
+    [(claimed, _, attempts)] = claim("b", T0 + timedelta(seconds=LEASE + 1))
+    assert (claimed, attempts) == (task_id, 2)
+
+    assert not store.complete_task(task_id, "a")
+    assert not store.fail_task(task_id, "a", "boom", retry_at=T0.isoformat())
+    assert not store.fail_task(task_id, "a", "boom")
+    assert status(task_id)[:2] == ("RUNNING", "b")
+
+    assert store.complete_task(task_id, "b")
+    assert status(task_id)[0] == "DONE"
+
+
+def test_live_lease_is_not_reclaimed():
+    store.create_task("x", T0.isoformat())
+    claim("a", T0)
+    assert claim("b", T0 + timedelta(seconds=LEASE - 1)) == []
+
+
+def test_fail_task_retries_or_dead_letters():
+    retried = store.create_task("retry", T0.isoformat())
+    dead = store.create_task("dead", T0.isoformat())
+    claim("a", T0)
+
+    assert store.fail_task(retried, "a", "boom", retry_at=(T0 + timedelta(minutes=1)).isoformat())
+    assert status(retried) == ("PENDING", None, "boom")
+    assert store.fail_task(dead, "a", "fatal")
+    assert status(dead) == ("DEAD", None, "fatal")
+
+
+def test_expired_lease_on_last_attempt_is_dead_lettered():
+    task_id = store.create_task("x", T0.isoformat())
+    now = T0
+    for _ in range(MAX_ATTEMPTS):
+        assert claim("a", now)
+        now += timedelta(seconds=LEASE + 1)
+
+    assert claim("b", now) == []
+    assert status(task_id) == ("DEAD", None, "lease expired")
@@ -1,56 +1,78 @@
 # Trending & Social Media Integrations
-import httpx
 import os
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import asyncio
+import functools
+
+from integrations.fanout import fan_out
+from integrations.http import http_get
+from integrations.cache import BoundedCache
+from .refresher import RefreshScheduler, STALE_SECONDS
 
 # Free API Keys (to be set in environment)
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "")  # newsapi.org - Free tier: 100 req/day
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY", "")  # Google Cloud - Free tier: 10k quota/day
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")  # openweathermap.org - Free tier: 1k calls/day
 
-# Cache for API responses
-_cache = {}
+# Cache for API responses. Entries are kept STALE_SECONDS past the TTL so
+# the refresher can serve them stale; empty results are kept briefly.
 _cache_ttl = 3600  # 1 hour
+_cache = BoundedCache("trending", ttl=_cache_ttl + STALE_SECONDS, max_entries=int(os.getenv("TRENDING_CACHE_MAX_ENTRIES", "500")))
+# Keys whose refresh failed, kept for the cache's negative TTL so a
+# failing upstream isn't refetched on every stale hit
+_failures = BoundedCache("trending_failures", ttl=_cache.negative_ttl, max_entries=_cache.max_entries, negative_ttl=_cache.negative_ttl)
+
+# Hacker News stories by id, limited to those still on the latest top
+# list (at most 500), so stories that stay on it aren't fetched again
+_hn_items: Dict[int, Dict[str, Any]] = {}
+HN_CONCURRENCY = 8
+HN_ITEM_TIMEOUT = 5.0
 
 def _get_cache_key(func_name: str, *args, **kwargs) -> str:
     """Generate cache key"""
     return f"{func_name}:{'_'.join(str(a) for a in args)}:{'_'.join(f'{k}={v}' for k,v in sorted(kwargs.items()))}"
 
-def _get_from_cache(key: str) -> Optional[Any]:
-    """Get value from cache if not expired"""
-    if key in _cache:
-        data, timestamp = _cache[key]
-        if datetime.now().timestamp() - timestamp < _cache_ttl:
-            return data
-        else:
-            del _cache[key]
-    return None
+def _get_entry(key: str) -> Optional[tuple]:
+    """(value, timestamp) from cache, stale or not"""
+    return _cache.entry(key)
 
 def _set_cache(key: str, value: Any):
     """Set value in cache"""
-    _cache[key] = (value, datetime.now().timestamp())
+    _cache.set(key, value)
+
+# Serves stale entries while refreshing them and keeps popular keys warm
+trending_refresher = RefreshScheduler(_get_entry, _set_cache, _cache_ttl, _failures)
+
+def _cached(name: str):
+    """Cache a fetcher's results under name + its arguments"""
+    def decorate(fetch):
+        @functools.wraps(fetch)
+        async def wrapper(*args, **kwargs):
+            return await trending_refresher.get(_get_cache_key(name, *args, **kwargs), fetch, args, kwargs)
+        return wrapper
+    return decorate
+
+def start_trending_refresher():
+    trending_refresher.start()
+
+async def stop_trending_refresher():
+    await trending_refresher.stop()
 
 # ============================================================================
 # REDDIT API (No auth required for public data)
 # ============================================================================
 
+@_cached("reddit")
 async def get_reddit_trending(subreddit: str = "popular", limit: int = 10) -> List[Dict[str, Any]]:
     """Get trending posts from Reddit (NO API KEY NEEDED)"""
-    cache_key = _get_cache_key("reddit", subreddit, limit)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
     try:
         url = f"https://www.reddit.com/r/{subreddit}/hot.json?limit={limit}"
         headers = {"User-Agent": "WhatsNextUp/1.0"}
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        response = await http_get(url, headers=headers)
+        response.raise_for_status()
+        data = response.json()
         
         posts = []
         for child in data.get("data", {}).get("children", []):
@@ -66,7 +88,6 @@ async def get_reddit_trending(subreddit: str = "popular", limit: int = 10) -> Li
                 "thumbnail": post_data.get("thumbnail") if post_data.get("thumbnail", "").startswith("http") else None
             })
         
-        _set_cache(cache_key, posts)
         return posts
     except Exception as e:
         print(f"❌ Error fetching Reddit data: {e}")
@@ -76,16 +97,12 @@ async def get_reddit_trending(subreddit: str = "popular", limit: int = 10) -> Li
 # YOUTUBE API (Requires API key - Free tier: 10k quota/day)
 # ============================================================================
 
+@_cached("youtube")
 async def get_youtube_trending(region_code: str = "US", category_id: str = "0", limit: int = 10) -> List[Dict[str, Any]]:
     """Get trending YouTube videos"""
     if not YOUTUBE_API_KEY:
         return []
     
-    cache_key = _get_cache_key("youtube", region_code, category_id, limit)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
     try:
         url = "https://www.googleapis.com/youtube/v3/videos"
         params = {
@@ -97,10 +114,9 @@ async def get_youtube_trending(region_code: str = "US", category_id: str = "0",
             "key": YOUTUBE_API_KEY
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await http_get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
         
         videos = []
         for item in data.get("items", []):
@@ -117,7 +133,6 @@ async def get_youtube_trending(region_code: str = "US", category_id: str = "0",
                 "published_at": snippet.get("publishedAt", "")
             })
         
-        _set_cache(cache_key, videos)
         return videos
     except Exception as e:
         print(f"❌ Error fetching YouTube data: {e}")
@@ -127,16 +142,12 @@ async def get_youtube_trending(region_code: str = "US", category_id: str = "0",
 # NEWS API (Requires API key - Free tier: 100 requests/day)
 # ============================================================================
 
+@_cached("news")
 async def get_top_news(country: str = "us", category: str = "general", limit: int = 10) -> List[Dict[str, Any]]:
     """Get top news headlines"""
     if not NEWS_API_KEY:
         return []
     
-    cache_key = _get_cache_key("news", country, category, limit)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
     try:
         url = "https://newsapi.org/v2/top-headlines"
         params = {
@@ -146,10 +157,9 @@ async def get_top_news(country: str = "us", category: str = "general", limit: in
             "apiKey": NEWS_API_KEY
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await http_get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
         
         articles = []
         for article in data.get("articles", []):
@@ -163,7 +173,6 @@ async def get_top_news(country: str = "us", category: str = "general", limit: in
                 "published_at": article.get("publishedAt", "")
             })
         
-        _set_cache(cache_key, articles)
         return articles
     except Exception as e:
         print(f"❌ Error fetching news data: {e}")
@@ -173,16 +182,12 @@ async def get_top_news(country: str = "us", category: str = "general", limit: in
 # WEATHER API (Requires API key - Free tier: 1k calls/day)
 # ============================================================================
 
+@_cached("weather")
 async def get_weather(city: str = "New York", country_code: str = "US") -> Dict[str, Any]:
     """Get current weather for a location"""
     if not OPENWEATHER_API_KEY:
         return {}
     
-    cache_key = _get_cache_key("weather", city, country_code)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
     try:
         url = "https://api.openweathermap.org/data/2.5/weather"
         params = {
@@ -191,10 +196,9 @@ async def get_weather(city: str = "New York", country_code: str = "US") -> Dict[
             "units": "metric"
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await http_get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
         
         weather_data = {
             "city": data.get("name", ""),
@@ -207,7 +211,6 @@ async def get_weather(city: str = "New York", country_code: str = "US") -> Dict[
             "wind_speed": data.get("wind", {}).get("speed", 0)
         }
         
-        _set_cache(cache_key, weather_data)
         return weather_data
     except Exception as e:
         print(f"❌ Error fetching weather data: {e}")
@@ -217,42 +220,38 @@ async def get_weather(city: str = "New York", country_code: str = "US") -> Dict[
 # HACKER NEWS API (No auth required)
 # ============================================================================
 
+async def _fetch_hn_story(story_id: int) -> Dict[str, Any]:
+    response = await http_get(f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json")
+    response.raise_for_status()
+    story = response.json()
+    
+    return {
+        "title": story.get("title", ""),
+        "author": story.get("by", ""),
+        "score": story.get("score", 0),
+        "comments": story.get("descendants", 0),
+        "url": story.get("url", f"https://news.ycombinator.com/item?id={story_id}"),
+        "hn_url": f"https://news.ycombinator.com/item?id={story_id}",
+        "time": datetime.fromtimestamp(story.get("time", 0)).isoformat()
+    }
+
+@_cached("hackernews")
 async def get_hackernews_top(limit: int = 10) -> List[Dict[str, Any]]:
     """Get top Hacker News stories (NO API KEY NEEDED)"""
-    cache_key = _get_cache_key("hackernews", limit)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
+    global _hn_items
     try:
         # Get top story IDs
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get("https://hacker-news.firebaseio.com/v0/topstories.json")
-            response.raise_for_status()
-            story_ids = response.json()[:limit]
+        response = await http_get("https://hacker-news.firebaseio.com/v0/topstories.json")
+        response.raise_for_status()
+        top_ids = response.json()
+        story_ids = top_ids[:limit]
         
-        # Fetch story details
-        stories = []
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for story_id in story_ids:
-                try:
-                    response = await client.get(f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json")
-                    response.raise_for_status()
-                    story = response.json()
-                    
-                    stories.append({
-                        "title": story.get("title", ""),
-                        "author": story.get("by", ""),
-                        "score": story.get("score", 0),
-                        "comments": story.get("descendants", 0),
-                        "url": story.get("url", f"https://news.ycombinator.com/item?id={story_id}"),
-                        "hn_url": f"https://news.ycombinator.com/item?id={story_id}",
-                        "time": datetime.fromtimestamp(story.get("time", 0)).isoformat()
-                    })
-                except:
-                    continue
+        # Fetch story details concurrently, reusing stories from the last list
+        seen = {story_id: _hn_items[story_id] for story_id in top_ids if story_id in _hn_items}
+        results = await fan_out(story_ids, _fetch_hn_story, HN_CONCURRENCY, HN_ITEM_TIMEOUT, cache=seen)
+        stories = [story for story in results if story is not None]
+        _hn_items = seen
         
-        _set_cache(cache_key, stories)
         return stories
     except Exception as e:
         print(f"❌ Error fetching Hacker News data: {e}")
@@ -262,13 +261,9 @@ async def get_hackernews_top(limit: int = 10) -> List[Dict[str, Any]]:
 # GITHUB TRENDING (No auth required)
 # ============================================================================
 
+@_cached("github")
 async def get_github_trending(language: str = "", since: str = "daily") -> List[Dict[str, Any]]:
     """Get trending GitHub repositories (NO API KEY NEEDED)"""
-    cache_key = _get_cache_key("github", language, since)
-    cached = _get_from_cache(cache_key)
-    if cached:
-        return cached
-    
     try:
         # Using GitHub trending page (unofficial parsing)
         url = "https://github.com/trending"
@@ -278,10 +273,9 @@ async def get_github_trending(language: str = "", since: str = "daily") -> List[
         
         headers = {"User-Agent": "WhatsNextUp/1.0"}
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            html = response.text
+        response = await http_get(url, headers=headers)
+        response.raise_for_status()
+        html = response.text
         
         # Parse trending repos from HTML
         repos = []
@@ -308,7 +302,6 @@ async def get_github_trending(language: str = "", since: str = "daily") -> List[
                     })
                     seen.add(match)
         
-        _set_cache(cache_key, repos)
         return repos
     except Exception as e:
         print(f"❌ Error fetching GitHub trending: {e}")
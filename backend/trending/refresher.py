@@ -0,0 +1,182 @@
+# Stale-while-revalidate refreshing for the trending caches
+"""
+Keeps popular trending results warm so user requests don't wait on
+upstream APIs.
+
+Every lookup goes through RefreshScheduler.get:
+
+- fresh entries (younger than ttl) are returned as they are
+- stale entries (up to STALE_SECONDS past ttl) are returned immediately
+  while one background refresh replaces them
+- only a miss waits, and concurrent misses for a key share one fetch
+- an empty result never replaces data we already have; the failure is
+  negative-cached instead (in the failures cache, for its negative_ttl)
+  and the key isn't refreshed again until that expires, so a failing
+  upstream isn't retried on every request
+
+Each lookup also bumps the key's popularity, a hit count that halves
+every POPULARITY_HALF_LIFE_SECONDS. Every REFRESH_INTERVAL_SECONDS the
+scheduler re-fetches the KEEP_WARM most popular keys that are within
+REFRESH_AHEAD_SECONDS of expiring, so hot keys never go stale at all.
+"""
+
+import asyncio
+import functools
+import math
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from integrations.cache import BoundedCache
+from integrations.fanout import fan_out
+
+REFRESH_INTERVAL_SECONDS = float(os.getenv("TRENDING_REFRESH_INTERVAL_SECONDS", "60"))
+REFRESH_AHEAD_SECONDS = float(os.getenv("TRENDING_REFRESH_AHEAD_SECONDS", "300"))
+STALE_SECONDS = float(os.getenv("TRENDING_STALE_SECONDS", "3600"))
+KEEP_WARM = int(os.getenv("TRENDING_KEEP_WARM", "20"))
+POPULARITY_HALF_LIFE_SECONDS = float(os.getenv("TRENDING_POPULARITY_HALF_LIFE_SECONDS", "1800"))
+# Keys need about this many recent hits to be kept warm
+MIN_POPULARITY = 2.0
+MAX_TRACKED_KEYS = 1000
+REFRESH_CONCURRENCY = 4
+
+
+class RefreshScheduler:
+    """SWR lookups and proactive refresh over a (data, fetched_at) cache."""
+
+    def __init__(
+        self,
+        get_entry: Callable[[str], Optional[Tuple[Any, float]]],
+        set_entry: Callable[[str, Any], None],
+        ttl: float,
+        failures: BoundedCache,
+    ):
+        self.get_entry = get_entry
+        self.set_entry = set_entry
+        self.ttl = ttl
+        # key -> (fetch, args, kwargs), to refetch without a caller
+        self._loaders: Dict[str, tuple] = {}
+        # key -> (score, scored_at)
+        self._scores: Dict[str, Tuple[float, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Keys whose last refresh failed, negative-cached
+        self.failures = failures
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"fresh": 0, "stale": 0, "misses": 0, "refreshes": 0, "failures": 0, "warmed": 0}
+
+    def popularity(self, key: str, now: float) -> float:
+        score, scored_at = self._scores.get(key, (0.0, now))
+        return score * math.pow(0.5, (now - scored_at) / POPULARITY_HALF_LIFE_SECONDS)
+
+    def _touch(self, key: str, loader: tuple, now: float):
+        self._scores[key] = (self.popularity(key, now) + 1.0, now)
+        self._loaders[key] = loader
+
+    def _backing_off(self, key: str) -> bool:
+        return self.failures.lookup(key)[0]
+
+    async def get(self, key: str, fetch: Callable, args: tuple = (), kwargs: Optional[dict] = None) -> Any:
+        now = time.time()
+        self._touch(key, (fetch, args, kwargs or {}), now)
+        entry = self.get_entry(key)
+        if entry is not None:
+            data, fetched_at = entry
+            age = now - fetched_at
+            if age < self.ttl:
+                self.stats["fresh"] += 1
+                return data
+            if age < self.ttl + STALE_SECONDS:
+                self.stats["stale"] += 1
+                if not self._backing_off(key):
+                    self.refresh(key)
+                return data
+        self.stats["misses"] += 1
+        # Shielded so a cancelled request doesn't cancel the shared fetch
+        return await asyncio.shield(self.refresh(key))
+
+    def refresh(self, key: str) -> asyncio.Task:
+        """Start a refresh of key, or return the one already running."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._run_refresh(key))
+            task.add_done_callback(functools.partial(self._refreshed, key))
+            self._inflight[key] = task
+        return task
+
+    def _refreshed(self, key: str, task: asyncio.Task):
+        # Retrieves the exception, so background refreshes that nobody
+        # awaits don't log "Task exception was never retrieved"
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.failures.set_error(key)
+            self.stats["failures"] += 1
+            print(f"❌ Error refreshing {key}: {error}")
+
+    async def _run_refresh(self, key: str) -> Any:
+        try:
+            fetch, args, kwargs = self._loaders[key]
+            data = await fetch(*args, **kwargs)
+            self.stats["refreshes"] += 1
+            # Fetchers return empty results on failure; keep what we had
+            if not data:
+                entry = self.get_entry(key)
+                if entry is not None and entry[0]:
+                    self.failures.set_error(key)
+                    self.stats["failures"] += 1
+                    return entry[0]
+            # Empty results are cached briefly too (negative caching)
+            self.set_entry(key, data)
+            self.failures.delete(key)
+            return data
+        finally:
+            self._inflight.pop(key, None)
+
+    def hot_keys(self, now: float) -> List[str]:
+        """The KEEP_WARM most popular keys, dropping keys nobody asks for any more."""
+        scores = {key: self.popularity(key, now) for key in self._scores}
+        for key, score in scores.items():
+            if score < 0.05:
+                self._scores.pop(key, None)
+                self._loaders.pop(key, None)
+                self.failures.delete(key)
+        ranked = sorted((key for key in self._scores), key=scores.get, reverse=True)
+        for key in ranked[MAX_TRACKED_KEYS:]:
+            self._scores.pop(key, None)
+            self._loaders.pop(key, None)
+            self.failures.delete(key)
+        return [key for key in ranked[:KEEP_WARM] if scores[key] >= MIN_POPULARITY]
+
+    async def refresh_hot(self) -> int:
+        """Re-fetch hot keys that expire within REFRESH_AHEAD_SECONDS. Returns how many."""
+        now = time.time()
+        due = []
+        for key in self.hot_keys(now):
+            if self._backing_off(key):
+                continue
+            entry = self.get_entry(key)
+            if entry is None or now - entry[1] >= self.ttl - REFRESH_AHEAD_SECONDS:
+                due.append(key)
+        await fan_out(due, lambda key: self.refresh(key), REFRESH_CONCURRENCY, timeout=None)
+        self.stats["warmed"] += len(due)
+        return len(due)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL_SECONDS)
+            try:
+                await self.refresh_hot()
+            except Exception as e:
+                print(f"❌ Error refreshing trending caches: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._inflight.values()):
+            task.cancel()
@@ -10,6 +10,16 @@ from .tracking import (
     update_user_tier,
     TIER_LIMITS,
 )
+from .profile import (
+    get_user_profile,
+    load_user_profile,
+    invalidate_user_profile,
+)
+from .metering import (
+    meter_message,
+    start_metering,
+    stop_metering,
+)
 
 __all__ = [
     "get_user_tier",
@@ -18,4 +28,10 @@ __all__ = [
     "can_access_feature",
     "update_user_tier",
     "TIER_LIMITS",
+    "get_user_profile",
+    "load_user_profile",
+    "invalidate_user_profile",
+    "meter_message",
+    "start_metering",
+    "stop_metering",
 ]
@@ -0,0 +1,191 @@
+"""
+Atomic per-day message metering.
+
+Counts live in the user document under usage_daily.{YYYYMMDD}, so a new
+day starts at zero without any reset write, and the request's profile
+(one read, usage.profile) already carries today's count.
+
+meter_message admits or rejects a message in a single round trip:
+
+- limited tiers write count + 1 with a last_update_time precondition
+  taken from the profile read, so the check and the increment are atomic;
+  if the document changed in between, it retries as a transaction
+- unlimited tiers, which can write faster than one document sustains,
+  count into a per-day sharded counter (firestore.sharded_counter) with
+  the tier's shard count, or, with METERING_PREAGGREGATE on, are admitted
+  locally and flushed to it in batches every METERING_FLUSH_SECONDS
+- a first message creates the document with an exists=False precondition
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud import firestore
+
+from firestore.async_client import get_async_firestore_client
+from firestore.sharded_counter import ShardedCounter, user_counter
+from .profile import day_key, invalidate_user_profile, profile_cache, today
+
+METERING_PREAGGREGATE = os.getenv("METERING_PREAGGREGATE", "0") == "1"
+METERING_FLUSH_SECONDS = float(os.getenv("METERING_FLUSH_SECONDS", "5"))
+# Older day keys are dropped from usage_daily as new ones are written
+USAGE_DAYS_KEPT = int(os.getenv("USAGE_DAYS_KEPT", "7"))
+BATCH_LIMIT = 500
+
+# (uid, day key, shards) -> messages admitted locally but not yet written
+_pending: Dict[Tuple[str, str, int], int] = {}
+_flusher = None
+
+
+def _stale_days(profile: dict) -> Dict[str, object]:
+    cutoff = day_key((datetime.utcnow() - timedelta(days=USAGE_DAYS_KEPT)).date().isoformat())
+    return {f"usage_daily.{key}": firestore.DELETE_FIELD for key in profile.get("usage_days", []) if key < cutoff}
+
+
+def _message_counter(db, user_id: str, key: str, shards: int) -> ShardedCounter:
+    # Shards expire with the day's usage_daily key
+    expire_at = datetime.strptime(key, "%Y%m%d") + timedelta(days=USAGE_DAYS_KEPT + 1)
+    return user_counter(db, user_id, f"messages_{key}", shards, expire_at)
+
+
+def _messages_today(profile: dict) -> int:
+    """The profile's count, or 0 if it was read (or last metered) on an earlier day."""
+    usage = profile["usage"]
+    return usage["messages_today"] if usage.get("last_reset") == today() else 0
+
+
+def _admitted(user_id: str, profile: dict, count: int, update_time=None):
+    profile["exists"] = True
+    profile["usage"] = {"messages_today": count, "last_reset": today()}
+    key = day_key()
+    profile["usage_days"] = [k for k in profile.get("usage_days", []) if k >= key] or [key]
+    profile["update_time"] = update_time
+    profile_cache.put(user_id, profile)
+
+
+async def _meter_in_transaction(db, user_id: str, limit: int) -> Tuple[bool, int]:
+    user_ref = db.collection("users").document(user_id)
+    key = day_key()
+
+    @firestore.async_transactional
+    async def check_and_increment(transaction):
+        snapshot = await user_ref.get(transaction=transaction)
+        data = snapshot.to_dict() if snapshot.exists else {}
+        count = data.get("usage_daily", {}).get(key, 0)
+        if limit > 0 and count >= limit:
+            return False, count
+        if snapshot.exists:
+            transaction.update(user_ref, {f"usage_daily.{key}": count + 1})
+        else:
+            transaction.set(user_ref, {
+                "tier": "free",
+                "created_at": datetime.utcnow().isoformat(),
+                "usage_daily": {key: 1},
+            })
+        return True, count + 1
+
+    return await check_and_increment(db.transaction())
+
+
+async def meter_message(user_id: str, profile: dict, limit: int, shards: int = 1) -> bool:
+    """Count one message against limit (-1 = unlimited). False if over it."""
+    count = _messages_today(profile)
+    key = day_key()
+
+    if limit < 0:
+        if METERING_PREAGGREGATE:
+            _pending[(user_id, key, shards)] = _pending.get((user_id, key, shards), 0) + 1
+        else:
+            await _message_counter(get_async_firestore_client(), user_id, key, shards).increment()
+        return True
+
+    # Counts only grow within a day, so a known-full counter needs no write
+    if limit > 0 and count >= limit:
+        return False
+
+    db = get_async_firestore_client()
+    user_ref = db.collection("users").document(user_id)
+    try:
+        if not profile["exists"]:
+            result = await user_ref.create({
+                "tier": "free",
+                "created_at": datetime.utcnow().isoformat(),
+                "usage_daily": {key: 1},
+            })
+            _admitted(user_id, profile, 1, result.update_time)
+            return True
+
+        if profile.get("update_time") is not None:
+            updates = _stale_days(profile)
+            updates[f"usage_daily.{key}"] = count + 1
+            result = await user_ref.update(updates, option=db.write_option(last_update_time=profile["update_time"]))
+            _admitted(user_id, profile, count + 1, result.update_time)
+            return True
+    except (api_exceptions.FailedPrecondition, api_exceptions.Conflict):
+        # Someone else wrote the document since our read
+        pass
+
+    allowed, count = await _meter_in_transaction(db, user_id, limit)
+    if allowed:
+        _admitted(user_id, profile, count)
+        # The transaction's write time is not exposed; reload next time
+        invalidate_user_profile(user_id)
+    else:
+        profile["usage"] = {"messages_today": count, "last_reset": today()}
+    return allowed
+
+
+async def count_messages_today(user_id: str, profile: dict, limit: int, shards: int = 1) -> int:
+    """Today's message count: the usage_daily field, plus the sharded counter for unlimited tiers."""
+    count = _messages_today(profile)
+    if limit < 0:
+        key = day_key()
+        count += await _message_counter(get_async_firestore_client(), user_id, key, shards).value()
+        count += _pending.get((user_id, key, shards), 0)
+    return count
+
+
+async def flush_pending():
+    """Write locally admitted counts as batched increments."""
+    if not _pending:
+        return
+    items = list(_pending.items())
+    _pending.clear()
+    db = get_async_firestore_client()
+    for start in range(0, len(items), BATCH_LIMIT):
+        chunk = items[start:start + BATCH_LIMIT]
+        batch = db.batch()
+        for (user_id, key, shards), count in chunk:
+            _message_counter(db, user_id, key, shards).increment_in(batch, count)
+        try:
+            await batch.commit()
+        except Exception as e:
+            print(f"❌ Error flushing usage counts: {e}")
+            # Put them back for the next flush
+            for item, count in chunk:
+                _pending[item] = _pending.get(item, 0) + count
+
+
+async def _run_flusher():
+    while True:
+        await asyncio.sleep(METERING_FLUSH_SECONDS)
+        await flush_pending()
+
+
+def start_metering():
+    """Start the batch flusher (app startup); no-op unless pre-aggregating."""
+    global _flusher
+    if METERING_PREAGGREGATE and _flusher is None:
+        _flusher = asyncio.get_running_loop().create_task(_run_flusher())
+
+
+async def stop_metering():
+    """Stop the flusher and write what is pending (app shutdown)."""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    await flush_pending()
@@ -0,0 +1,134 @@
+"""
+User profile loader: tier, usage and preferences from one read of the
+user document.
+
+get_user_profile is a FastAPI dependency. FastAPI resolves a dependency
+once per request, so every handler and helper in a request shares the
+same profile dict, and the usage functions take it instead of reading
+the document again. Profiles are also kept in a short-TTL per-instance
+cache. Tier and preference writes invalidate it; the usage increment
+path writes the new count through.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import Depends
+
+from auth.deps import get_current_user
+from firestore.async_client import get_async_firestore_client
+
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "30"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+
+
+class ProfileCache:
+    """uid -> (expires_at, profile), LRU-bounded"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(user_id, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, user_id: str, profile: Dict):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, profile)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+
+profile_cache = ProfileCache(PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_MAX_ENTRIES)
+
+
+def today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def day_key(day: Optional[str] = None) -> str:
+    """Key of a day's counter in the user document's usage_daily map"""
+    return (day or today()).replace("-", "")
+
+
+def build_profile(user_id: str, data: Optional[Dict], update_time=None) -> Dict:
+    """
+    Normalize a user document. Message counts live in usage_daily keyed by
+    day, so a new day simply starts at zero; the older usage.messages_today
+    field is still honoured for documents written before that.
+    """
+    data = data or {}
+    usage = data.get("usage", {})
+    daily = data.get("usage_daily", {})
+    legacy_today = usage.get("messages_today", 0) if usage.get("last_reset") == today() else 0
+    return {
+        "uid": user_id,
+        "exists": bool(data),
+        "tier": data.get("tier", "free"),
+        "usage": {
+            "messages_today": daily.get(day_key(), legacy_today),
+            "last_reset": today(),
+        },
+        "usage_days": list(daily),
+        "preferences": data.get("preferences", {}),
+        # Precondition for single round-trip metering writes
+        "update_time": update_time,
+    }
+
+
+async def load_user_profile(user_id: str, refresh: bool = False) -> Dict:
+    """Profile from the cache, or one read of users/{uid}"""
+    if not refresh:
+        cached = profile_cache.get(user_id)
+        if cached is not None:
+            return cached
+    try:
+        db = get_async_firestore_client()
+        user_doc = await db.collection("users").document(user_id).get()
+        if user_doc.exists:
+            profile = build_profile(user_id, user_doc.to_dict(), user_doc.update_time)
+        else:
+            profile = build_profile(user_id, None)
+    except Exception as e:
+        print(f"❌ Error loading user profile: {e}")
+        # exists=None marks the profile as unknown; it is not cached, so the
+        # next request retries
+        return dict(build_profile(user_id, None), exists=None)
+    profile_cache.put(user_id, profile)
+    return profile
+
+
+def invalidate_user_profile(user_id: str):
+    profile_cache.invalidate(user_id)
+
+
+def cached_preferences(user_id: str) -> Optional[Dict]:
+    """Preferences if this instance has a fresh profile, else None"""
+    profile = profile_cache.get(user_id)
+    return profile["preferences"] if profile else None
+
+
+async def get_user_profile(user: dict = Depends(get_current_user)) -> Dict:
+    """FastAPI dependency: the caller's profile, loaded once per request"""
+    return await load_user_profile(user.get("uid"))
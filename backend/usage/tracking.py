@@ -5,24 +5,31 @@ Tracks message counts, API calls, and enforces limits based on subscription tier
 
 from datetime import datetime, timedelta
 from typing import Optional
-from google.cloud import firestore
 
-db = firestore.AsyncClient()
+from firestore.async_client import get_async_firestore_client
+from .metering import count_messages_today, meter_message
+from .profile import invalidate_user_profile, load_user_profile
 
 # Tier limits
 TIER_LIMITS = {
     "free": {
         "messages_per_day": 10,
+        "counter_shards": 1,  # sharded counter size for hot per-user stats
+        "requests_per_minute": 120,  # rate limit budget, in route cost units
         "conversations_history": False,
         "trending_api_access": {"reddit": True, "hackernews": True, "github": True, "youtube": False, "news": False, "weather": False},
     },
     "plus": {
         "messages_per_day": -1,  # unlimited
+        "counter_shards": 4,
+        "requests_per_minute": 600,
         "conversations_history": True,
         "trending_api_access": {"reddit": True, "hackernews": True, "github": True, "youtube": True, "news": True, "weather": True},
     },
     "pro": {
         "messages_per_day": -1,  # unlimited
+        "counter_shards": 10,
+        "requests_per_minute": 1500,
         "conversations_history": True,
         "trending_api_access": {"reddit": True, "hackernews": True, "github": True, "youtube": True, "news": True, "weather": True},
         "api_access": True,
@@ -31,38 +38,40 @@ TIER_LIMITS = {
 }
 
 
-async def get_user_tier(user_id: str) -> str:
+def _require_loaded(profile: dict):
+    if profile.get("exists") is None:
+        raise Exception("user profile unavailable")
+
+
+async def get_user_tier(user_id: str, profile: Optional[dict] = None) -> str:
     """Get the user's subscription tier."""
     try:
-        user_ref = db.collection("users").document(user_id)
-        user_doc = await user_ref.get()
+        profile = profile or await load_user_profile(user_id)
+        _require_loaded(profile)
         
-        if not user_doc.exists:
+        if not profile["exists"]:
             # Create user document with free tier
-            await user_ref.set({
+            db = get_async_firestore_client()
+            await db.collection("users").document(user_id).set({
                 "tier": "free",
                 "created_at": datetime.utcnow().isoformat(),
-                "usage": {
-                    "messages_today": 0,
-                    "last_reset": datetime.utcnow().date().isoformat(),
-                }
-            })
+            }, merge=True)
+            profile["exists"] = True
             return "free"
         
-        user_data = user_doc.to_dict()
-        return user_data.get("tier", "free")
+        return profile["tier"]
     except Exception as e:
         print(f"Error getting user tier: {e}")
         return "free"
 
 
-async def get_usage_stats(user_id: str) -> dict:
+async def get_usage_stats(user_id: str, profile: Optional[dict] = None) -> dict:
     """Get current usage statistics for the user."""
     try:
-        user_ref = db.collection("users").document(user_id)
-        user_doc = await user_ref.get()
+        profile = profile or await load_user_profile(user_id)
+        _require_loaded(profile)
         
-        if not user_doc.exists:
+        if not profile["exists"]:
             return {
                 "messages_today": 0,
                 "messages_remaining": 10,
@@ -70,26 +79,12 @@ async def get_usage_stats(user_id: str) -> dict:
                 "reset_at": (datetime.utcnow() + timedelta(days=1)).date().isoformat(),
             }
         
-        user_data = user_doc.to_dict()
-        usage = user_data.get("usage", {})
-        tier = user_data.get("tier", "free")
-        
-        # Check if we need to reset daily counter
-        last_reset = usage.get("last_reset", datetime.utcnow().date().isoformat())
-        today = datetime.utcnow().date().isoformat()
-        
-        if last_reset != today:
-            # Reset counter
-            await user_ref.update({
-                "usage.messages_today": 0,
-                "usage.last_reset": today,
-            })
-            messages_today = 0
-        else:
-            messages_today = usage.get("messages_today", 0)
+        # The profile already counts usage from an earlier day as zero
+        tier = profile["tier"]
+        tier_limit = TIER_LIMITS[tier]["messages_per_day"]
+        messages_today = await count_messages_today(user_id, profile, tier_limit, TIER_LIMITS[tier]["counter_shards"])
         
         # Calculate remaining messages
-        tier_limit = TIER_LIMITS[tier]["messages_per_day"]
         messages_remaining = tier_limit - messages_today if tier_limit > 0 else -1
         
         return {
@@ -109,68 +104,29 @@ async def get_usage_stats(user_id: str) -> dict:
         }
 
 
-async def increment_usage(user_id: str) -> bool:
+async def increment_usage(user_id: str, profile: Optional[dict] = None) -> bool:
     """
-    Increment the user's message count.
+    Count a message against the user's daily limit.
     Returns True if successful, False if limit exceeded.
     """
     try:
-        user_ref = db.collection("users").document(user_id)
-        user_doc = await user_ref.get()
-        
-        if not user_doc.exists:
-            # Create user with first message
-            await user_ref.set({
-                "tier": "free",
-                "created_at": datetime.utcnow().isoformat(),
-                "usage": {
-                    "messages_today": 1,
-                    "last_reset": datetime.utcnow().date().isoformat(),
-                }
-            })
-            return True
-        
-        user_data = user_doc.to_dict()
-        tier = user_data.get("tier", "free")
-        usage = user_data.get("usage", {})
-        
-        # Check if we need to reset daily counter
-        last_reset = usage.get("last_reset", datetime.utcnow().date().isoformat())
-        today = datetime.utcnow().date().isoformat()
-        
-        if last_reset != today:
-            # Reset counter
-            await user_ref.update({
-                "usage.messages_today": 1,
-                "usage.last_reset": today,
-            })
-            return True
-        
-        # Check limit
-        messages_today = usage.get("messages_today", 0)
-        tier_limit = TIER_LIMITS[tier]["messages_per_day"]
-        
-        if tier_limit > 0 and messages_today >= tier_limit:
-            return False  # Limit exceeded
-        
-        # Increment counter
-        await user_ref.update({
-            "usage.messages_today": firestore.Increment(1),
-        })
-        
-        return True
+        profile = profile or await load_user_profile(user_id)
+        _require_loaded(profile)
+        tier = profile["tier"] if profile["tier"] in TIER_LIMITS else "free"
+        limits = TIER_LIMITS[tier]
+        return await meter_message(user_id, profile, limits["messages_per_day"], limits["counter_shards"])
     except Exception as e:
         print(f"Error incrementing usage: {e}")
         return False
 
 
-async def can_access_feature(user_id: str, feature: str) -> bool:
+async def can_access_feature(user_id: str, feature: str, profile: Optional[dict] = None) -> bool:
     """
     Check if user can access a specific feature based on their tier.
     Features: conversations_history, trending_apis, api_access, custom_agents
     """
     try:
-        tier = await get_user_tier(user_id)
+        tier = await get_user_tier(user_id, profile)
         tier_features = TIER_LIMITS[tier]
         
         if feature == "conversations_history":
@@ -192,11 +148,13 @@ async def update_user_tier(user_id: str, new_tier: str) -> bool:
         if new_tier not in TIER_LIMITS:
             return False
         
+        db = get_async_firestore_client()
         user_ref = db.collection("users").document(user_id)
         await user_ref.set({
             "tier": new_tier,
             "updated_at": datetime.utcnow().isoformat(),
         }, merge=True)
+        invalidate_user_profile(user_id)
         
         return True
     except Exception as e:
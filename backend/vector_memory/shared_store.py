@@ -0,0 +1,545 @@
+# backend/vector_memory/shared_store.py
+"""
+Vector index shared by every worker process on a host.
+
+Layout of VECTOR_INDEX_DIR:
+- ops.db          SQLite append log. Every worker enqueues add/delete ops
+                  here; it also holds the document text.
+- header.bin      Eight int64 slots guarded by a seqlock (see _HEADER_*).
+- segment-N.bin   Generation N of the embedding matrix and its metadata
+                  columns, memory-mapped read-only by every worker.
+- writer.lock     flock held by whichever process is the writer.
+
+Exactly one process holds writer.lock. It drains the op log in order,
+writes rows into the mapped segment and then publishes the new row count
+in the header. Readers never lock: they read the header, remap when the
+generation changes and score rows straight out of the shared pages, so
+memory use is the same however many workers run. Growth and compaction
+write a whole new generation and swap it in by bumping the header.
+
+Each process also tails the op log into an in-memory map of live
+documents (id and text by seq), so searches and deletes don't query
+ops.db per call. If the header stays mid-update (a writer died inside
+_publish) readers stop waiting after _SEQLOCK_TIMEOUT and search the op
+log directly until the next writer takes over and repairs it.
+"""
+
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Header slots
+_HEADER_VERSION = 0   # seqlock: odd while the writer is updating
+_HEADER_GENERATION = 1
+_HEADER_COUNT = 2
+_HEADER_TOMBSTONES = 3
+_HEADER_CAPACITY = 4
+_HEADER_DIM = 5
+_HEADER_APPLIED_SEQ = 6
+_HEADER_SLOTS = 8
+
+_INITIAL_CAPACITY = 1024
+_POLL_INTERVAL = 0.05
+_APPLY_BATCH = 1024
+_STANDBY_INTERVAL = 5.0
+# How long a reader waits for an odd (mid-update) header version
+_SEQLOCK_TIMEOUT = 0.01
+
+_COLUMNS = (
+    ("created_at", np.float64),
+    ("user", np.int64),
+    ("category", np.int64),
+    ("agent", np.int64),
+    ("doc", np.int64),
+    ("seq", np.int64),
+    ("alive", np.uint8),
+)
+
+
+class _HeaderBusy(Exception):
+    """The header stayed mid-update past _SEQLOCK_TIMEOUT."""
+
+
+def _hash(value: Optional[str]) -> int:
+    """Stable 63-bit code for a metadata string. 0 means unset."""
+    if value is None:
+        return 0
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return (int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF) or 1
+
+
+def _segment_size(capacity: int, dim: int) -> int:
+    return capacity * dim * 4 + sum(capacity * np.dtype(dtype).itemsize for _, dtype in _COLUMNS)
+
+
+def _map_segment(path: str, capacity: int, dim: int, mode: str) -> Dict[str, np.ndarray]:
+    arrays = {"matrix": np.memmap(path, dtype=np.float32, mode=mode, offset=0, shape=(capacity, dim))}
+    offset = capacity * dim * 4
+    for name, dtype in _COLUMNS:
+        arrays[name] = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(capacity,))
+        offset += capacity * np.dtype(dtype).itemsize
+    return arrays
+
+
+class SharedVectorIndex:
+    """
+    Drop-in replacement for VectorIndex backed by shared files.
+
+    Writes are asynchronous: add/delete enqueue an op and return, and the
+    row becomes searchable once the writer applies it (typically within
+    _POLL_INTERVAL).
+    """
+
+    def __init__(self, directory: str, compact_ratio: float, compact_min_rows: int):
+        os.makedirs(directory, exist_ok=True)
+        self._dir = directory
+        self._compact_ratio = compact_ratio
+        self._compact_min_rows = compact_min_rows
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._mapped: Tuple[int, Optional[Dict[str, np.ndarray]]] = (-1, None)
+        self._header = None
+        self._lock_file = None
+        # Live documents from the op log: seq -> (doc_id, text), doc_id -> seq
+        self._docs_lock = threading.Lock()
+        self._texts: Dict[int, Tuple[str, str]] = {}
+        self._live: Dict[str, int] = {}
+        self._seen_seq = 0
+        self._docs_generation = -1
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ops (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                text TEXT,
+                user_id TEXT,
+                category TEXT,
+                agent TEXT,
+                created_at REAL,
+                vector BLOB
+            )
+        """)
+        conn.commit()
+
+        if not self._try_become_writer():
+            thread = threading.Thread(target=self._standby, daemon=True)
+            thread.start()
+
+    # ------------------------------------------------------------------
+    # Shared state
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path("ops.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _header_view(self) -> Optional[np.ndarray]:
+        if self._header is None:
+            path = self._path("header.bin")
+            if not os.path.exists(path) or os.path.getsize(path) < _HEADER_SLOTS * 8:
+                return None
+            self._header = np.memmap(path, dtype=np.int64, mode="r", shape=(_HEADER_SLOTS,))
+        return self._header
+
+    def _read_header(self) -> Optional[np.ndarray]:
+        """Consistent copy of the header; raises _HeaderBusy if it stays mid-update."""
+        header = self._header_view()
+        if header is None:
+            return None
+        deadline = time.monotonic() + _SEQLOCK_TIMEOUT
+        while True:
+            before = int(header[_HEADER_VERSION])
+            snapshot = np.array(header)
+            if before % 2 == 0 and int(header[_HEADER_VERSION]) == before:
+                return snapshot
+            if time.monotonic() > deadline:
+                raise _HeaderBusy()
+            time.sleep(0)
+
+    def _sync_docs(self, generation: Optional[int] = None):
+        """Tail the op log into the live document maps."""
+        with self._docs_lock:
+            if generation is not None and generation != self._docs_generation:
+                # Compaction drops ops from the log, possibly ones we never saw; start over
+                self._texts.clear()
+                self._live.clear()
+                self._seen_seq = 0
+                self._docs_generation = generation
+            rows = self._conn().execute(
+                "SELECT seq, op, doc_id, text FROM ops WHERE seq > ? ORDER BY seq", (self._seen_seq,)
+            ).fetchall()
+            for seq, op, doc_id, text in rows:
+                old = self._live.pop(doc_id, None)
+                if old is not None:
+                    self._texts.pop(old, None)
+                if op == "add":
+                    self._live[doc_id] = seq
+                    self._texts[seq] = (doc_id, text)
+            if rows:
+                self._seen_seq = rows[-1][0]
+
+    def _segment(self) -> Tuple[int, Optional[Dict[str, np.ndarray]]]:
+        """Current (row count, arrays), remapping if the generation moved on."""
+        header = self._read_header()
+        if header is None or header[_HEADER_GENERATION] == 0:
+            return 0, None
+        generation = int(header[_HEADER_GENERATION])
+        if generation != self._docs_generation or header[_HEADER_APPLIED_SEQ] > self._seen_seq:
+            self._sync_docs(generation)
+        mapped_generation, arrays = self._mapped
+        if mapped_generation != generation:
+            try:
+                arrays = _map_segment(
+                    self._path(f"segment-{generation}.bin"),
+                    int(header[_HEADER_CAPACITY]),
+                    int(header[_HEADER_DIM]),
+                    "r",
+                )
+            except FileNotFoundError:
+                # The writer swapped generations again between our header read and the map
+                return self._segment()
+            self._mapped = (generation, arrays)
+        return int(header[_HEADER_COUNT]), arrays
+
+    # ------------------------------------------------------------------
+    # VectorIndex interface
+
+    def __len__(self) -> int:
+        try:
+            header = self._read_header()
+        except _HeaderBusy:
+            self._sync_docs()
+            return len(self._live)
+        if header is None:
+            return 0
+        return int(header[_HEADER_COUNT] - header[_HEADER_TOMBSTONES])
+
+    def __contains__(self, doc_id: str) -> bool:
+        """Whether doc_id is live, counting adds still waiting in the log."""
+        self._sync_docs()
+        return doc_id in self._live
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            header = self._read_header()
+        except _HeaderBusy:
+            self._sync_docs()
+            return {"rows": len(self._live), "live": len(self._live), "tombstones": 0, "capacity": 0, "header_busy": 1}
+        if header is None:
+            return {"rows": 0, "live": 0, "tombstones": 0, "capacity": 0}
+        return {
+            "rows": int(header[_HEADER_COUNT]),
+            "live": int(header[_HEADER_COUNT] - header[_HEADER_TOMBSTONES]),
+            "tombstones": int(header[_HEADER_TOMBSTONES]),
+            "capacity": int(header[_HEADER_CAPACITY]),
+            "generation": int(header[_HEADER_GENERATION]),
+            "applied_seq": int(header[_HEADER_APPLIED_SEQ]),
+        }
+
+    def add(
+        self,
+        vector: np.ndarray,
+        text: str,
+        doc_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        category: Optional[str] = None,
+        agent: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> str:
+        doc_id = doc_id or str(uuid.uuid4())
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO ops (op, doc_id, text, user_id, category, agent, created_at, vector) VALUES ('add', ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, text, user_id, category, agent, created_at if created_at is not None else time.time(),
+             np.asarray(vector, dtype=np.float32).tobytes())
+        )
+        conn.commit()
+        self._wake.set()
+        return doc_id
+
+    def delete(self, doc_id: str) -> bool:
+        # Always enqueue: the add may still be waiting in the log
+        indexed = doc_id in self
+        conn = self._conn()
+        conn.execute("INSERT INTO ops (op, doc_id) VALUES ('delete', ?)", (doc_id,))
+        conn.commit()
+        self._wake.set()
+        return indexed
+
+    def compact(self):
+        """Compaction runs on the writer; just nudge it."""
+        self._wake.set()
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 3,
+        user_id: Optional[str] = None,
+        category: Union[str, Iterable[str], None] = None,
+        agent: Optional[str] = None,
+        since: Optional[float] = None,
+        half_life_days: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> List[Dict]:
+        from vector_memory.store import rank_rows
+
+        if k <= 0:
+            return []
+        try:
+            count, arrays = self._segment()
+        except _HeaderBusy:
+            return self._search_log(query, k, user_id, category, agent, since, half_life_days, now)
+        if arrays is None or count == 0:
+            return []
+
+        mask = arrays["alive"][:count] == 1
+        for column, values in (("user", user_id), ("category", category), ("agent", agent)):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            mask &= np.isin(arrays[column][:count], [_hash(v) for v in values])
+        if since is not None:
+            mask &= arrays["created_at"][:count] >= since
+
+        rows, scores = rank_rows(arrays["matrix"], arrays["created_at"], mask, query, k, half_life_days, now)
+        if rows.size == 0:
+            return []
+
+        results = []
+        for seq, row, score in zip(arrays["seq"][rows].tolist(), rows.tolist(), scores.tolist()):
+            found = self._texts.get(seq)
+            # Missing if it was deleted after the segment snapshot
+            if found is not None:
+                results.append({
+                    "id": found[0],
+                    "text": found[1],
+                    "score": float(score),
+                    "created_at": float(arrays["created_at"][row]),
+                })
+        return results
+
+    def _search_log(self, query, k, user_id, category, agent, since, half_life_days, now) -> List[Dict]:
+        """Brute-force search straight from the op log, while the header can't be read."""
+        from vector_memory.store import rank_rows
+
+        self._sync_docs()
+        ops = [
+            op for op in self._conn().execute(
+                "SELECT seq, user_id, category, agent, created_at, vector FROM ops WHERE op = 'add'"
+            )
+            if op[0] in self._texts
+        ]
+        if not ops:
+            return []
+        matrix = np.stack([np.frombuffer(op[5], dtype=np.float32) for op in ops])
+        created_at = np.array([op[4] for op in ops], dtype=np.float64)
+        mask = np.ones(len(ops), dtype=bool)
+        for index, values in ((1, user_id), (2, category), (3, agent)):
+            if values is None:
+                continue
+            allowed = {values} if isinstance(values, str) else set(values)
+            mask &= np.array([op[index] in allowed for op in ops])
+        if since is not None:
+            mask &= created_at >= since
+
+        rows, scores = rank_rows(matrix, created_at, mask, query, k, half_life_days, now)
+        return [
+            {
+                "id": self._texts[ops[row][0]][0],
+                "text": self._texts[ops[row][0]][1],
+                "score": float(score),
+                "created_at": float(created_at[row]),
+            }
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    # ------------------------------------------------------------------
+    # Writer
+
+    def _try_become_writer(self) -> bool:
+        lock_file = open(self._path("writer.lock"), "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        thread = threading.Thread(target=self._run_writer, daemon=True)
+        thread.start()
+        print(f"✅ Vector index writer started in process {os.getpid()}")
+        return True
+
+    def _standby(self):
+        """Take over as writer if the current writer process exits."""
+        while not self._try_become_writer():
+            time.sleep(_STANDBY_INTERVAL)
+
+    def _run_writer(self):
+        writer = _SegmentWriter(self._dir, self._compact_ratio, self._compact_min_rows)
+        conn = sqlite3.connect(self._path("ops.db"), timeout=30)
+        while True:
+            try:
+                applied = writer.applied_seq()
+                ops = conn.execute(
+                    "SELECT seq, op, doc_id, user_id, category, agent, created_at, vector "
+                    "FROM ops WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (applied, _APPLY_BATCH)
+                ).fetchall()
+                if ops:
+                    writer.apply(ops)
+                if writer.should_compact():
+                    dropped = writer.compact()
+                    # The log only needs to keep text for rows that are still live
+                    conn.execute("DELETE FROM ops WHERE op = 'delete' AND seq <= ?", (writer.applied_seq(),))
+                    conn.executemany("DELETE FROM ops WHERE seq = ?", [(seq,) for seq in dropped])
+                    conn.commit()
+                if len(ops) == _APPLY_BATCH:
+                    continue
+            except Exception as e:
+                print(f"❌ Vector index writer error: {e}")
+            self._wake.wait(_POLL_INTERVAL)
+            self._wake.clear()
+
+
+class _SegmentWriter:
+    """State owned by the single writer process."""
+
+    def __init__(self, directory: str, compact_ratio: float, compact_min_rows: int):
+        self._dir = directory
+        self._compact_ratio = compact_ratio
+        self._compact_min_rows = compact_min_rows
+
+        path = os.path.join(directory, "header.bin")
+        if not os.path.exists(path) or os.path.getsize(path) < _HEADER_SLOTS * 8:
+            with open(path, "wb") as f:
+                f.write(b"\0" * (_HEADER_SLOTS * 8))
+        self._header = np.memmap(path, dtype=np.int64, mode="r+", shape=(_HEADER_SLOTS,))
+        if self._header[_HEADER_VERSION] % 2:
+            # The previous writer died inside _publish; release the seqlock
+            self._header[_HEADER_VERSION] += 1
+
+        self._arrays = None
+        self._rows: Dict[int, int] = {}
+        if self._header[_HEADER_DIM]:
+            self._arrays = self._map(int(self._header[_HEADER_GENERATION]), int(self._header[_HEADER_CAPACITY]), "r+")
+            count = int(self._header[_HEADER_COUNT])
+            live = np.flatnonzero(self._arrays["alive"][:count])
+            self._rows = dict(zip(self._arrays["doc"][live].tolist(), live.tolist()))
+
+    def _map(self, generation: int, capacity: int, mode: str) -> Dict[str, np.ndarray]:
+        return _map_segment(
+            os.path.join(self._dir, f"segment-{generation}.bin"),
+            capacity, int(self._header[_HEADER_DIM]), mode,
+        )
+
+    def applied_seq(self) -> int:
+        return int(self._header[_HEADER_APPLIED_SEQ])
+
+    def _publish(self, fields: Dict[int, int]):
+        """Update header slots under the seqlock so readers see them together."""
+        header = self._header
+        header[_HEADER_VERSION] += 1
+        for slot, value in fields.items():
+            header[slot] = value
+        header[_HEADER_VERSION] += 1
+
+    def _new_generation(self, capacity: int, rows: np.ndarray) -> Tuple[int, Dict[str, np.ndarray]]:
+        """Write the given rows of the current segment into a fresh generation file."""
+        generation = int(self._header[_HEADER_GENERATION]) + 1
+        path = os.path.join(self._dir, f"segment-{generation}.bin")
+        with open(path, "wb") as f:
+            f.truncate(_segment_size(capacity, int(self._header[_HEADER_DIM])))
+        arrays = self._map(generation, capacity, "r+")
+        if self._arrays is not None and rows.size:
+            arrays["matrix"][:rows.size] = self._arrays["matrix"][rows]
+            for name, _ in _COLUMNS:
+                arrays[name][:rows.size] = self._arrays[name][rows]
+        return generation, arrays
+
+    def _swap(self, generation: int, arrays: Dict[str, np.ndarray], capacity: int, count: int, tombstones: int):
+        old_generation = int(self._header[_HEADER_GENERATION])
+        self._arrays = arrays
+        self._publish({
+            _HEADER_GENERATION: generation,
+            _HEADER_CAPACITY: capacity,
+            _HEADER_COUNT: count,
+            _HEADER_TOMBSTONES: tombstones,
+        })
+        old_path = os.path.join(self._dir, f"segment-{old_generation}.bin")
+        if old_generation != generation and os.path.exists(old_path):
+            # Readers that still map the old file keep their pages until they remap
+            os.unlink(old_path)
+
+    def apply(self, ops: List[tuple]):
+        count = int(self._header[_HEADER_COUNT])
+        tombstones = int(self._header[_HEADER_TOMBSTONES])
+
+        for seq, op, doc_id, user_id, category, agent, created_at, vector in ops:
+            doc = _hash(doc_id)
+            row = self._rows.pop(doc, None)
+            if row is not None:
+                self._arrays["alive"][row] = 0
+                tombstones += 1
+            if op != "add":
+                continue
+
+            vector = np.frombuffer(vector, dtype=np.float32)
+            if self._arrays is None:
+                self._header[_HEADER_DIM] = vector.shape[0]
+                generation, arrays = self._new_generation(_INITIAL_CAPACITY, np.arange(0))
+                self._swap(generation, arrays, _INITIAL_CAPACITY, 0, 0)
+            capacity = int(self._header[_HEADER_CAPACITY])
+            if count == capacity:
+                # Publish what we have so far, then grow into a new generation
+                self._publish({_HEADER_COUNT: count, _HEADER_TOMBSTONES: tombstones, _HEADER_APPLIED_SEQ: seq - 1})
+                generation, arrays = self._new_generation(capacity * 2, np.arange(count))
+                self._swap(generation, arrays, capacity * 2, count, tombstones)
+
+            arrays = self._arrays
+            arrays["matrix"][count] = vector
+            arrays["created_at"][count] = created_at
+            arrays["user"][count] = _hash(user_id)
+            arrays["category"][count] = _hash(category)
+            arrays["agent"][count] = _hash(agent)
+            arrays["doc"][count] = doc
+            arrays["seq"][count] = seq
+            arrays["alive"][count] = 1
+            self._rows[doc] = count
+            count += 1
+
+        self._publish({_HEADER_COUNT: count, _HEADER_TOMBSTONES: tombstones, _HEADER_APPLIED_SEQ: ops[-1][0]})
+
+    def should_compact(self) -> bool:
+        count = int(self._header[_HEADER_COUNT])
+        return count >= self._compact_min_rows and self._header[_HEADER_TOMBSTONES] > count * self._compact_ratio
+
+    def compact(self) -> List[int]:
+        """Rewrite live rows into a new generation. Returns the seqs of dropped rows."""
+        count = int(self._header[_HEADER_COUNT])
+        alive = self._arrays["alive"][:count] == 1
+        live = np.flatnonzero(alive)
+        dropped = self._arrays["seq"][:count][~alive].tolist()
+        capacity = max(_INITIAL_CAPACITY, 1 << max(int(live.size) * 2 - 1, 1).bit_length())
+        generation, arrays = self._new_generation(capacity, live)
+        self._rows = dict(zip(arrays["doc"][:live.size].tolist(), range(live.size)))
+        self._swap(generation, arrays, capacity, int(live.size), 0)
+        print(f"🧹 Shared vector index compacted: {count} -> {live.size} rows")
+        return dropped
@@ -1,71 +1,449 @@
 # backend/vector_memory/store.py
 
-import math
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
 
-_documents = []
-_vectors = []
 _model = None
 
+# Exponential time decay applied to similarity scores. A memory that is
+# DECAY_HALF_LIFE_DAYS old scores half as much as an identical fresh one.
+# 0 disables decay.
+DECAY_HALF_LIFE_DAYS = float(os.getenv("VECTOR_DECAY_HALF_LIFE_DAYS", "30"))
+
+# Background compaction kicks in once this share of rows are tombstones
+COMPACT_TOMBSTONE_RATIO = float(os.getenv("VECTOR_COMPACT_TOMBSTONE_RATIO", "0.25"))
+COMPACT_MIN_ROWS = 1024
+
+# Set to a directory to share one index between all worker processes on
+# the host (see shared_store.py). Unset keeps a private in-process index.
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "")
+
+_INITIAL_CAPACITY = 256
+
 
 def get_model():
     """
     Lazily load SentenceTransformer model.
-    This avoids heavy startup cost on Cloud Run.
+    This runs ONLY when semantic memory is actually used.
+    Returns None if model cannot be loaded.
     """
     global _model
 
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        print("[ML] Loading SentenceTransformer model...")
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        try:
+            from sentence_transformers import SentenceTransformer
+            print("[ML] Loading SentenceTransformer model...")
+            _model = SentenceTransformer("all-MiniLM-L6-v2")
+        except ImportError as e:
+            print(f"⚠️ sentence_transformers not installed: {e}")
+            return None
+        except Exception as e:
+            print(f"⚠️ Failed to load SentenceTransformer: {e}")
+            return None
 
     return _model
 
 
 def cosine_similarity(v1, v2):
-    dot = sum(a * b for a, b in zip(v1, v2))
-    norm1 = math.sqrt(sum(a * a for a in v1))
-    norm2 = math.sqrt(sum(b * b for b in v2))
-    return dot / (norm1 * norm2 + 1e-8)
+    v1 = np.asarray(v1, dtype=np.float32)
+    v2 = np.asarray(v2, dtype=np.float32)
+    return float(v1 @ v2 / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-8))
+
+
+def _encode(text: str) -> Optional[np.ndarray]:
+    model = get_model()
+    if model is None:
+        return None
+    vector = np.asarray(model.encode(text), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
 
 
 def embed_text(text: str):
+    """
+    Convert text to embedding vector.
+    Returns empty list if model unavailable.
+    """
     try:
-        model = get_model()
-        return model.encode(text).tolist()
+        vector = _encode(text)
+        if vector is None:
+            print("⚠️ Embedding model unavailable, skipping embeddings")
+            return []
+        return vector.tolist()
     except Exception as e:
         print(f"❌ Error embedding text: {e}")
         return []
 
 
-def add_document(text: str):
+def rank_rows(
+    matrix: np.ndarray,
+    created_at: np.ndarray,
+    mask: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    half_life_days: Optional[float] = None,
+    now: Optional[float] = None,
+):
+    """
+    Score the rows selected by mask against a normalised query and return
+    (rows, scores) for the top k, best first. Scores are cosine similarity
+    times the exponential time decay.
+    """
+    rows = np.flatnonzero(mask)
+    if rows.size == 0:
+        return rows, np.zeros(0, dtype=np.float32)
+
+    scores = matrix[rows] @ query
+
+    if half_life_days is None:
+        half_life_days = DECAY_HALF_LIFE_DAYS
+    if half_life_days and half_life_days > 0:
+        now = now if now is not None else time.time()
+        age_days = np.maximum(now - created_at[rows], 0.0) / 86400.0
+        scores = scores * np.exp2(-age_days / half_life_days)
+
+    if rows.size > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(rows.size)
+    top = top[np.argsort(-scores[top])]
+    return rows[top], scores[top]
+
+
+class _Segment:
+    """
+    One generation of the index: a row-major embedding matrix plus per-row
+    metadata columns. Rows are only ever appended or tombstoned in place;
+    anything that moves rows (growth, compaction) builds a new segment.
+    """
+
+    def __init__(self, capacity: int, dim: Optional[int]):
+        self.capacity = capacity
+        self.size = 0
+        self.tombstones = 0
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32) if dim else None
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.user = np.zeros(capacity, dtype=np.int32)
+        self.category = np.zeros(capacity, dtype=np.int32)
+        self.agent = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.documents: List[str] = []
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def copy_rows(self, source: "_Segment", rows: np.ndarray):
+        """Append the given rows of another segment to this one."""
+        start, end = self.size, self.size + rows.size
+        if self.matrix is None:
+            self.matrix = np.zeros((self.capacity, source.matrix.shape[1]), dtype=np.float32)
+        self.matrix[start:end] = source.matrix[rows]
+        for name in ("created_at", "user", "category", "agent", "alive"):
+            getattr(self, name)[start:end] = getattr(source, name)[rows]
+        for offset, row in enumerate(rows.tolist()):
+            doc_id = source.ids[row]
+            self.documents.append(source.documents[row])
+            self.ids.append(doc_id)
+            if self.alive[start + offset]:
+                self.rows[doc_id] = start + offset
+        self.tombstones += int(rows.size - np.count_nonzero(self.alive[start:end]))
+        self.size = end
+
+
+class VectorIndex:
+    """
+    Row-major embedding matrix with per-row metadata columns.
+
+    Vectors are L2-normalised on insert so cosine similarity is a single
+    matrix-vector product. Metadata strings (user, category, agent) are
+    interned to integer codes; filters become boolean masks over those
+    columns and only the surviving rows are scored.
+
+    Entries are addressed by document ID. Deletes only tombstone the row,
+    and searches mask tombstoned rows out. Once tombstones exceed
+    compact_ratio of the rows, a background thread rewrites the live rows
+    into a fresh segment and swaps it in. Searches never take the lock:
+    they read whichever segment is current when they start.
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY, compact_ratio: float = COMPACT_TOMBSTONE_RATIO, compact_min_rows: int = COMPACT_MIN_ROWS):
+        self._lock = threading.Lock()
+        self._segment = _Segment(capacity, None)
+        self._compact_ratio = compact_ratio
+        self._compact_min_rows = compact_min_rows
+        self._compacting = False
+        # Code 0 is reserved for "unset" so missing metadata never matches a filter
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        segment = self._segment
+        return segment.size - segment.tombstones
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._segment.rows
+
+    def stats(self) -> Dict[str, int]:
+        segment = self._segment
+        return {
+            "rows": segment.size,
+            "live": segment.size - segment.tombstones,
+            "tombstones": segment.tombstones,
+            "capacity": segment.capacity,
+        }
+
+    def _code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._codes) + 1
+            self._codes[value] = code
+        return code
+
+    def _grow(self, segment: _Segment) -> _Segment:
+        grown = _Segment(segment.capacity * 2, segment.matrix.shape[1])
+        grown.copy_rows(segment, np.arange(segment.size))
+        self._segment = grown
+        return grown
+
+    def add(
+        self,
+        vector: np.ndarray,
+        text: str,
+        doc_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        category: Optional[str] = None,
+        agent: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> str:
+        """Append a vector. Re-adding an existing doc_id replaces it."""
+        doc_id = doc_id or str(uuid.uuid4())
+        with self._lock:
+            segment = self._segment
+            if doc_id in segment.rows:
+                self._tombstone(segment, doc_id)
+            if segment.matrix is None:
+                segment.matrix = np.zeros((segment.capacity, vector.shape[0]), dtype=np.float32)
+            if segment.size == segment.capacity:
+                segment = self._grow(segment)
+
+            row = segment.size
+            segment.matrix[row] = vector
+            segment.created_at[row] = created_at if created_at is not None else time.time()
+            segment.user[row] = self._code(user_id)
+            segment.category[row] = self._code(category)
+            segment.agent[row] = self._code(agent)
+            segment.alive[row] = True
+            segment.documents.append(text)
+            segment.ids.append(doc_id)
+            segment.rows[doc_id] = row
+            # Publish the row last so concurrent searches never see it half-written
+            segment.size = row + 1
+        return doc_id
+
+    def _tombstone(self, segment: _Segment, doc_id: str):
+        row = segment.rows.pop(doc_id)
+        segment.alive[row] = False
+        segment.tombstones += 1
+
+    def delete(self, doc_id: str) -> bool:
+        """Tombstone a document. Returns False if it is not indexed."""
+        with self._lock:
+            segment = self._segment
+            if doc_id not in segment.rows:
+                return False
+            self._tombstone(segment, doc_id)
+            should_compact = (
+                not self._compacting
+                and segment.size >= self._compact_min_rows
+                and segment.tombstones > segment.size * self._compact_ratio
+            )
+            if should_compact:
+                self._compacting = True
+
+        if should_compact:
+            thread = threading.Thread(target=self.compact, daemon=True)
+            thread.start()
+        return True
+
+    def compact(self):
+        """
+        Rewrite live rows into a new segment and swap it in.
+
+        The bulk copy runs without the lock. Rows appended or tombstoned
+        while it ran are reconciled under the lock just before the swap.
+        """
+        try:
+            segment = self._segment
+            copied = segment.size
+            # Snapshot first: flatnonzero over a column another thread is writing can tear
+            live = np.flatnonzero(segment.alive[:copied].copy())
+            capacity = max(_INITIAL_CAPACITY, 1 << max(int(live.size) * 2 - 1, 1).bit_length())
+            compacted = _Segment(capacity, segment.matrix.shape[1] if segment.matrix is not None else None)
+            if live.size:
+                compacted.copy_rows(segment, live)
+
+            with self._lock:
+                segment = self._segment
+                # Tombstones that landed during the copy
+                dead = np.flatnonzero(~segment.alive[live])
+                for i in dead.tolist():
+                    if compacted.alive[i]:
+                        self._tombstone(compacted, compacted.ids[i])
+                # Rows appended during the copy
+                appended = np.arange(copied, segment.size)
+                if compacted.size + appended.size > compacted.capacity:
+                    grown = _Segment(max(compacted.capacity * 2, compacted.size + appended.size), segment.matrix.shape[1])
+                    grown.copy_rows(compacted, np.arange(compacted.size))
+                    compacted = grown
+                if appended.size:
+                    compacted.copy_rows(segment, appended)
+                self._segment = compacted
+
+            print(f"🧹 Vector index compacted: {segment.size} -> {compacted.size} rows")
+        except Exception as e:
+            print(f"❌ Error compacting vector index: {e}")
+        finally:
+            self._compacting = False
+
+    def _mask(self, size: int, column: np.ndarray, values: Union[str, Iterable[str], None]) -> Optional[np.ndarray]:
+        if values is None:
+            return None
+        if isinstance(values, str):
+            values = [values]
+        codes = [self._codes[v] for v in values if v in self._codes]
+        if not codes:
+            return np.zeros(size, dtype=bool)
+        if len(codes) == 1:
+            return column[:size] == codes[0]
+        return np.isin(column[:size], codes)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 3,
+        user_id: Optional[str] = None,
+        category: Union[str, Iterable[str], None] = None,
+        agent: Optional[str] = None,
+        since: Optional[float] = None,
+        half_life_days: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> List[Dict]:
+        segment = self._segment
+        size = segment.size
+        if size == 0 or k <= 0:
+            return []
+
+        mask = segment.alive[:size].copy()
+        for column, values in ((segment.user, user_id), (segment.category, category), (segment.agent, agent)):
+            column_mask = self._mask(size, column, values)
+            if column_mask is not None:
+                mask &= column_mask
+        if since is not None:
+            mask &= segment.created_at[:size] >= since
+
+        rows, scores = rank_rows(segment.matrix, segment.created_at, mask, query, k, half_life_days, now)
+
+        return [
+            {
+                "id": segment.ids[row],
+                "text": segment.documents[row],
+                "score": float(score),
+                "created_at": float(segment.created_at[row]),
+            }
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+
+def _create_index():
+    if VECTOR_INDEX_DIR:
+        from vector_memory.shared_store import SharedVectorIndex
+        return SharedVectorIndex(VECTOR_INDEX_DIR, COMPACT_TOMBSTONE_RATIO, COMPACT_MIN_ROWS)
+    return VectorIndex()
+
+
+_index = _create_index()
+
+
+def add_document(
+    text: str,
+    doc_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    agent: Optional[str] = None,
+    created_at: Optional[float] = None,
+):
+    """
+    Store text and its vector representation along with its metadata.
+    Returns the document ID, or None if nothing was stored.
+    Safely handles missing model.
+    """
     try:
-        vector = embed_text(text)
-        if vector:
-            _documents.append(text)
-            _vectors.append(vector)
+        vector = _encode(text)
+        if vector is not None:  # Only add if we have a valid vector
+            return _index.add(vector, text, doc_id=doc_id, user_id=user_id, category=category, agent=agent, created_at=created_at)
+        print(f"⚠️ Skipping vector storage for: {text[:50]}...")
     except Exception as e:
         print(f"❌ Error adding document: {e}")
+    return None
 
 
-def search_similar(query: str, k: int = 3):
+def delete_document(doc_id: str) -> bool:
+    """
+    Remove a document from semantic search.
+    Returns False if it was never indexed.
+    """
     try:
-        if not _vectors:
-            return []
+        return _index.delete(doc_id)
+    except Exception as e:
+        print(f"❌ Error deleting document: {e}")
+        return False
 
-        query_vector = embed_text(query)
-        if not query_vector:
-            return []
 
-        scores = [
-            (cosine_similarity(query_vector, v), idx)
-            for idx, v in enumerate(_vectors)
-        ]
+def search_documents(
+    query: str,
+    k: int = 3,
+    user_id: Optional[str] = None,
+    category: Union[str, Iterable[str], None] = None,
+    agent: Optional[str] = None,
+    since: Optional[float] = None,
+    half_life_days: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Find top-k documents for a query, restricted by metadata filters.
+    Returns dicts with id, text, score and created_at, best first.
+    """
+    try:
+        if len(_index) == 0:
+            return []
 
-        scores.sort(reverse=True)
-        top_indices = [idx for _, idx in scores[:k]]
+        query_vector = _encode(query)
+        if query_vector is None:
+            print("⚠️ Embedding model unavailable for search")
+            return []
 
-        return [_documents[i] for i in top_indices]
+        return _index.search(
+            query_vector,
+            k=k,
+            user_id=user_id,
+            category=category,
+            agent=agent,
+            since=since,
+            half_life_days=half_life_days,
+        )
     except Exception as e:
         print(f"❌ Error searching similar documents: {e}")
         return []
+
+
+def search_similar(query: str, k: int = 3, **filters):
+    """
+    Find top-k semantically similar past documents.
+    Accepts the same filters as search_documents.
+    Returns empty list if model unavailable or no documents.
+    """
+    return [doc["text"] for doc in search_documents(query, k=k, **filters)]